@@ -29,6 +29,31 @@ class ToolExecutorError(Exception):
         self.message = message
         super().__init__(self.message)
 
+class AdmissionRejectedError(Exception):
+    """Raised when a request is rejected by admission control or rate limiting. Answered with a 429."""
+    def __init__(self, message: str, retry_after: float):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client disconnects before its response is ready."""
+    def __init__(self, message: str = "Client disconnected"):
+        self.message = message
+        super().__init__(self.message)
+
+class ModelDeadlineError(TimeoutError):
+    """Raised when a model call does not answer within its deadline."""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+class ModelUnavailableError(Exception):
+    """Raised when a model's circuit breaker is open and no fallback model can take the call."""
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
 class ErrorResponse(BaseModel):
     """Base model for error responses."""
     status: int
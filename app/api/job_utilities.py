@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from app.services.logger import setup_logger
+from app.services.schemas import ToolRequest
+from app.services.job_store import job_store, current_job_id
+from app.services.admission import admission_controller
+from app.api.error_utilities import InputValidationError, AdmissionRejectedError
+from app.api.tool_utilities import prepare_tool_inputs, run_tool
+
+logger = setup_logger(__name__)
+
+# Seconds between heartbeats/evictions, and how long an unfinished job may go without a heartbeat before it is re-run
+JOB_MAINTENANCE_INTERVAL = float(os.environ.get("JOB_MAINTENANCE_INTERVAL_SECONDS", 30))
+JOB_STALE_AFTER = JOB_MAINTENANCE_INTERVAL * 4
+# Seconds a job waits before asking again for capacity it was refused, doubling up to the maximum
+JOB_RETRY_DELAY = float(os.environ.get("JOB_RETRY_DELAY_SECONDS", 1))
+JOB_MAX_RETRY_DELAY = float(os.environ.get("JOB_MAX_RETRY_DELAY_SECONDS", 30))
+# Total seconds a job may spend waiting for capacity before it fails with a 503
+JOB_MAX_CAPACITY_WAIT = float(os.environ.get("JOB_MAX_CAPACITY_WAIT_SECONDS", 600))
+
+# Strong references to running job tasks so they are not garbage collected mid-flight
+running_jobs = set()
+
+async def run_tool_with_retries(job_id, tool_id, request_inputs_dict):
+    # Jobs count against the global in-flight limit and the tool pools, but wait for capacity instead of failing
+    delay = JOB_RETRY_DELAY
+    give_up_at = time.monotonic() + JOB_MAX_CAPACITY_WAIT
+    while True:
+        try:
+            async with admission_controller.slot():
+                return await run_tool(tool_id, request_inputs_dict)
+        except (AdmissionRejectedError, HTTPException) as e:
+            if isinstance(e, HTTPException) and e.status_code != 503:
+                raise
+            if time.monotonic() + delay > give_up_at:
+                reason = e.detail if isinstance(e, HTTPException) else e.message
+                raise HTTPException(status_code=503, detail=f"Gave up waiting for capacity after {JOB_MAX_CAPACITY_WAIT:.0f}s: {reason}")
+            logger.info(f"Job {job_id} is waiting {delay:.0f}s for capacity")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, JOB_MAX_RETRY_DELAY)
+
+async def run_tool_job(job_id, tool_id, request_inputs_dict):
+    # The job store is SQLite, its calls run in the thread pool so a locked file cannot stall the event loop
+    token = current_job_id.set(job_id)
+    try:
+        await run_in_threadpool(job_store.mark_running, job_id)
+        result = await run_tool_with_retries(job_id, tool_id, request_inputs_dict)
+        await run_in_threadpool(job_store.complete, job_id, jsonable_encoder(result))
+        logger.info(f"Job {job_id} succeeded")
+
+    except HTTPException as e:
+        logger.error(f"Job {job_id} failed: {e.detail}")
+        await run_in_threadpool(job_store.fail, job_id, e.status_code, e.detail)
+
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        await run_in_threadpool(job_store.fail, job_id, 500, str(e))
+
+    finally:
+        current_job_id.reset(token)
+
+def start_tool_job(job_id, tool_id, request_inputs_dict):
+    task = asyncio.create_task(run_tool_job(job_id, tool_id, request_inputs_dict))
+    running_jobs.add(task)
+    task.add_done_callback(running_jobs.discard)
+    return task
+
+async def submit_tool_job(data: ToolRequest) -> str:
+    # Validates up front so bad requests fail synchronously instead of producing a failed job
+    request_data = data.tool_data
+    request_inputs_dict = prepare_tool_inputs(request_data)
+
+    job_id = await run_in_threadpool(job_store.create, request_data.tool_id, jsonable_encoder(data))
+    start_tool_job(job_id, request_data.tool_id, request_inputs_dict)
+    return job_id
+
+async def resume_stale_jobs():
+    for job_id, request in await run_in_threadpool(job_store.claim_stale_jobs, JOB_STALE_AFTER):
+        try:
+            request_data = ToolRequest(**request).tool_data
+            request_inputs_dict = prepare_tool_inputs(request_data)
+        except (InputValidationError, HTTPException) as e:
+            await run_in_threadpool(job_store.fail, job_id, 400, str(e))
+            continue
+
+        logger.info(f"Resuming interrupted job {job_id}")
+        start_tool_job(job_id, request_data.tool_id, request_inputs_dict)
+
+async def maintain_jobs():
+    # Background task started in the application lifespan
+    while True:
+        try:
+            await run_in_threadpool(job_store.heartbeat)
+            await run_in_threadpool(job_store.evict_expired)
+            await resume_stale_jobs()
+        except Exception as e:
+            logger.error(f"Job maintenance failed: {e}")
+        await asyncio.sleep(JOB_MAINTENANCE_INTERVAL)
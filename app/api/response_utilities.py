@@ -0,0 +1,73 @@
+import asyncio
+import orjson
+from typing import Any, Awaitable, Optional
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from app.api.error_utilities import ErrorResponse, ClientDisconnectedError
+
+def _default(value):
+    # Called by orjson for types it does not serialize natively
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, accepting pydantic models anywhere in the content."""
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def model_response(model: BaseModel, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    # Returning a Response skips FastAPI's response_model validation and encoding, the model was validated when built
+    return FastJSONResponse(content=model.model_dump(), status_code=status_code, headers=headers)
+
+def error_response(status_code: int, message: Any, headers: Optional[dict] = None) -> FastJSONResponse:
+    return model_response(ErrorResponse(status=status_code, message=message), status_code, headers)
+
+class FastJSONRequest(Request):
+    """Request whose JSON body is parsed with orjson."""
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+class FastJSONRoute(APIRoute):
+    """Route class parsing request bodies with orjson. Malformed JSON still gets FastAPI's 422 response."""
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def fast_json_route_handler(request: Request):
+            return await route_handler(FastJSONRequest(request.scope, request.receive))
+
+        return fast_json_route_handler
+
+async def _wait_for_disconnect(request: Request):
+    # The body has been read by the time the handler runs, so the next message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def run_until_disconnected(request: Request, awaitable: Awaitable) -> Any:
+    """
+    Awaits `awaitable`, cancelling it and raising ClientDisconnectedError if the client disconnects first.
+    Starlette keeps running a handler after its client has gone, this lets the handler stop waiting.
+    A tool execution that already started keeps running and holds its pool slot until it finishes.
+    """
+    work = asyncio.ensure_future(awaitable)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({work, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        finished = work.done()
+        if not finished:
+            work.cancel()
+
+    if not finished:
+        raise ClientDisconnectedError()
+    return work.result()
@@ -1,48 +1,160 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from collections import Counter
+from contextlib import AsyncExitStack
 from typing import Union
-from app.services.schemas import ToolRequest, ChatRequest, Message, ChatResponse, ToolResponse
-from app.utils.auth import key_check
+from app.services.schemas import ToolRequest, ChatRequest, Message, ChatResponse, ToolResponse, JobResponse, ToolBatchRequest, ToolBatchResponse
+from app.services.job_store import job_store
+from app.services.admission import admission_controller
+from app.services.response_cache import response_cache
+from app.services.metrics import metrics
+from app.utils.auth import key_check, websocket_key_check
 from app.services.logger import setup_logger
-from app.api.error_utilities import InputValidationError, ErrorResponse
-from app.api.tool_utilities import load_tool_metadata, execute_tool, finalize_inputs
+from app.api.error_utilities import InputValidationError, ErrorResponse, ClientDisconnectedError, AdmissionRejectedError
+from app.api.tool_utilities import prepare_tool_inputs, run_tool, run_tool_batch, stream_tool, execution_engine, tool_error_to_http_exception
+from app.api.job_utilities import submit_tool_job
+from app.api.response_utilities import FastJSONRoute, model_response, error_response, dumps, run_until_disconnected
+from app.api.stream_utilities import chat_events, chat_sse_stream, tool_ndjson_stream, tool_sse_stream, AdmittedStreamingResponse, STREAMING_HEADERS
 
 logger = setup_logger(__name__)
-router = APIRouter()
+# Request bodies are parsed with orjson, responses are built with model_response/error_response
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/")
 def read_root():
     return {"Hello": "World"}
 
 @router.post("/submit-tool", response_model=Union[ToolResponse, ErrorResponse])
-async def submit_tool( data: ToolRequest, _ = Depends(key_check)):     
-    try: 
-        # Unpack GenericRequest for tool data
-        request_data = data.tool_data
+async def submit_tool( data: ToolRequest, request: Request, cache_control: str = Header(None), _ = Depends(key_check)):     
+    # Rate limited per user and bounded globally, rejections are answered with a 429
+    # `Cache-Control: no-cache` skips the response cache and stores the fresh result
+    # Identical concurrent requests share one execution, which is cancelled once all of their clients disconnect
+    use_cache = "no-cache" not in (cache_control or "").lower()
+    
+    async with admission_controller.admit(data.user.id):
+        try: 
+            # Unpack GenericRequest for tool data
+            request_data = data.tool_data
         
-        requested_tool = load_tool_metadata(request_data.tool_id)
+            request_inputs_dict = prepare_tool_inputs(request_data)
+
+            result = await run_until_disconnected(request, run_tool(request_data.tool_id, request_inputs_dict, use_cache))
         
-        request_inputs_dict = finalize_inputs(request_data.inputs, requested_tool['inputs'])
+            return model_response(ToolResponse(data=result))
+    
+        except InputValidationError as e:
+            logger.error(f"InputValidationError: {e}")
 
-        result = execute_tool(request_data.tool_id, request_inputs_dict)
+            return error_response(400, e.message)
         
-        return ToolResponse(data=result)
+        except ClientDisconnectedError as e:
+            logger.info(f"Client disconnected before tool {data.tool_data.tool_id} finished")
+            # Nobody reads this response, 499 keeps the request apart from server errors in the metrics
+            return error_response(499, e.message)
+    
+        except HTTPException as e:
+            logger.error(f"HTTPException: {e}")
+            return error_response(e.status_code, e.detail)
+
+@router.post("/submit-tools-batch", response_model=Union[ToolBatchResponse, ErrorResponse])
+async def submit_tools_batch( data: ToolBatchRequest, _ = Depends(key_check)):
+    # Every item is charged to its user's rate limit and runs in its own global in-flight slot
+    for user_id, count in Counter(tool_request.user.id for tool_request in data.requests).items():
+        await admission_controller.check_rate_limit(user_id, cost=count)
+    
+    try:
+        results = await run_tool_batch(data.requests, data.max_concurrency, slot=admission_controller.slot)
+        
+        return model_response(ToolBatchResponse(data=results))
     
     except InputValidationError as e:
         logger.error(f"InputValidationError: {e}")
 
-        return JSONResponse(
-            status_code=400,
-            content=jsonable_encoder(ErrorResponse(status=400, message=e.message))
-        )
+        return error_response(400, e.message)
+
+@router.post("/submit-tool/stream", response_model=None)
+async def submit_tool_stream( data: ToolRequest, request: Request, _ = Depends(key_check)):
+    # Streams tool records as NDJSON, or as Server-Sent Events when the client accepts text/event-stream
+    # Admitted like /submit-tool, the in-flight slot is held until the stream ends
+    async with AsyncExitStack() as admission:
+        await admission.enter_async_context(admission_controller.admit(data.user.id))
+        
+        try:
+            request_data = data.tool_data
+        
+            request_inputs_dict = prepare_tool_inputs(request_data)
+        
+            records = stream_tool(request_data.tool_id, request_inputs_dict)
+        
+            # Wait for the first record so failures before any output still get a proper status code
+            try:
+                first_record = await records.__anext__()
+            except StopAsyncIteration:
+                # A tool that produced no records is answered with an empty stream
+                first_record = None
+            except Exception as e:
+                raise tool_error_to_http_exception(e)
+    
+        except InputValidationError as e:
+            logger.error(f"InputValidationError: {e}")
+
+            return error_response(400, e.message)
+    
+        except HTTPException as e:
+            logger.error(f"HTTPException: {e}")
+            return error_response(e.status_code, e.detail)
+    
+        # The response takes over the admission slot, it is released once the response is sent
+        if "text/event-stream" in request.headers.get("accept", ""):
+            return AdmittedStreamingResponse(tool_sse_stream(first_record, records), admission.pop_all(), media_type="text/event-stream", headers=STREAMING_HEADERS)
+    
+        return AdmittedStreamingResponse(tool_ndjson_stream(first_record, records), admission.pop_all(), media_type="application/x-ndjson", headers=STREAMING_HEADERS)
+
+@router.post("/jobs", status_code=202, response_model=Union[JobResponse, ErrorResponse])
+async def submit_job( data: ToolRequest, _ = Depends(key_check)):
+    # Charged to the user's rate limit now, the job takes a global in-flight slot once it runs
+    await admission_controller.check_rate_limit(data.user.id)
+    
+    try:
+        job_id = await submit_tool_job(data)
+        
+        return model_response(JobResponse(**await run_in_threadpool(job_store.get, job_id)), status_code=202)
+    
+    except InputValidationError as e:
+        logger.error(f"InputValidationError: {e}")
+
+        return error_response(400, e.message)
     
     except HTTPException as e:
         logger.error(f"HTTPException: {e}")
-        return JSONResponse(
-            status_code=e.status_code,
-            content=jsonable_encoder(ErrorResponse(status=e.status_code, message=e.detail))
-        )
+        return error_response(e.status_code, e.detail)
+
+@router.get("/jobs/{job_id}", response_model=Union[JobResponse, ErrorResponse])
+async def get_job( job_id: str, _ = Depends(key_check)):
+    # SQLite calls run in the thread pool, a write lock held by another worker must not stall the event loop
+    job = await run_in_threadpool(job_store.get, job_id)
+    
+    if job is None:
+        return error_response(404, "Job not found or expired")
+    
+    return model_response(JobResponse(**job))
+
+@router.get("/tool-stats")
+def tool_stats(_ = Depends(key_check)):
+    # Queue wait and run time per tool pool, used to size workers
+    return execution_engine.stats()
+
+@router.get("/cache-stats")
+def cache_stats(_ = Depends(key_check)):
+    # Response cache hits and misses, to track how many tool executions were saved
+    return response_cache.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(_ = Depends(key_check)):
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat( request: ChatRequest, _ = Depends(key_check) ):
@@ -52,7 +164,8 @@ async def chat( request: ChatRequest, _ = Depends(key_check) ):
     chat_messages = request.messages
     user_query = chat_messages[-1].payload.text
     
-    response = kaichat_executor(user_name=user_name, user_query=user_query, messages=chat_messages)
+    async with admission_controller.admit(request.user.id):
+        response = await run_in_threadpool(kaichat_executor, user_name=user_name, user_query=user_query, messages=chat_messages)
     
     formatted_response = Message(
         role="ai",
@@ -60,4 +173,42 @@ async def chat( request: ChatRequest, _ = Depends(key_check) ):
         payload={"text": response}
     )
     
-    return ChatResponse(data=[formatted_response])
\ No newline at end of file
+    return model_response(ChatResponse(data=[formatted_response]))
+
+@router.post("/chat/stream")
+async def chat_stream( request: ChatRequest, _ = Depends(key_check) ):
+    # Same request as /chat, answered as Server-Sent Events: "token" events followed by a final "message" event
+    async with AsyncExitStack() as admission:
+        await admission.enter_async_context(admission_controller.admit(request.user.id))
+        return AdmittedStreamingResponse(chat_sse_stream(request), admission.pop_all(), media_type="text/event-stream", headers=STREAMING_HEADERS)
+
+@router.websocket("/chat/ws")
+async def chat_websocket( websocket: WebSocket ):
+    if not websocket_key_check(websocket):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid API Request Key")
+        return
+    
+    await websocket.accept()
+    
+    try:
+        # Each received ChatRequest is answered with "token" events and a final "message" event
+        while True:
+            payload = await websocket.receive_json()
+            
+            try:
+                request = ChatRequest(**payload)
+            except ValidationError as e:
+                logger.error(f"Invalid chat request over WebSocket: {e}")
+                await websocket.send_text(dumps({"event": "error", "data": ErrorResponse(status=422, message=e.errors(include_url=False, include_context=False))}).decode())
+                continue
+            
+            # Each message is admitted like a /chat request, a rejection is reported and the socket stays open
+            try:
+                async with admission_controller.admit(request.user.id):
+                    async for event, data in chat_events(request):
+                        await websocket.send_text(dumps({"event": event, "data": data}).decode())
+            except AdmissionRejectedError as e:
+                await websocket.send_text(dumps({"event": "error", "data": ErrorResponse(status=429, message=e.message)}).decode())
+    
+    except WebSocketDisconnect:
+        logger.debug("Chat WebSocket disconnected")
@@ -0,0 +1,95 @@
+from contextlib import AsyncExitStack
+from fastapi.responses import StreamingResponse
+from app.services.schemas import ChatRequest, Message
+from app.services.logger import setup_logger
+from app.api.error_utilities import ErrorResponse
+from app.api.tool_utilities import tool_error_to_http_exception
+from app.api.response_utilities import dumps
+
+logger = setup_logger(__name__)
+
+# Headers that stop proxies from buffering a streamed response
+STREAMING_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that closes `admission` once it has been sent or the client went away, so the admission slot
+    is held for as long as the stream runs. A generator that never started would not run its own cleanup.
+    """
+    def __init__(self, content, admission: AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.admission.aclose()
+
+def format_sse(event: str, data) -> str:
+    # One Server-Sent Event, data is JSON encoded on a single line
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+def format_ndjson(data) -> str:
+    return dumps(data).decode() + "\n"
+
+async def chat_events(request: ChatRequest):
+    """
+    Yields (event, data) tuples for a streamed chat response.
+    A "token" event is sent for every chunk from the model, then a single "message" event with the final Message.
+    Errors are reported as an "error" event since the response status has already been sent.
+    """
+    from app.features.Kaichat.core import stream_executor as kaichat_stream_executor
+    
+    user_name = request.user.fullName
+    chat_messages = request.messages
+    user_query = chat_messages[-1].payload.text
+    
+    chunks = []
+    try:
+        async for chunk in kaichat_stream_executor(user_name=user_name, user_query=user_query, messages=chat_messages):
+            chunks.append(chunk)
+            yield "token", {"text": chunk}
+    except Exception as e:
+        logger.error(f"Chat stream failed: {e}")
+        yield "error", ErrorResponse(status=500, message=str(e))
+        return
+    
+    formatted_response = Message(
+        role="ai",
+        type="text",
+        payload={"text": "".join(chunks)}
+    )
+    
+    yield "message", formatted_response
+
+async def chat_sse_stream(request: ChatRequest):
+    async for event, data in chat_events(request):
+        yield format_sse(event, data)
+
+async def tool_records(first_record, records):
+    """
+    Yields the already received first record followed by the rest of a tool stream, nothing when `first_record`
+    is None because the stream was empty. A failure part way through is reported as a final "error" record.
+    """
+    if first_record is None:
+        return
+    yield first_record
+    try:
+        async for record in records:
+            yield record
+    except Exception as e:
+        http_exception = tool_error_to_http_exception(e)
+        logger.error(f"Tool stream failed: {http_exception.detail}")
+        yield {"type": "error", "data": ErrorResponse(status=http_exception.status_code, message=http_exception.detail)}
+
+async def tool_ndjson_stream(first_record, records):
+    async for record in tool_records(first_record, records):
+        yield format_ndjson(record)
+
+async def tool_sse_stream(first_record, records):
+    async for record in tool_records(first_record, records):
+        yield format_sse(record["type"], record["data"])
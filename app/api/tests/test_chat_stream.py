@@ -0,0 +1,71 @@
+import json
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+
+chat_request = {
+    "user": {"id": "1", "fullName": "Ada Lovelace", "email": "ada@example.com"},
+    "type": "chat",
+    "messages": [
+        {"role": "human", "type": "text", "payload": {"text": "How do I teach fractions?"}}
+    ]
+}
+
+async def fake_stream_executor(user_name, user_query, messages, k=10):
+    for chunk in ["Start ", "with ", "pizza."]:
+        yield chunk
+
+async def failing_stream_executor(user_name, user_query, messages, k=10):
+    yield "Start "
+    raise RuntimeError("model unavailable")
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    with TestClient(app) as client:
+        yield client
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+@patch('app.features.Kaichat.core.stream_executor', fake_stream_executor)
+def test_chat_stream_sends_tokens_then_message(client):
+    response = client.post("/chat/stream", json=chat_request, headers={"api-key": "dev"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [event for event, _ in events] == ["token", "token", "token", "message"]
+    assert events[-1][1]["payload"]["text"] == "Start with pizza."
+    assert events[-1][1]["role"] == "ai"
+
+@patch('app.features.Kaichat.core.stream_executor', failing_stream_executor)
+def test_chat_stream_reports_errors_as_event(client):
+    response = client.post("/chat/stream", json=chat_request, headers={"api-key": "dev"})
+
+    events = parse_sse(response.text)
+    assert events[-1][0] == "error"
+    assert "model unavailable" in events[-1][1]["message"]
+
+def test_chat_stream_requires_key(client):
+    response = client.post("/chat/stream", json=chat_request)
+    assert response.status_code == 401
+
+@patch('app.features.Kaichat.core.stream_executor', fake_stream_executor)
+def test_chat_websocket_streams_tokens(client):
+    with client.websocket_connect("/chat/ws?api_key=dev") as websocket:
+        websocket.send_json(chat_request)
+        received = [websocket.receive_json() for _ in range(4)]
+
+    assert [item["event"] for item in received] == ["token", "token", "token", "message"]
+    assert received[-1]["data"]["payload"]["text"] == "Start with pizza."
+
+def test_chat_websocket_rejects_invalid_key(client):
+    with pytest.raises(Exception):
+        with client.websocket_connect("/chat/ws?api_key=wrong") as websocket:
+            websocket.receive_json()
@@ -0,0 +1,62 @@
+import json
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.api.response_utilities import dumps, model_response
+from app.services.schemas import ChatResponse, Message
+from app.main import app
+
+user = {"id": "1", "fullName": "Ada Lovelace", "email": "ada@example.com"}
+
+flashcards = [{"concept": f"Concept {i}", "definition": "A definition long enough to be worth compressing. " * 3} for i in range(40)]
+
+def dynamo_executor(youtube_url, verbose=False):
+    return flashcards
+
+def dynamo_stream_executor(youtube_url, verbose=False):
+    yield from flashcards
+
+def dynamo_request():
+    return {"user": user, "type": "tool", "tool_data": {"tool_id": 1, "inputs": [{"name": "youtube_url", "value": "https://youtu.be/abc"}]}}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    with TestClient(app) as client:
+        yield client
+
+def test_dumps_handles_nested_models_and_enums():
+    message = Message(role="ai", type="text", payload={"text": "hi"})
+
+    assert json.loads(dumps({"data": [message]})) == {"data": [{"role": "ai", "type": "text", "timestamp": None, "payload": {"text": "hi"}}]}
+
+def test_model_response_matches_the_response_model():
+    message = Message(role="ai", type="text", payload={"text": "hi"})
+    response = model_response(ChatResponse(data=[message]))
+
+    assert ChatResponse.model_validate_json(response.body) == ChatResponse(data=[message])
+
+def test_malformed_json_body_is_rejected(client):
+    response = client.post("/submit-tool", content=b'{"user": ', headers={"api-key": "dev", "content-type": "application/json"})
+
+    assert response.status_code == 422
+    assert response.json()["status"] == 422
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=dynamo_executor)
+def test_large_responses_are_gzipped_on_request(mock_get_executor, client):
+    response = client.post("/submit-tool", json=dynamo_request(), headers={"api-key": "dev", "Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["data"] == flashcards
+
+    uncompressed = client.post("/submit-tool", json=dynamo_request(), headers={"api-key": "dev", "Accept-Encoding": "identity"})
+    assert "content-encoding" not in uncompressed.headers
+    assert uncompressed.json()["data"] == flashcards
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=dynamo_stream_executor)
+def test_ndjson_streams_are_not_compressed(mock_get_executor, client):
+    with client.stream("POST", "/submit-tool/stream", json=dynamo_request(), headers={"api-key": "dev", "Accept-Encoding": "gzip"}) as response:
+        assert "content-encoding" not in response.headers
+        records = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert records == flashcards
@@ -0,0 +1,81 @@
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.error_utilities import ModelDeadlineError, ModelUnavailableError
+from app.api.tool_utilities import tool_error_to_http_exception
+
+user = {"id": "1", "fullName": "Ada Lovelace", "email": "ada@example.com"}
+
+def dynamo_request(youtube_url):
+    return {"user": user, "type": "tool", "tool_data": {"tool_id": 1, "inputs": [{"name": "youtube_url", "value": youtube_url}]}}
+
+def slow_executor(youtube_url, verbose=False):
+    time.sleep(0.2)
+    if youtube_url == "fail":
+        raise ValueError("transcript unavailable")
+    return [{"concept": youtube_url, "definition": "ok"}]
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    with TestClient(app) as client:
+        yield client
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=slow_executor)
+def test_batch_runs_items_concurrently(mock_get_executor, client):
+    batch = {"requests": [dynamo_request(f"video-{i}") for i in range(4)]}
+
+    started_at = time.time()
+    response = client.post("/submit-tools-batch", json=batch, headers={"api-key": "dev"})
+    elapsed = time.time() - started_at
+
+    assert response.status_code == 200
+    results = response.json()["data"]
+    assert [result["data"][0]["concept"] for result in results] == [f"video-{i}" for i in range(4)]
+    assert elapsed < 0.6
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=slow_executor)
+def test_batch_reports_errors_per_item(mock_get_executor, client):
+    invalid = dynamo_request("video")
+    invalid["tool_data"]["inputs"] = []
+    batch = {"requests": [dynamo_request("video"), invalid, dynamo_request("fail"), {**dynamo_request("video"), "tool_data": {"tool_id": 42, "inputs": []}}]}
+
+    response = client.post("/submit-tools-batch", json=batch, headers={"api-key": "dev"})
+
+    results = response.json()["data"]
+    assert [result["status"] for result in results] == [200, 400, 500, 404]
+    assert results[1]["error"]["message"] == "Missing input: `youtube_url`"
+    assert mock_get_executor.call_count == 2
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=slow_executor)
+def test_batch_respects_requested_concurrency(mock_get_executor, client):
+    batch = {"requests": [dynamo_request(f"video-{i}") for i in range(3)], "max_concurrency": 1}
+
+    started_at = time.time()
+    client.post("/submit-tools-batch", json=batch, headers={"api-key": "dev"})
+
+    assert time.time() - started_at >= 0.6
+
+def test_batch_rejects_invalid_concurrency(client):
+    batch = {"requests": [dynamo_request("video")], "max_concurrency": 0}
+
+    response = client.post("/submit-tools-batch", json=batch, headers={"api-key": "dev"})
+
+    assert response.status_code == 400
+
+def model_failing_executor(youtube_url, verbose=False):
+    if youtube_url == "unavailable":
+        raise ModelUnavailableError("gemini-1.5-pro is unavailable, its circuit breaker is open")
+    raise ModelDeadlineError("gemini-1.5-pro did not answer within 30.0s")
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=model_failing_executor)
+def test_model_failures_are_answered_with_503_and_504(mock_get_executor, client):
+    batch = {"requests": [dynamo_request("unavailable"), dynamo_request("deadline")]}
+
+    response = client.post("/submit-tools-batch", json=batch, headers={"api-key": "dev"})
+
+    assert [result["status"] for result in response.json()["data"]] == [503, 504]
+    assert tool_error_to_http_exception(ModelUnavailableError("open")).status_code == 503
+    assert tool_error_to_http_exception(ModelDeadlineError("late")).status_code == 504
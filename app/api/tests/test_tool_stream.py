@@ -0,0 +1,92 @@
+import json
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.error_utilities import ToolExecutorError
+
+def quiz_request(num_questions=2):
+    return {
+        "user": {"id": "1", "fullName": "Ada Lovelace", "email": "ada@example.com"},
+        "type": "tool",
+        "tool_data": {
+            "tool_id": 0,
+            "inputs": [
+                {"name": "topic", "value": "Linear regression"},
+                {"name": "num_questions", "value": num_questions},
+                {"name": "files", "value": [{"url": "https://example.com/test.pdf"}]}
+            ]
+        }
+    }
+
+def fake_stream_executor(files, topic, num_questions, verbose=False):
+    for i in range(num_questions):
+        yield {"type": "question", "data": {"question": f"Question {i + 1}"}}
+    yield {"type": "summary", "data": {"requested": num_questions, "generated": num_questions, "attempts": num_questions}}
+
+def failing_stream_executor(files, topic, num_questions, verbose=False):
+    raise ToolExecutorError("Unable to load any files from URLs")
+    yield
+
+def empty_stream_executor(files, topic, num_questions, verbose=False):
+    return
+    yield
+
+def failing_after_first_stream_executor(files, topic, num_questions, verbose=False):
+    yield {"type": "question", "data": {"question": "Question 1"}}
+    raise ValueError("Error in executor: model unavailable")
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    with TestClient(app) as client:
+        yield client
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=fake_stream_executor)
+def test_stream_quiz_as_ndjson(mock_get_executor, client):
+    response = client.post("/submit-tool/stream", json=quiz_request(), headers={"api-key": "dev"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["type"] for record in records] == ["question", "question", "summary"]
+    assert records[-1]["data"]["generated"] == 2
+    mock_get_executor.assert_called_once_with(0, "stream_executor")
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=fake_stream_executor)
+def test_stream_quiz_as_sse(mock_get_executor, client):
+    response = client.post("/submit-tool/stream", json=quiz_request(), headers={"api-key": "dev", "accept": "text/event-stream"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("event: question\n") == 2
+    assert "event: summary\n" in response.text
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=failing_stream_executor)
+def test_stream_failure_before_first_record_returns_status(mock_get_executor, client):
+    response = client.post("/submit-tool/stream", json=quiz_request(), headers={"api-key": "dev"})
+
+    assert response.status_code == 400
+    assert response.json()["message"] == "Unable to load any files from URLs"
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=failing_after_first_stream_executor)
+def test_stream_failure_after_first_record_is_reported_inline(mock_get_executor, client):
+    response = client.post("/submit-tool/stream", json=quiz_request(), headers={"api-key": "dev"})
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["type"] for record in records] == ["question", "error"]
+    assert records[-1]["data"]["status"] == 500
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=empty_stream_executor)
+def test_stream_without_records_is_empty(mock_get_executor, client):
+    response = client.post("/submit-tool/stream", json=quiz_request(), headers={"api-key": "dev"})
+
+    assert response.status_code == 200
+    assert response.text == ""
+
+def test_stream_rejects_invalid_inputs(client):
+    request = quiz_request()
+    request["tool_data"]["inputs"] = request["tool_data"]["inputs"][:1]
+
+    response = client.post("/submit-tool/stream", json=request, headers={"api-key": "dev"})
+
+    assert response.status_code == 400
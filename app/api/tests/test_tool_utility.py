@@ -1,9 +1,14 @@
 import json
+import os
+import subprocess
+import sys
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
 from app.services.tool_registry import BaseTool, ToolInput, ToolFile
 from fastapi import HTTPException
+from app.services.tool_registry import ToolRegistry
 from app.api.tool_utilities import get_executor_by_name, load_tool_metadata, prepare_input_data, execute_tool
+import app.api.tool_utilities as tool_utilities
 
 # Sample configuration for tools_config
 tools_config = {
@@ -21,10 +26,10 @@ tools_config = {
 
 # Mock data for load_tool_metadata
 metadata = {
-    "inputs": {
-        "topic": "Math",
-        "num_questions": 1
-    }
+    "inputs": [
+        {"label": "Topic", "name": "topic", "type": "text"},
+        {"label": "Number of Questions", "name": "num_questions", "type": "number"}
+    ]
 }
 
 @patch('builtins.__import__')
@@ -42,10 +47,17 @@ def test_get_executor_by_name(mock_import):
     assert executor() == "function result"
     mock_function.assert_called_once()  # Ensuring that the function setup is being called correctly
 
+@pytest.fixture
+def fresh_registry():
+    # A registry that has not loaded anything yet, so file access can be mocked
+    registry = ToolRegistry(tool_utilities.tools_config, tool_utilities.tool_registry.base_dir, get_executor_by_name)
+    with patch('app.api.tool_utilities.tool_registry', registry):
+        yield registry
+
 @patch('os.path.exists')
 @patch('os.path.getsize')
 @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(metadata))
-def test_load_tool_metadata_success(mock_file, mock_getsize, mock_exists):
+def test_load_tool_metadata_success(mock_file, mock_getsize, mock_exists, fresh_registry):
     mock_exists.return_value = True
     mock_getsize.return_value = 100  # simulate non-empty file
 
@@ -53,11 +65,98 @@ def test_load_tool_metadata_success(mock_file, mock_getsize, mock_exists):
     assert data == metadata  # assert that returned data matches the mock metadata
 
 @patch('os.path.exists', return_value=False)
-def test_load_tool_metadata_not_found(mock_exists):
+def test_load_tool_metadata_not_found(mock_exists, fresh_registry):
     with pytest.raises(HTTPException) as exc_info:
         load_tool_metadata("0")
     assert exc_info.value.status_code == 404
 
+def test_load_tool_metadata_is_cached(fresh_registry):
+    first = load_tool_metadata("0")
+
+    with patch('builtins.open', side_effect=AssertionError("metadata re-read from disk")):
+        assert load_tool_metadata("0") is first
+
+def test_tool_registry_reloads_changed_metadata(tmp_path):
+    feature_dir = tmp_path / "features" / "sample"
+    feature_dir.mkdir(parents=True)
+    metadata_file = feature_dir / "metadata.json"
+    metadata_file.write_text(json.dumps({"inputs": [{"name": "topic", "type": "text"}]}))
+    registry = ToolRegistry({"0": {"path": "features.sample.core", "metadata_file": "metadata.json"}}, str(tmp_path), get_executor_by_name, reload_interval=0)
+    registry.build(import_executors=False)
+
+    metadata_file.write_text(json.dumps({"inputs": [{"name": "youtube_url", "type": "string"}]}))
+    registry.get("0").mtime -= 1  # Filesystems with coarse mtimes may not see the rewrite
+
+    assert registry.get("0").input_types == {"youtube_url": "string"}
+
+def test_tool_registry_keeps_loaded_metadata_when_the_new_file_is_invalid(tmp_path):
+    feature_dir = tmp_path / "features" / "sample"
+    feature_dir.mkdir(parents=True)
+    metadata_file = feature_dir / "metadata.json"
+    metadata_file.write_text(json.dumps({"inputs": [{"name": "topic", "type": "text"}]}))
+    registry = ToolRegistry({"0": {"path": "features.sample.core", "metadata_file": "metadata.json"}}, str(tmp_path), get_executor_by_name, reload_interval=0)
+    registry.build(import_executors=False)
+
+    metadata_file.write_text('{"inputs": [')
+    registry.get("0").mtime -= 1
+
+    assert registry.get("0").input_types == {"topic": "text"}
+    assert registry.get("0").mtime == os.stat(metadata_file).st_mtime
+
+def test_tool_registry_warmup_skips_executors_a_tool_does_not_define(tmp_path, monkeypatch, caplog):
+    feature_dir = tmp_path / "warmup_feature"
+    feature_dir.mkdir()
+    (feature_dir / "__init__.py").write_text("")
+    (feature_dir / "core.py").write_text("def executor():\n    return 'done'\n")
+    (feature_dir / "metadata.json").write_text(json.dumps({"inputs": []}))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    registry = ToolRegistry({"0": {"path": "warmup_feature.core", "metadata_file": "metadata.json"}}, str(tmp_path), get_executor_by_name)
+    registry.build(import_executors=False)
+
+    registry.import_executors()
+
+    assert set(registry.get("0").executors) == {"executor"}
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+def test_tool_registry_warmup_skips_executors_a_tool_does_not_define(tmp_path, monkeypatch, caplog):
+    feature_dir = tmp_path / "warmup_feature"
+    feature_dir.mkdir()
+    (feature_dir / "__init__.py").write_text("")
+    (feature_dir / "core.py").write_text("def executor():\n    return 'done'\n")
+    (feature_dir / "metadata.json").write_text(json.dumps({"inputs": []}))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    registry = ToolRegistry({"0": {"path": "warmup_feature.core", "metadata_file": "metadata.json"}}, str(tmp_path), get_executor_by_name)
+    registry.build(import_executors=False)
+
+    registry.import_executors()
+
+    assert set(registry.get("0").executors) == {"executor"}
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+def test_tool_registry_unknown_tool():
+    registry = ToolRegistry({}, ".", get_executor_by_name)
+    with pytest.raises(HTTPException) as exc_info:
+        registry.get("7")
+    assert exc_info.value.status_code == 404
+
+def test_tool_registry_defers_executor_imports():
+    loader = MagicMock(return_value=lambda **kwargs: kwargs)
+    registry = ToolRegistry(tool_utilities.tools_config, tool_utilities.tool_registry.base_dir, loader)
+    registry.build(import_executors=False)
+    loader.assert_not_called()
+
+    registry.import_executors()
+    assert loader.call_count == 2 * len(tool_utilities.tools_config)
+    registry.get_executor("0")
+    assert loader.call_count == 2 * len(tool_utilities.tools_config)
+
+def test_app_import_does_not_load_features():
+    code = "import sys, app.main; print(any(name.startswith(('langchain', 'chromadb', 'pypdf')) for name in sys.modules))"
+    root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.join(root_dir, 'app'), root_dir])}
+    completed = subprocess.run([sys.executable, "-c", code], cwd=root_dir, env=env, capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "False"
+
 def test_prepare_input_data():
     request_data = BaseTool(
         tool_id=0,
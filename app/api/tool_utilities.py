@@ -1,11 +1,20 @@
+import asyncio
 import json
 import os
+import time
 from app.services.logger import setup_logger
-from app.services.tool_registry import ToolFile
-from app.api.error_utilities import VideoTranscriptError, InputValidationError, ToolExecutorError
-from typing import Dict, Any, List
+from app.services.tool_registry import ToolRegistry
+from app.services.input_validation import CompiledInputValidator
+from app.services.execution_engine import ExecutionEngine
+from app.services.response_cache import response_cache, request_cache_key
+from app.services.metrics import metrics, tool_latency, validation_failures, coalesced_requests
+from app.services.single_flight import SingleFlight
+from app.services.tracing import tracer
+from app.api.error_utilities import VideoTranscriptError, InputValidationError, ToolExecutorError, AdmissionRejectedError, ModelUnavailableError, ModelDeadlineError
+from typing import Dict, Any, List, Tuple, Union
+from contextlib import nullcontext
+from functools import lru_cache
 from fastapi import HTTPException
-from pydantic import ValidationError
 
 logger = setup_logger(__name__)
 
@@ -16,124 +25,135 @@ def load_config():
 
 tools_config = load_config()
 
-def get_executor_by_name(module_path):
+execution_engine = ExecutionEngine(tools_config)
+
+# Upper bound on concurrently running items of one batch, and on the number of items a batch may contain
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 8))
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 100))
+
+# Identical concurrent requests to a cached tool share one execution
+tool_flights = SingleFlight()
+
+# Verbose tool logging (full LLM responses, file lists) is opt-in as it multiplies log volume per request
+TOOL_VERBOSE = os.environ.get("TOOL_VERBOSE", "false").lower() == "true"
+
+def get_executor_by_name(module_path, executor_name='executor'):
     try:
-        module = __import__(module_path, fromlist=['executor'])
-        return getattr(module, 'executor')
+        module = __import__(module_path, fromlist=[executor_name])
     except Exception as e:
         logger.error(f"Failed to import executor from {module_path}: {str(e)}")
         raise ImportError(f"Failed to import module from {module_path}: {str(e)}")
+    
+    if not hasattr(module, executor_name):
+        # Only `executor` is required, most tools have no stream_executor and that is not worth an error
+        if executor_name == 'executor':
+            logger.error(f"Module {module_path} has no executor")
+        raise ImportError(f"Module {module_path} has no {executor_name}")
+    
+    return getattr(module, executor_name)
+
+# Built once in the application lifespan, tools not yet built are registered on first use
+tool_registry = ToolRegistry(
+    tools_config,
+    base_dir=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+    executor_loader=get_executor_by_name
+)
 
 def load_tool_metadata(tool_id):
     logger.debug(f"Loading tool metadata for tool_id: {tool_id}")
-    tool_config = tools_config.get(str(tool_id))
-    
-    if not tool_config:
-        logger.error(f"No tool configuration found for tool_id: {tool_id}")
-        raise HTTPException(status_code=404, detail="Tool configuration not found")
-    
-    # Ensure the base path is relative to the current file's directory
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    logger.debug(f"Base directory: {base_dir}")
-    
-    # Construct the directory path
-    module_dir_path = os.path.join(base_dir, '..', *tool_config['path'].split('.')[:-1])  # Go one level up and then to the path
-    module_dir_path = os.path.abspath(module_dir_path)  # Get absolute path
-    logger.debug(f"Module directory path: {module_dir_path}")
-    
-    file_path = os.path.join(module_dir_path, tool_config['metadata_file'])
-    logger.debug(f"Checking metadata file at: {file_path}")
-    
-    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
-        logger.error(f"Metadata file missing or empty at: {file_path}")
-        raise HTTPException(status_code=404, detail="Tool metadata not found")
-    
-    with open(file_path, 'r') as f:
-        metadata = json.load(f)
-        
-    logger.debug(f"Loaded metadata: {metadata}")
-    return metadata
+    return tool_registry.get(tool_id).metadata
 
 def prepare_input_data(input_data) -> Dict[str, Any]:
     inputs = {input.name: input.value for input in input_data}
     return inputs
 
-def check_missing_inputs(request_data: Dict[str, Any], validate_inputs: Dict[str, str]):
-    for validate_input_name in validate_inputs:
-        if validate_input_name not in request_data:
-            error_message = f"Missing input: `{validate_input_name}`"
-            logger.error(error_message)
-            raise InputValidationError(error_message)
-
-def raise_type_error(input_name: str, input_value: Any, expected_type: str):
-    error_message = f"Input `{input_name}` must be a {expected_type} but got {type(input_value)}"
-    logger.error(error_message)
-    raise InputValidationError(error_message)
-
-def validate_file_input(input_name: str, input_value: Any):
-    if not isinstance(input_value, list):
-        error_message = f"Input `{input_name}` must be a list of file dictionaries but got {type(input_value)}"
-        logger.error(error_message)
-        raise InputValidationError(error_message)
-    
-    for file_obj in input_value:
-        if not isinstance(file_obj, dict):
-            error_message = f"Each item in the input `{input_name}` must be a dictionary representing a file but got {type(file_obj)}"
-            logger.error(error_message)
-            raise InputValidationError(error_message)
-        try:
-            ToolFile.model_validate(file_obj, from_attributes=True)  # This will raise a validation error if the structure is incorrect
-        except ValidationError:
-            error_message = f"Each item in the input `{input_name}` must be a valid ToolFile where a URL is provided"
-            logger.error(error_message)
-            raise InputValidationError(error_message)
-
-def validate_input_type(input_name: str, input_value: Any, expected_type: str):
-    if expected_type == 'text' and not isinstance(input_value, str):
-        raise_type_error(input_name, input_value, "string")
-    elif expected_type == 'number' and not isinstance(input_value, (int, float)):
-        raise_type_error(input_name, input_value, "number")
-    elif expected_type == 'file':
-        validate_file_input(input_name, input_value)
-
-def validate_inputs(request_data: Dict[str, Any], validate_data: List[Dict[str, str]]) -> bool:
-    validate_inputs = {input_item['name']: input_item['type'] for input_item in validate_data}
-    
-    # Check for missing inputs
-    check_missing_inputs(request_data, validate_inputs)
-
-    # Validate each input in request data against validate definitions
-    for input_name, input_value in request_data.items():
-        if input_name not in validate_inputs:
-            continue  # Skip validation for extra inputs not defined in validate_inputs
-
-        expected_type = validate_inputs[input_name]
-        validate_input_type(input_name, input_value, expected_type)
+@lru_cache(maxsize=128)
+def _compiled_validator(input_spec: Tuple[Tuple[str, str], ...]) -> CompiledInputValidator:
+    return CompiledInputValidator([{'name': name, 'type': input_type} for name, input_type in input_spec])
 
-    return True
+def get_input_validator(validate_data: Union[List[Dict[str, str]], Dict[str, str]]) -> CompiledInputValidator:
+    # validate_data is either the metadata input list or a name -> type map, compiled validators are cached per spec
+    if isinstance(validate_data, dict):
+        input_spec = tuple(validate_data.items())
+    else:
+        input_spec = tuple((input_item['name'], input_item['type']) for input_item in validate_data)
+    return _compiled_validator(input_spec)
 
-def convert_files_to_tool_files(inputs: Dict[str, Any]) -> Dict[str, Any]:
-    if 'files' in inputs:
-        inputs['files'] = [ToolFile(**file_object) for file_object in inputs['files']]
-    return inputs
+def validate_inputs(request_data: Dict[str, Any], validate_data: Union[List[Dict[str, str]], Dict[str, str]]) -> bool:
+    get_input_validator(validate_data).validate(request_data)
+    return True
 
-def finalize_inputs(input_data, validate_data: List[Dict[str, str]]) -> Dict[str, Any]:
+def finalize_inputs(input_data, validate_data: Union[List[Dict[str, str]], Dict[str, str]]) -> Dict[str, Any]:
+    # Validation and conversion of file inputs to ToolFile happen in the same pass
     inputs = prepare_input_data(input_data)
-    validate_inputs(inputs, validate_data)
-    inputs = convert_files_to_tool_files(inputs)
-    return inputs
+    return get_input_validator(validate_data).validate(inputs)
 
-def execute_tool(tool_id, request_inputs_dict):
+def prepare_tool_inputs(request_data) -> Dict[str, Any]:
+    # Validates a BaseTool's inputs with the validator compiled when the tool was registered
+    requested_tool = tool_registry.get(request_data.tool_id)
+    try:
+        return requested_tool.validator.validate(prepare_input_data(request_data.inputs))
+    except InputValidationError:
+        validation_failures.inc(tool_id=request_data.tool_id)
+        raise
+
+def cached_tool_key(tool_id, request_inputs_dict, tool_config, use_cache=True):
+    # Returns the response cache key for a request, or None when the tool is not cached or the caller bypasses the cache
+    if "cache" not in tool_config:
+        return None
+    
+    if not use_cache:
+        response_cache.record_bypass()
+        return None
+    
+    try:
+        return request_cache_key(tool_id, request_inputs_dict)
+    except Exception as e:
+        # Files that cannot be fingerprinted are left for the tool itself to report
+        logger.warning(f"Skipping response cache for tool {tool_id}: {str(e)}")
+        return None
+
+def flight_key(tool_id, request_inputs_dict, use_cache=True):
+    # Key under which identical in-flight requests are coalesced, or None when the tool does not opt into caching.
+    # Files are identified by URL here, fingerprinting their content would mean downloading them on the event loop
+    tool_config = tools_config.get(str(tool_id))
+    if not tool_config or "cache" not in tool_config:
+        return None
+    try:
+        return (request_cache_key(tool_id, request_inputs_dict, fingerprint=str), use_cache)
+    except Exception as e:
+        logger.warning(f"Not coalescing request for tool {tool_id}: {str(e)}")
+        return None
+
+def execute_tool(tool_id, request_inputs_dict, use_cache=True):
+    with tracer.span("execute_tool", **{"tool.id": str(tool_id)}) as span:
+        return _execute_tool(tool_id, request_inputs_dict, use_cache, span)
+
+def _execute_tool(tool_id, request_inputs_dict, use_cache, span):
     try:
         tool_config = tools_config.get(str(tool_id))
         
         if not tool_config:
             raise HTTPException(status_code=404, detail="Tool executable not found")
         
-        execute_function = get_executor_by_name(tool_config['path'])
-        request_inputs_dict['verbose'] = True
+        cache_key = cached_tool_key(tool_id, request_inputs_dict, tool_config, use_cache)
+        if cache_key is not None:
+            cached_result = response_cache.get(cache_key)
+            if span is not None:
+                span.set_attribute("cache.hit", cached_result is not None)
+            if cached_result is not None:
+                logger.info(f"Serving tool {tool_id} from the response cache")
+                return cached_result
+        
+        execute_function = tool_registry.get_executor(tool_id)
+        request_inputs_dict['verbose'] = TOOL_VERBOSE
+        
+        result = execute_function(**request_inputs_dict)
         
-        return execute_function(**request_inputs_dict)
+        if cache_key is not None:
+            response_cache.set(cache_key, result, tool_config["cache"].get("ttl_seconds", 86400))
+        
+        return result
     
     except VideoTranscriptError as e:
         logger.error(f"Failed to execute tool due to video transcript error: {str(e)}")
@@ -143,10 +163,134 @@ def execute_tool(tool_id, request_inputs_dict):
         logger.error(f"Failed to execute tool due to executor error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
     
+    except ModelUnavailableError as e:
+        logger.error(f"Failed to execute tool, the model is unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    except ModelDeadlineError as e:
+        logger.error(f"Failed to execute tool, the model did not answer in time: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+    
     except ImportError as e:
         logger.error(f"Failed to execute tool due to import error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     
     except Exception as e:
         logger.error(f"Encountered error in executing tool: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def run_tool(tool_id, request_inputs_dict, use_cache=True):
+    # Runs execute_tool on the tool's bounded worker pool so the event loop stays free
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        key = flight_key(tool_id, request_inputs_dict, use_cache)
+        if key is None:
+            result = await execution_engine.run(tool_id, execute_tool, tool_id, request_inputs_dict, use_cache)
+        else:
+            result = await tool_flights.run(
+                key,
+                lambda: execution_engine.run(tool_id, execute_tool, tool_id, request_inputs_dict, use_cache),
+                on_coalesced=lambda: coalesced_requests.inc(tool_id=tool_id)
+            )
+        status = 200
+        return result
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        tool_latency.observe(time.perf_counter() - started_at, tool_id=tool_id, status=status)
+
+def stream_tool(tool_id, request_inputs_dict):
+    """
+    Returns an async iterator over the records produced by the tool's `stream_executor`.
+    Raises HTTPException if the tool does not exist or does not support streaming.
+    """
+    tool_config = tools_config.get(str(tool_id))
+    
+    if not tool_config:
+        raise HTTPException(status_code=404, detail="Tool executable not found")
+    
+    try:
+        stream_function = tool_registry.get_executor(tool_id, 'stream_executor')
+    except ImportError:
+        raise HTTPException(status_code=400, detail=f"Tool {tool_id} does not support streaming")
+    
+    request_inputs_dict['verbose'] = TOOL_VERBOSE
+    
+    return execution_engine.stream(tool_id, stream_function, **request_inputs_dict)
+
+def collect_tool_metrics():
+    # Pool occupancy and response cache counters, read when /metrics is scraped
+    pools = execution_engine.stats()
+    cache = response_cache.stats()
+    return [
+        ("kai_tool_pool_running", "gauge", "Tool executions running on the pool.", [({"tool_id": tool_id}, pool["running"]) for tool_id, pool in pools.items()]),
+        ("kai_tool_pool_queued", "gauge", "Tool executions waiting for a pool worker.", [({"tool_id": tool_id}, pool["queued"]) for tool_id, pool in pools.items()]),
+        ("kai_tool_pool_rejected_total", "counter", "Tool executions rejected by a full pool.", [({"tool_id": tool_id}, pool["rejected"]) for tool_id, pool in pools.items()]),
+        ("kai_response_cache_lookups_total", "counter", "Response cache lookups by result.", [
+            ({"result": "hit"}, cache["hits"]),
+            ({"result": "disk_hit"}, cache["disk_hits"]),
+            ({"result": "miss"}, cache["misses"]),
+            ({"result": "bypass"}, cache["bypasses"])
+        ]),
+        ("kai_response_cache_bytes", "gauge", "Bytes held by the in-memory response cache.", [({}, cache["bytes"])])
+    ]
+
+metrics.register_collector(collect_tool_metrics)
+
+def tool_error_to_http_exception(e: Exception) -> HTTPException:
+    # Same status mapping as execute_tool, for errors raised while a tool is streaming
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, (VideoTranscriptError, ToolExecutorError)):
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, ModelUnavailableError):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, ModelDeadlineError):
+        return HTTPException(status_code=504, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
+async def run_tool_batch(tool_requests, max_concurrency=None, slot=nullcontext) -> List[Dict[str, Any]]:
+    """
+    Validates every request up front, then runs the valid ones concurrently, at most `max_concurrency` at a time.
+    Each item runs inside `slot()`, an item whose slot is refused gets a 429.
+    Returns one result per request, in request order, each holding either `data` or an `error`.
+    """
+    if len(tool_requests) > BATCH_MAX_SIZE:
+        raise InputValidationError(f"Batch contains {len(tool_requests)} requests but at most {BATCH_MAX_SIZE} are allowed")
+    
+    fan_out = BATCH_MAX_CONCURRENCY if max_concurrency is None else min(max_concurrency, BATCH_MAX_CONCURRENCY)
+    if fan_out < 1:
+        raise InputValidationError("`max_concurrency` must be at least 1")
+    
+    results = [None] * len(tool_requests)
+    runnable = []
+    
+    for index, tool_request in enumerate(tool_requests):
+        request_data = tool_request.tool_data
+        try:
+            request_inputs_dict = prepare_tool_inputs(request_data)
+            runnable.append((index, request_data.tool_id, request_inputs_dict))
+        except InputValidationError as e:
+            results[index] = {"index": index, "status": 400, "error": {"status": 400, "message": e.message}}
+        except HTTPException as e:
+            results[index] = {"index": index, "status": e.status_code, "error": {"status": e.status_code, "message": e.detail}}
+    
+    semaphore = asyncio.Semaphore(fan_out)
+    
+    async def run_item(index, tool_id, request_inputs_dict):
+        async with semaphore:
+            try:
+                async with slot():
+                    data = await run_tool(tool_id, request_inputs_dict)
+                results[index] = {"index": index, "status": 200, "data": data}
+            except AdmissionRejectedError as e:
+                results[index] = {"index": index, "status": 429, "error": {"status": 429, "message": e.message}}
+            except HTTPException as e:
+                results[index] = {"index": index, "status": e.status_code, "error": {"status": e.status_code, "message": e.detail}}
+    
+    await asyncio.gather(*(run_item(*item) for item in runnable))
+    
+    logger.info(f"Completed batch of {len(tool_requests)} requests with fan-out {fan_out}")
+    return results
@@ -0,0 +1,15 @@
+import pytest
+from app.services.admission import admission_controller, InMemoryRateLimitBackend
+from app.services.response_cache import response_cache
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    # Tool responses are cached process wide, start every test from an empty cache
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits(monkeypatch):
+    # Rate limits are process wide too, every test starts with full buckets
+    monkeypatch.setattr(admission_controller, "backend", InMemoryRateLimitBackend())
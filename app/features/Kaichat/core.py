@@ -1,6 +1,6 @@
-from langchain_google_genai import GoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from app.services.schemas import ChatMessage, Message
+from app.services.model_provider import model_registry
 import os
 
 def read_text_file(file_path):
@@ -27,10 +27,9 @@ def build_prompt():
     return prompt
 
 
-def executor(user_name: str, user_query: str, messages: list[Message], k=10):
-    
+def build_chat_context(messages: list[Message], k=10):
     # create a memory list of last k = 3 messages
-    chat_context = [
+    return [
         ChatMessage(
             role=message.role, 
             type=message.type, 
@@ -38,12 +37,32 @@ def executor(user_name: str, user_query: str, messages: list[Message], k=10):
         ) for message in messages[-k:]
     ]
 
+def build_chain():
     prompt = build_prompt()
     
-    llm = GoogleGenerativeAI(model="gemini-1.0-pro") 
+    llm = model_registry.llm("gemini-1.0-pro")
+    
+    return prompt | llm
+
+def executor(user_name: str, user_query: str, messages: list[Message], k=10):
+    
+    chat_context = build_chat_context(messages, k)
     
-    chain =  prompt | llm
+    chain = build_chain()
     
     response = chain.invoke({"chat_history": chat_context, "user_name": user_name, "user_query": user_query})
     
     return response
+
+async def stream_executor(user_name: str, user_query: str, messages: list[Message], k=10):
+    """
+    Streams the response text chunk by chunk as the model generates it.
+    Runs on the async LLM path so no thread is held while waiting on the model.
+    """
+    
+    chat_context = build_chat_context(messages, k)
+    
+    chain = build_chain()
+    
+    async for chunk in chain.astream({"chat_history": chat_context, "user_name": user_name, "user_query": user_query}):
+        yield chunk
@@ -1,20 +1,21 @@
 from langchain_community.document_loaders import YoutubeLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import GoogleGenerativeAI
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.chains.summarize import load_summarize_chain
 from langchain_core.pydantic_v1 import BaseModel, Field
 from app.api.error_utilities import VideoTranscriptError
 from fastapi import HTTPException
 from app.services.logger import setup_logger
+from app.services.model_provider import model_registry
 import os
 
 
 logger = setup_logger(__name__)
 
-# AI Model
-model = GoogleGenerativeAI(model="gemini-1.0-pro")
+# AI Model, a shared client created on first use so importing this module does not need credentials
+def get_model():
+    return model_registry.llm("gemini-1.0-pro")
 
 
 def read_text_file(file_path):
@@ -67,7 +68,7 @@ def summarize_transcript(youtube_url: str, max_video_length=600, verbose=False)
     prompt_template = read_text_file("prompt/summarize-prompt.txt")
     summarize_prompt = PromptTemplate.from_template(prompt_template)
 
-    summarize_model = GoogleGenerativeAI(model="gemini-1.5-flash")
+    summarize_model = model_registry.llm("gemini-1.5-flash")
     
     chain = summarize_prompt | summarize_model 
     
@@ -88,7 +89,7 @@ def generate_flashcards(summary: str, verbose=False) -> list:
         partial_variables={"format_instructions": parser.get_format_instructions()}
     )
     
-    cards_chain = cards_prompt | model | parser
+    cards_chain = cards_prompt | get_model() | parser
     
     try:
         response = cards_chain.invoke({"summary": summary, "examples": examples})
@@ -2,9 +2,10 @@ from app.services.tool_registry import ToolFile
 from app.services.logger import setup_logger
 from app.features.quizzify.tools import RAGpipeline
 from app.features.quizzify.tools import QuizBuilder
-from app.api.error_utilities import LoaderError, ToolExecutorError
+from app.api.error_utilities import LoaderError, ToolExecutorError, ModelDeadlineError, ModelUnavailableError
+import time
 
-logger = setup_logger()
+logger = setup_logger(__name__)
 
 def executor(files: list[ToolFile], topic: str, num_questions: int, verbose=False):
     
@@ -27,6 +28,10 @@ def executor(files: list[ToolFile], topic: str, num_questions: int, verbose=Fals
         logger.error(f"Error in RAGPipeline -> {error_message}")
         raise ToolExecutorError(error_message)
     
+    except (ModelUnavailableError, ModelDeadlineError):
+        # Passed through so the API answers 503/504 and jobs can retry
+        raise
+    
     except Exception as e:
         error_message = f"Error in executor: {e}"
         logger.error(error_message)
@@ -34,3 +39,52 @@ def executor(files: list[ToolFile], topic: str, num_questions: int, verbose=Fals
     
     return output
 
+def stream_executor(files: list[ToolFile], topic: str, num_questions: int, verbose=False):
+    """
+    Streaming variant of executor. Yields a {"type": "question"} record for every validated question,
+    followed by a single {"type": "summary"} record.
+    """
+    started_at = time.time()
+    
+    if num_questions > 10:
+        raise ToolExecutorError("Number of questions cannot exceed 10")
+    
+    try:
+        if verbose: logger.debug(f"Files: {files}")
+
+        pipeline = RAGpipeline(verbose=verbose)
+        
+        pipeline.compile()
+        
+        db = pipeline(files)
+        
+        builder = QuizBuilder(db, topic, verbose=verbose)
+        
+        generated = 0
+        for question in builder.generate_questions(num_questions):
+            generated += 1
+            yield {"type": "question", "data": question}
+    
+    except LoaderError as e:
+        error_message = e
+        logger.error(f"Error in RAGPipeline -> {error_message}")
+        raise ToolExecutorError(error_message)
+    
+    except (ModelUnavailableError, ModelDeadlineError):
+        # Passed through so the API answers 503/504 and jobs can retry
+        raise
+    
+    except Exception as e:
+        error_message = f"Error in executor: {e}"
+        logger.error(error_message)
+        raise ValueError(error_message)
+    
+    yield {
+        "type": "summary",
+        "data": {
+            "requested": num_questions,
+            "generated": generated,
+            "attempts": builder.attempts,
+            "elapsed_seconds": round(time.time() - started_at, 3)
+        }
+    }
@@ -1,7 +1,9 @@
 import pytest
+from io import BytesIO
 from unittest.mock import patch, MagicMock
 from app.services.tool_registry import ToolFile
 from app.features.quizzify.tools import URLLoader, BytesFilePDFLoader, Document  # Adjust the import path as necessary
+from app.services.downloads import downloader
 
 @pytest.fixture
 def pdf_loader():
@@ -11,7 +13,7 @@ def pdf_loader():
 def url_loader(pdf_loader):
     return URLLoader(file_loader=pdf_loader, expected_file_type="pdf")
 
-@patch('requests.get')
+@patch.object(downloader.session, 'get')
 def test_load_pdf_from_url(mock_get, url_loader):
     
     pdf_file_path = "features/quizzify/tests/test.pdf"
@@ -19,10 +21,11 @@ def test_load_pdf_from_url(mock_get, url_loader):
     with open(pdf_file_path, 'rb') as file:
         mock_pdf_content = file.read()
     
-    # Mocking the response of requests.get
+    # Mocking the response of the download session
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.content = mock_pdf_content
+    mock_response.headers = {"Content-Type": "application/pdf"}
+    mock_response.iter_content.return_value = [mock_pdf_content]
     mock_get.return_value = mock_response
 
     # The URL you're testing with (doesn't matter in this case since it's mocked)
@@ -38,17 +41,18 @@ def test_load_pdf_from_url(mock_get, url_loader):
     assert isinstance(documents, list)
     assert len(documents) == 1
 
-@patch('requests.get')
+@patch.object(downloader.session, 'get')
 def test_load_pdf_from_url(mock_get):
     # Simulate reading a local PDF file or use mock PDF content
     pdf_file_path = "features/quizzify/tests/test.pdf"
     with open(pdf_file_path, 'rb') as pdf_file:
         pdf_content = pdf_file.read()
 
-    # Mocking the response of requests.get to simulate downloading the PDF
+    # Mocking the response of the download session to simulate downloading the PDF
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.content = pdf_content
+    mock_response.headers = {"Content-Type": "application/pdf"}
+    mock_response.iter_content.return_value = [pdf_content]
     mock_get.return_value = mock_response
 
     # The specific URL you want to test with
@@ -63,4 +67,63 @@ def test_load_pdf_from_url(mock_get):
     
     # Verify the results
     assert isinstance(documents, list)
-    assert len(documents) == 1
\ No newline at end of file
+    assert len(documents) == 1
+
+
+class ValidatingSession:
+    """Serves PDFs by URL with an ETag and answers 304 to requests that send it back."""
+    def __init__(self, contents):
+        self.contents = contents
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(headers)
+        response = MagicMock()
+        if headers and headers.get("If-None-Match") == '"v1"':
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response.headers = {"Content-Type": "application/pdf", "ETag": '"v1"'}
+            response.iter_content.return_value = [self.contents[url]]
+        return response
+
+def test_unchanged_files_are_served_from_the_page_cache(tmp_path):
+    from app.features.quizzify import tools
+    from app.services.page_cache import PageCache
+    with open("features/quizzify/tests/test.pdf", 'rb') as pdf_file:
+        session = ValidatingSession({"https://example.com/textbook.pdf": pdf_file.read()})
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    tool_file = ToolFile(url="https://example.com/textbook.pdf", filePath=None, filename=None)
+
+    with patch.object(downloader, "session", session), patch.object(tools, "page_cache", cache), patch.object(tools.pdf_extractor, "cache", cache):
+        first = URLLoader().load([tool_file])
+        with patch.object(tools.pdf_extractor, "extract") as extract:
+            second = URLLoader().load([tool_file])
+
+    extract.assert_not_called()
+    assert session.requests == [None, {"If-None-Match": '"v1"'}]
+    assert [doc.page_content for doc in second] == [doc.page_content for doc in first]
+    assert [doc.metadata for doc in second] == [doc.metadata for doc in first]
+
+def test_cached_and_downloaded_files_keep_request_order(tmp_path):
+    from app.features.quizzify import tools
+    from app.services.page_cache import PageCache
+    contents = {}
+    for url, path in [("https://example.com/cached.pdf", "features/quizzify/tests/test.pdf"), ("https://example.com/new.pdf", "api/tests/linear_regression.pdf")]:
+        with open(path, 'rb') as pdf_file:
+            contents[url] = pdf_file.read()
+    session = ValidatingSession(contents)
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    cached_file = ToolFile(url="https://example.com/cached.pdf", filePath=None, filename=None)
+    new_file = ToolFile(url="https://example.com/new.pdf", filePath=None, filename=None)
+
+    with patch.object(downloader, "session", session), patch.object(tools, "page_cache", cache), patch.object(tools.pdf_extractor, "cache", cache):
+        cached = URLLoader().load([cached_file])
+        new = BytesFilePDFLoader([(BytesIO(contents["https://example.com/new.pdf"]), "pdf")]).load()
+        documents = URLLoader().load([new_file, cached_file])
+
+    assert session.requests[-2:] == [None, {"If-None-Match": '"v1"'}]
+    assert [(doc.page_content, doc.metadata["page_number"]) for doc in documents] == [
+        (doc.page_content, doc.metadata["page_number"]) for doc in new + cached
+    ]
+    assert len(new) > 1 and documents[len(new)].metadata["page_number"] == 1
@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import MagicMock
+from app.features.quizzify.tools import QuizBuilder
+
+valid_response = {
+    "question": "What is the slope?",
+    "choices": [{"key": "A", "value": "1"}, {"key": "B", "value": "2"}],
+    "answer": "A",
+    "explanation": "Because."
+}
+
+@pytest.fixture
+def builder(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    vectorstore = MagicMock()
+    builder = QuizBuilder(vectorstore, "Linear regression", model=MagicMock())
+    chain = MagicMock()
+    chain.invoke.return_value = valid_response
+    builder.compile = MagicMock(return_value=chain)
+    return builder
+
+def test_generate_questions_yields_each_question(builder):
+    questions = builder.generate_questions(3)
+
+    first = next(questions)
+    assert first["choices"] == [{"key": "A", "value": "1"}, {"key": "B", "value": "2"}]
+    assert builder.vectorstore.delete_collection.call_count == 0
+
+    remaining = list(questions)
+    assert len(remaining) == 2
+    assert builder.attempts == 3
+    builder.vectorstore.delete_collection.assert_called_once()
+
+def test_generate_questions_cleans_up_when_closed_early(builder):
+    questions = builder.generate_questions(3)
+    next(questions)
+
+    questions.close()
+
+    builder.vectorstore.delete_collection.assert_called_once()
+
+def test_create_questions_returns_list(builder):
+    assert len(builder.create_questions(2)) == 2
+
+def test_compiled_chain_records_stage_timings(monkeypatch):
+    import json
+    from langchain_core.language_models import FakeListLLM
+    from langchain_core.runnables import RunnableLambda
+    from app.services.metrics import stage_latency
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    vectorstore = MagicMock()
+    vectorstore.as_retriever.return_value = RunnableLambda(lambda topic: [])
+    builder = QuizBuilder(vectorstore, "Linear regression", model=FakeListLLM(responses=[json.dumps(valid_response)]))
+    before = {stage: stage_latency.count(component="quiz_builder", stage=stage) for stage in ("retrieve", "generate", "parse")}
+
+    assert builder.compile().invoke("Linear regression") == valid_response
+    for stage, count in before.items():
+        assert stage_latency.count(component="quiz_builder", stage=stage) == count + 1
@@ -1,25 +1,30 @@
 from typing import List, Tuple, Dict, Any
 from io import BytesIO
 from fastapi import UploadFile
-from pypdf import PdfReader
 from urllib.parse import urlparse
-import requests
 import os
 import json
+import threading
 import time
+import uuid
 
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.runnables import RunnablePassthrough, RunnableParallel, RunnableLambda
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.pydantic_v1 import BaseModel, Field
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
 from app.services.logger import setup_logger
 from app.services.tool_registry import ToolFile
+from app.services.job_store import report_partial_result
+from app.services.metrics import time_stage, page_cache_revalidations
+from app.services.downloads import downloader
+from app.services.pdf_extraction import pdf_extractor
+from app.services.page_cache import page_cache, content_hash
+from app.services.model_provider import model_registry
+from app.services.tracing import tracer
 from app.api.error_utilities import LoaderError
 
 relative_path = "features/quzzify"
@@ -53,6 +58,13 @@ def read_text_file(file_path):
     with open(absolute_file_path, 'r') as file:
         return file.read()
 
+def timed_step(runnable, component, stage):
+    # Wraps a chain step so its latency is recorded as a pipeline stage
+    def run(value, config):
+        with time_stage(component, stage):
+            return runnable.invoke(value, config)
+    return RunnableLambda(run)
+
 class RAGRunnable:
     def __init__(self, func):
         self.func = func
@@ -66,23 +78,30 @@ class RAGRunnable:
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
+def page_documents(page_texts: List[str], source: str) -> List[Document]:
+    return [
+        Document(page_content=page_content, metadata={"source": source, "page_number": i + 1})
+        for i, page_content in enumerate(page_texts)
+    ]
+
 class UploadPDFLoader:
     def __init__(self, files: List[UploadFile]):
         self.files = files
 
     def load(self) -> List[Document]:
         documents = []
+        contents = []
 
         for upload_file in self.files:
             with upload_file.file as pdf_file:
-                pdf_reader = PdfReader(pdf_file)
+                contents.append(pdf_file.read())
 
-                for i, page in enumerate(pdf_reader.pages):
-                    page_content = page.extract_text()
-                    metadata = {"source": upload_file.filename, "page_number": i + 1}
+        for upload_file, page_texts in zip(self.files, pdf_extractor.extract(contents)):
+            for i, page_content in enumerate(page_texts):
+                metadata = {"source": upload_file.filename, "page_number": i + 1}
 
-                    doc = Document(page_content=page_content, metadata=metadata)
-                    documents.append(doc)
+                doc = Document(page_content=page_content, metadata=metadata)
+                documents.append(doc)
 
         return documents
 
@@ -91,22 +110,20 @@ class BytesFilePDFLoader:
         self.files = files
     
     def load(self) -> List[Document]:
-        documents = []
-        
+        return [document for file_documents in self.load_by_file() for document in file_documents]
+
+    def load_by_file(self) -> List[List[Document]]:
+        """The documents of each file, in the order of `files`."""
         for file, file_type in self.files:
             logger.debug(file_type)
-            if file_type.lower() == "pdf":
-                pdf_reader = PdfReader(file) #! PyPDF2.PdfReader is deprecated
+            if file_type.lower() != "pdf":
+                raise ValueError(f"Unsupported file type: {file_type}")
 
-                for i, page in enumerate(pdf_reader.pages):
-                    page_content = page.extract_text()
-                    metadata = {"source": file_type, "page_number": i + 1}
+        with tracer.span("loader.extract_text") as span:
+            extracted = pdf_extractor.extract([file.getvalue() for file, _ in self.files])
+            documents = [page_documents(page_texts, file_type) for (file, file_type), page_texts in zip(self.files, extracted)]
 
-                    doc = Document(page_content=page_content, metadata=metadata)
-                    documents.append(doc)
-                    
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
+            if span is not None: span.set_attribute("pdf.pages", sum(len(file_documents) for file_documents in documents))
             
         return documents
 
@@ -128,18 +145,20 @@ class LocalFileLoader:
             if file_type != self.expected_file_type:
                 raise ValueError(f"Expected file type: {self.expected_file_type}, but got: {file_type}")
 
-            with open(file_path, 'rb') as file:
-                pdf_reader = PdfReader(file)
-
-                for i, page in enumerate(pdf_reader.pages):
-                    page_content = page.extract_text()
-                    metadata = {"source": file_path, "page_number": i + 1}
+        for file_path, page_texts in zip(self.file_paths, pdf_extractor.extract(self.file_paths)):
+            for i, page_content in enumerate(page_texts):
+                metadata = {"source": file_path, "page_number": i + 1}
 
-                    doc = Document(page_content=page_content, metadata=metadata)
-                    documents.append(doc)
+                doc = Document(page_content=page_content, metadata=metadata)
+                documents.append(doc)
 
         return documents
 
+# Content types accepted for each expected file type, storage buckets often serve files as octet streams
+CONTENT_TYPES = {
+    "pdf": {"application/pdf", "application/octet-stream", "binary/octet-stream"}
+}
+
 class URLLoader:
     def __init__(self, file_loader=None, expected_file_type="pdf", verbose=False):
         self.loader = file_loader or BytesFilePDFLoader
@@ -147,60 +166,103 @@ class URLLoader:
         self.verbose = verbose
 
     def load(self, tool_files: List[ToolFile]) -> List[Document]:
+        # One slot per loaded URL in request order, holding either its cached documents or its index in queued_files
+        slots = []
         queued_files = []
-        documents = []
-        any_success = False
+        urls = []
 
         for tool_file in tool_files:
-            try:
-                url = tool_file.url
-                response = requests.get(url)
-                parsed_url = urlparse(url)
-                path = parsed_url.path
-
-                if response.status_code == 200:
-                    # Read file
-                    file_content = BytesIO(response.content)
-
-                    # Check file type
-                    file_type = path.split(".")[-1]
-                    if file_type != self.expected_file_type:
-                        raise LoaderError(f"Expected file type: {self.expected_file_type}, but got: {file_type}")
-
-                    # Append to Queue
-                    queued_files.append((file_content, file_type))
-                    if self.verbose:
-                        logger.info(f"Successfully loaded file from {url}")
-
-                    any_success = True  # Mark that at least one file was successfully loaded
-                else:
-                    logger.error(f"Request failed to load file from {url} and got status code {response.status_code}")
-
-            except Exception as e:
+            url = tool_file.url
+            # Check file type before downloading anything
+            file_type = urlparse(url).path.split(".")[-1]
+            if file_type != self.expected_file_type:
                 logger.error(f"Failed to load file from {url}")
-                logger.error(e)
+                logger.error(f"Expected file type: {self.expected_file_type}, but got: {file_type}")
+                continue
+            urls.append(url)
+
+        # Files whose pages are cached are only downloaded again when they changed. Cached pages are laid out
+        # the way BytesFilePDFLoader lays them out, so any other loader always gets the file
+        revalidate = page_cache is not None and self.loader is BytesFilePDFLoader
+        validators = [page_cache.validators(url) if revalidate else None for url in urls]
+        headers = [self._conditional_headers(url_validators) for url_validators in validators]
+
+        results = downloader.fetch_all(urls, CONTENT_TYPES.get(self.expected_file_type), headers=headers) if urls else []
+        for url, url_validators, result in zip(urls, validators, results):
+            if result is None:
+                pages = page_cache.get(url_validators["sha256"])
+                if pages is not None:
+                    page_cache_revalidations.inc(result="not_modified")
+                    slots.append(page_documents(pages, self.expected_file_type))
+                    continue
+                # Evicted since it was revalidated
+                try:
+                    result = downloader.fetch(url, CONTENT_TYPES.get(self.expected_file_type))
+                except Exception as e:
+                    result = e
+            elif url_validators is not None and not isinstance(result, Exception):
+                page_cache_revalidations.inc(result="modified")
+
+            if isinstance(result, Exception):
+                logger.error(f"Failed to load file from {url}")
+                logger.error(result)
                 continue
 
-        # Pass Queue to the file loader if there are any successful loads
-        if any_success:
-            file_loader = self.loader(queued_files)
-            documents = file_loader.load()
+            if revalidate:
+                page_cache.remember_url(url, content_hash(result.getvalue()), result.etag, result.last_modified)
 
+            # Append to Queue
+            slots.append(len(queued_files))
+            queued_files.append((result, self.expected_file_type))
             if self.verbose:
-                logger.info(f"Loaded {len(documents)} documents")
+                logger.info(f"Successfully loaded file from {url}")
 
-        if not any_success:
+        # Pass Queue to the file loader if at least one file was successfully loaded
+        if not slots:
             raise LoaderError("Unable to load any files from URLs")
 
+        if len(queued_files) == len(slots):
+            documents = self.loader(queued_files).load()
+        else:
+            # Only BytesFilePDFLoader revalidates, its per file documents are merged back between the cached ones
+            loaded = self.loader(queued_files).load_by_file() if queued_files else []
+            documents = []
+            for slot in slots:
+                documents.extend(loaded[slot] if isinstance(slot, int) else slot)
+
+        if self.verbose:
+            logger.info(f"Loaded {len(documents)} documents")
+
         return documents
 
+    def _conditional_headers(self, validators):
+        if validators is None:
+            return None
+        headers = {}
+        if validators["etag"]:
+            headers["If-None-Match"] = validators["etag"]
+        if validators["last_modified"]:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+_chroma_client = None
+_chroma_client_lock = threading.Lock()
+
+def get_chroma_client():
+    global _chroma_client
+    with _chroma_client_lock:
+        if _chroma_client is None:
+            import chromadb
+            _chroma_client = chromadb.EphemeralClient()
+        return _chroma_client
+
 class RAGpipeline:
     def __init__(self, loader=None, splitter=None, vectorstore_class=None, embedding_model=None, verbose=False):
         default_config = {
             "loader": URLLoader(verbose = verbose), # Creates instance on call with verbosity
             "splitter": RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100),
             "vectorstore_class": Chroma,
-            "embedding_model": GoogleGenerativeAIEmbeddings(model='models/embedding-001')
+            "embedding_model": model_registry.embeddings('models/embedding-001')
         }
         self.loader = loader or default_config["loader"]
         self.splitter = splitter or default_config["splitter"]
@@ -216,7 +278,8 @@ class RAGpipeline:
         logger.debug(f"Loader is a: {type(self.loader)}")
         
         try:
-            total_loaded_files = self.loader.load(files)
+            with time_stage("rag_pipeline", "load"):
+                total_loaded_files = self.loader.load(files)
         except LoaderError as e:
             logger.error(f"Loader experienced error: {e}")
             raise LoaderError(e)
@@ -229,18 +292,27 @@ class RAGpipeline:
             logger.info(f"Splitter type used: {type(self.splitter)}")
             
         total_chunks = []
-        chunks = self.splitter.split_documents(loaded_documents)
+        with time_stage("rag_pipeline", "split"):
+            chunks = self.splitter.split_documents(loaded_documents)
         total_chunks.extend(chunks)
         
         if self.verbose: logger.info(f"Split {len(loaded_documents)} documents into {len(total_chunks)} chunks")
         
         return total_chunks
     
+    def vectorstore_kwargs(self) -> dict:
+        if self.vectorstore_class is not Chroma:
+            return {}
+        # One in-memory client for the process, creating one per request races between worker threads.
+        # Each request gets its own collection, concurrent requests would otherwise share (and delete) the default one
+        return {"client": get_chroma_client(), "collection_name": f"quizzify-{uuid.uuid4().hex}"}
+    
     def create_vectorstore(self, documents: List[Document]):
         if self.verbose:
             logger.info(f"Creating vectorstore from {len(documents)} documents")
         
-        self.vectorstore = self.vectorstore_class.from_documents(documents, self.embedding_model)
+        with time_stage("rag_pipeline", "embed"):
+            self.vectorstore = self.vectorstore_class.from_documents(documents, self.embedding_model, **self.vectorstore_kwargs())
 
         if self.verbose: logger.info(f"Vectorstore created")
         return self.vectorstore
@@ -265,7 +337,8 @@ class RAGpipeline:
 class QuizBuilder:
     def __init__(self, vectorstore, topic, prompt=None, model=None, parser=None, verbose=False):
         default_config = {
-            "model": GoogleGenerativeAI(model="gemini-1.0-pro"),
+            # Not cached, every attempt asks the same prompt and must get a new question
+            "model": model_registry.llm("gemini-1.0-pro", cache=False),
             "parser": JsonOutputParser(pydantic_object=QuizQuestion),
             "prompt": read_text_file("prompt/quizzify-prompt.txt")
         }
@@ -295,7 +368,12 @@ class QuizBuilder:
             {"context": retriever, "topic": RunnablePassthrough()}
         )
         
-        chain = runner | prompt | self.model | self.parser
+        chain = (
+            timed_step(runner, "quiz_builder", "retrieve")
+            | prompt
+            | timed_step(self.model, "quiz_builder", "generate")
+            | timed_step(self.parser, "quiz_builder", "parse")
+        )
         
         if self.verbose: logger.info(f"Chain compilation complete")
         
@@ -321,47 +399,57 @@ class QuizBuilder:
     def format_choices(self, choices: Dict[str, str]) -> List[Dict[str, str]]:
         return [{"key": k, "value": v} for k, v in choices.items()]
     
-    def create_questions(self, num_questions: int = 5) -> List[Dict]:
+    def generate_questions(self, num_questions: int = 5):
+        """
+        Yields each question as soon as it passes validation.
+        The number of model calls made is kept in `self.attempts` for reporting once the generator is exhausted.
+        """
         if self.verbose: logger.info(f"Creating {num_questions} questions")
         
-        if num_questions > 10:
-            return {"message": "error", "data": "Number of questions cannot exceed 10"}
-        
         chain = self.compile()
         
-        generated_questions = []
-        attempts = 0
+        generated_count = 0
+        self.attempts = 0
         max_attempts = num_questions * 5  # Allow for more attempts to generate questions
 
-        while len(generated_questions) < num_questions and attempts < max_attempts:
-            response = chain.invoke(self.topic)
-            if self.verbose:
-                logger.info(f"Generated response attempt {attempts + 1}: {response}")
-
-            response = transform_json_dict(response)
-            # Directly check if the response format is valid
-            if self.validate_response(response):
-                response["choices"] = self.format_choices(response["choices"])
-                generated_questions.append(response)
-                if self.verbose:
-                    logger.info(f"Valid question added: {response}")
-                    logger.info(f"Total generated questions: {len(generated_questions)}")
-            else:
+        try:
+            while generated_count < num_questions and self.attempts < max_attempts:
+                response = chain.invoke(self.topic)
                 if self.verbose:
-                    logger.warning(f"Invalid response format. Attempt {attempts + 1} of {max_attempts}")
-            
-            # Move to the next attempt regardless of success to ensure progress
-            attempts += 1
-
-        # Log if fewer questions are generated
-        if len(generated_questions) < num_questions:
-            logger.warning(f"Only generated {len(generated_questions)} out of {num_questions} requested questions")
+                    logger.info(f"Generated response attempt {self.attempts + 1}: {response}")
+
+                response = transform_json_dict(response)
+                # Directly check if the response format is valid
+                if self.validate_response(response):
+                    response["choices"] = self.format_choices(response["choices"])
+                    generated_count += 1
+                    report_partial_result(response)
+                    if self.verbose:
+                        logger.info(f"Valid question added: {response}")
+                        logger.info(f"Total generated questions: {generated_count}")
+                    yield response
+                else:
+                    if self.verbose:
+                        logger.warning(f"Invalid response format. Attempt {self.attempts + 1} of {max_attempts}")
+                
+                # Move to the next attempt regardless of success to ensure progress
+                self.attempts += 1
+
+            # Log if fewer questions are generated
+            if generated_count < num_questions:
+                logger.warning(f"Only generated {generated_count} out of {num_questions} requested questions")
         
-        if self.verbose: logger.info(f"Deleting vectorstore")
-        self.vectorstore.delete_collection()
+        finally:
+            # Also runs when a streaming client stops consuming early
+            if self.verbose: logger.info(f"Deleting vectorstore")
+            self.vectorstore.delete_collection()
+    
+    def create_questions(self, num_questions: int = 5) -> List[Dict]:
+        if num_questions > 10:
+            return {"message": "error", "data": "Number of questions cannot exceed 10"}
         
         # Return the list of questions
-        return generated_questions[:num_questions]
+        return list(self.generate_questions(num_questions))
 
 class QuestionChoice(BaseModel):
     key: str = Field(description="A unique identifier for the choice using letters A, B, C, or D.")
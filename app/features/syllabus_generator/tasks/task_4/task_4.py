@@ -1,6 +1,12 @@
 from langchain_google_vertexai import VertexAIEmbeddings
 import os
 
+try:
+    from app.services.embedding_cache import CachedEmbeddings, embedding_store
+except ImportError:
+    # Run as a standalone script without the app package on the path
+    embedding_store = None
+
 # Set the path to service account key file
 credentials_path = r"C:\Users\cerde\Desktop\syllabus\kai-ai-backend\app\local-auth.json"
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
@@ -38,6 +44,9 @@ class EmbeddingClient:
             project=project,
             location=location
         )
+        if embedding_store is not None:
+            # Chunks embedded before, by any request, are read back instead of sent to VertexAI again
+            self.client = CachedEmbeddings(self.client, model_name, embedding_store)
         
     def embed_query(self, query):
         """
@@ -1,25 +1,59 @@
 from fastapi import FastAPI, Request, Depends
-from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipMiddleware, DEFAULT_EXCLUDED_CONTENT_TYPES
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api.router import router
 from app.services.logger import setup_logger
-from app.api.error_utilities import ErrorResponse
+from app.services.metrics import MetricsMiddleware
+from app.services.tracing import TracingMiddleware, tracer
+from app.api.error_utilities import ErrorResponse, AdmissionRejectedError
+from app.api.response_utilities import FastJSONResponse
+from app.api.tool_utilities import execution_engine, tool_registry
+from app.api.job_utilities import maintain_jobs
+from app.utils.auth import get_key_provider
 
+import asyncio
+import math
 import os
+import time
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv())
 
 logger = setup_logger(__name__)
 
+def warm_up_features():
+    # Imports the LangChain backed feature modules so the first request does not pay for them
+    started_at = time.perf_counter()
+    tool_registry.import_executors()
+    try:
+        import app.features.Kaichat.core
+    except Exception as e:
+        logger.error(f"Failed to warm up Kaichat: {e}")
+    logger.info(f"Feature modules warmed up in {time.perf_counter() - started_at:.2f}s")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info(f"Initializing Application Startup")
+    get_key_provider().start()
+    tool_registry.build(import_executors=False)
+    
+    # "background" serves requests while features import, "eager" imports them before serving, "off" on first use
+    feature_warmup = os.environ.get("FEATURE_WARMUP", "background")
+    if feature_warmup == "eager":
+        warm_up_features()
+    elif feature_warmup == "background":
+        asyncio.get_running_loop().run_in_executor(None, warm_up_features)
+    
+    job_maintenance = asyncio.create_task(maintain_jobs())
     logger.info(f"Successfully Completed Application Startup")
     
     yield
+    job_maintenance.cancel()
+    get_key_provider().stop()
+    execution_engine.shutdown(wait=False)
+    tracer.shutdown()
     logger.info("Application shutdown")
 
 app = FastAPI(lifespan = lifespan)
@@ -30,6 +64,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compresses large JSON responses for clients sending Accept-Encoding: gzip, streams are left alone so records are not held back
+if os.environ.get("GZIP_ENABLED", "true").lower() == "true":
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=int(os.environ.get("GZIP_MINIMUM_SIZE", 1024)),
+        compresslevel=int(os.environ.get("GZIP_COMPRESS_LEVEL", 6)),
+        exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/x-ndjson",)
+    )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -42,9 +86,18 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         logger.error(error_detail)  # Log the error details
 
     error_response = ErrorResponse(status=422, message=errors)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=422,
-        content=error_response.dict()
+        content=error_response.model_dump()
+    )
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejectedError):
+    error_response = ErrorResponse(status=429, message=exc.message)
+    return FastJSONResponse(
+        status_code=429,
+        content=error_response.model_dump(),
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
     )
 
 app.include_router(router)
\ No newline at end of file
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from app.services.logger import setup_logger
+from app.api.error_utilities import AdmissionRejectedError
+
+logger = setup_logger(__name__)
+
+class InMemoryRateLimitBackend:
+    """Token buckets held in process memory, for a single worker process."""
+    blocking = False
+    PRUNE_INTERVAL = 60  # Seconds between sweeps for buckets that refilled
+
+    def __init__(self):
+        self.buckets = {}  # key -> (tokens, updated_at, full_at)
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        """
+        Takes `cost` tokens from the bucket. Returns 0 when allowed, otherwise the seconds until enough tokens refill.
+        A cost above `capacity` is allowed on a full bucket and leaves it in debt.
+        """
+        now = time.monotonic()
+        needed = min(cost, capacity)
+        with self._lock:
+            tokens, updated_at, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= needed
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if now - self._pruned_at >= self.PRUNE_INTERVAL:
+                # A bucket that refilled is the same as no bucket
+                self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+                self._pruned_at = now
+        return 0.0 if allowed else (needed - tokens) / rate
+
+class SQLiteRateLimitBackend:
+    """Token buckets in a SQLite file, shared by every worker process on the host that uses the same file."""
+    blocking = True
+    PRUNE_INTERVAL = 60  # Seconds between sweeps for buckets that refilled
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._pruned_at = time.time()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        # Wall clock time since the timestamps are compared across processes
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+            needed = min(cost, capacity)
+            allowed = tokens >= needed
+            if allowed:
+                tokens -= cost
+            connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, now))
+            if now - self._pruned_at >= self.PRUNE_INTERVAL:
+                # A bucket that refilled is the same as no bucket, every bucket shares the controller's rate and burst
+                connection.execute("DELETE FROM buckets WHERE tokens + (? - updated_at) * ? >= ?", (now, rate, capacity))
+                self._pruned_at = now
+            connection.execute("COMMIT")
+        return 0.0 if allowed else (needed - tokens) / rate
+
+class AdmissionController:
+    """
+    Admission control in front of expensive endpoints.
+
+    Each user is limited by a token bucket refilling at `rate` requests per second up to `burst`. Admitted
+    requests then take one of `max_in_flight` global slots; when all are taken up to `max_queue` requests wait
+    at most `queue_timeout` seconds for one. Anything beyond that is rejected immediately with a retry hint.
+    """
+    def __init__(self, max_in_flight=32, max_queue=64, queue_timeout=10.0, rate=0.5, burst=10, backend=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters = deque()
+
+    async def check_rate_limit(self, user_id: str, cost: float = 1.0):
+        """Charges `cost` requests to the user's bucket, raising AdmissionRejectedError when it is empty."""
+        if self.backend.blocking:
+            # A locked database can take seconds to answer, which must not stall the event loop
+            loop = asyncio.get_running_loop()
+            retry_after = await loop.run_in_executor(None, self.backend.acquire, f"user:{user_id}", self.rate, self.burst, cost)
+        else:
+            retry_after = self.backend.acquire(f"user:{user_id}", self.rate, self.burst, cost)
+        if retry_after > 0:
+            self.rejected += 1
+            logger.warning(f"Rate limit exceeded for user {user_id}, retry after {retry_after:.1f}s")
+            raise AdmissionRejectedError("Rate limit exceeded, please retry later", retry_after)
+
+    async def _acquire_slot(self):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Admission queue full with {len(self._waiters)} waiting requests")
+            raise AdmissionRejectedError("Server is busy, please retry later", self.queue_timeout)
+
+        # A released slot is handed directly to the oldest waiter by resolving its future
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # The slot arrived as we gave up, pass it on
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise AdmissionRejectedError("Server is busy, please retry later", self.queue_timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one of the global in-flight slots, without charging any user."""
+        await self._acquire_slot()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, cost: float = 1.0):
+        await self.check_rate_limit(user_id, cost)
+        async with self.slot():
+            yield
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected
+        }
+
+def create_admission_controller():
+    if os.environ.get("RATE_LIMIT_BACKEND", "memory") == "sqlite":
+        backend = SQLiteRateLimitBackend(os.environ.get("RATE_LIMIT_DB_PATH", os.path.join(tempfile.gettempdir(), "kai-rate-limits.sqlite3")))
+    else:
+        backend = InMemoryRateLimitBackend()
+
+    return AdmissionController(
+        max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 32)),
+        max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", 64)),
+        queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", 10)),
+        rate=float(os.environ.get("RATE_LIMIT_PER_MINUTE", 30)) / 60,
+        burst=float(os.environ.get("RATE_LIMIT_BURST", 10)),
+        backend=backend
+    )
+
+admission_controller = create_admission_controller()
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import deque
+from app.services.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Values of the state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitBreaker:
+    """
+    Tracks the outcome and latency of the last `window` calls to a model. The breaker opens once at least
+    `min_calls` were seen and either `error_rate` of them failed or their p95 latency reached `slow_seconds`.
+    An open breaker rejects calls for `open_seconds`, then lets `half_open_probes` calls through at a time:
+    the breaker closes once that many succeed in time, and opens again on the first that does not.
+    """
+    def __init__(self, name, window=50, min_calls=10, error_rate=0.5, slow_seconds=20.0, open_seconds=30.0, half_open_probes=2, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)  # (succeeded, seconds)
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model. Every allowed call must be followed by record() or release()."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+                self.probes_in_flight = 0
+                self.probe_successes = 0
+            if self.state == HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_probes:
+                    return False
+                self.probes_in_flight += 1
+            return True
+
+    def record(self, succeeded: bool, seconds: float):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+                if not succeeded or seconds >= self.slow_seconds:
+                    self._open()
+                    return
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_probes:
+                    self.outcomes.clear()
+                    self._transition(CLOSED)
+                return
+
+            if self.state == OPEN:
+                return  # A call admitted before the breaker opened
+
+            self.outcomes.append((succeeded, seconds))
+            if len(self.outcomes) >= self.min_calls and (self._failure_rate() >= self.error_rate or self._p95() >= self.slow_seconds):
+                self._open()
+
+    def release(self):
+        # The call ended without telling anything about the model's health, e.g. a cache hit or a rejected request
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+
+    def _failure_rate(self) -> float:
+        return sum(1 for succeeded, _ in self.outcomes if not succeeded) / len(self.outcomes)
+
+    def _p95(self) -> float:
+        latencies = sorted(seconds for _, seconds in self.outcomes)
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def _open(self):
+        self.opened_at = self.clock()
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        if state != self.state:
+            log = logger.warning if state == OPEN else logger.info
+            log(f"Circuit breaker for {self.name} is now {state}")
+            self.state = state
+
+    def state_value(self) -> int:
+        return STATE_VALUES[self.state]
+
+def create_circuit_breaker(name) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        window=int(os.environ.get("LLM_BREAKER_WINDOW", 50)),
+        min_calls=int(os.environ.get("LLM_BREAKER_MIN_CALLS", 10)),
+        error_rate=float(os.environ.get("LLM_BREAKER_ERROR_RATE", 0.5)),
+        slow_seconds=float(os.environ.get("LLM_BREAKER_SLOW_SECONDS", 20)),
+        open_seconds=float(os.environ.get("LLM_BREAKER_OPEN_SECONDS", 30)),
+        half_open_probes=int(os.environ.get("LLM_BREAKER_HALF_OPEN_PROBES", 2))
+    )
+
+def parse_fallbacks(value: str) -> dict:
+    """Parses "model=fallback,model=fallback" into a model -> fallback map."""
+    fallbacks = {}
+    for pair in value.split(","):
+        model, _, fallback = pair.partition("=")
+        if model.strip() and fallback.strip() and model.strip() != fallback.strip():
+            fallbacks[model.strip()] = fallback.strip()
+    return fallbacks
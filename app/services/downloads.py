@@ -0,0 +1,124 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from app.services.logger import setup_logger
+from app.services.metrics import downloaded_bytes
+from app.services.tracing import tracer
+from app.api.error_utilities import LoaderError
+
+logger = setup_logger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+class Download(BytesIO):
+    """A downloaded body with the validators the server sent for it."""
+    def __init__(self, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        super().__init__()
+        self.etag = etag
+        self.last_modified = last_modified
+
+def create_http_session(pool_size: int) -> requests.Session:
+    """Session whose keep-alive connections are reused across downloads, `pool_size` per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class Downloader:
+    """
+    Fetches files over a shared session. Each file is bounded by `file_timeout` seconds and `max_bytes`,
+    a batch by `total_timeout` seconds. Bodies are streamed, so oversized files stop downloading at the cap.
+    """
+    def __init__(self, session, workers=8, connect_timeout=5.0, read_timeout=30.0, file_timeout=60.0, total_timeout=120.0, max_bytes=50 * 1024 * 1024):
+        self.session = session
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.file_timeout = file_timeout
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download")
+
+    def fetch(self, url: str, content_types=None, deadline: Optional[float] = None, loader="url", headers=None) -> Optional[Download]:
+        """
+        Downloads `url` into memory. Raises LoaderError when the response is not a 200, its Content-Type
+        is not one of `content_types` or it goes over the size cap or the deadline.
+        Returns None when `headers` made the request conditional and the server answered 304 Not Modified.
+        """
+        deadline = min(deadline or float("inf"), time.monotonic() + self.file_timeout)
+        with tracer.span("loader.download", **{"http.url": url}) as span:
+            response = self.session.get(url, stream=True, timeout=(self.connect_timeout, self.read_timeout), headers=headers)
+            try:
+                if response.status_code == 304 and headers:
+                    if span is not None: span.set_attribute("http.status_code", 304)
+                    return None
+                if response.status_code != 200:
+                    raise LoaderError(f"Request for {url} failed with status code {response.status_code}")
+
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_types and content_type and content_type not in content_types:
+                    raise LoaderError(f"Unexpected content type {content_type} for {url}")
+
+                length = response.headers.get("Content-Length")
+                if length and length.isdigit() and int(length) > self.max_bytes:
+                    raise LoaderError(f"File at {url} is {length} bytes, the limit is {self.max_bytes}")
+
+                body = Download(response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    body.write(chunk)
+                    if body.tell() > self.max_bytes:
+                        raise LoaderError(f"File at {url} is over the {self.max_bytes} bytes limit")
+                    if time.monotonic() > deadline:
+                        raise LoaderError(f"Download of {url} timed out")
+            finally:
+                response.close()
+
+            if span is not None: span.set_attribute("http.response_content_length", body.tell())
+        downloaded_bytes.inc(body.tell(), loader=loader)
+        body.seek(0)
+        return body
+
+    def fetch_all(self, urls: List[str], content_types=None, loader="url", headers=None) -> List:
+        """
+        Downloads `urls` concurrently, with the request headers in `headers` (one dict or None per URL).
+        Returns what fetch returned or the exception it raised for each URL, in order.
+        """
+        deadline = time.monotonic() + self.total_timeout
+        headers = headers or [None] * len(urls)
+        # Each download gets its own copy of the context, so its span is a child of the caller's
+        futures = [
+            self.executor.submit(contextvars.copy_context().run, self.fetch, url, content_types, deadline, loader, url_headers)
+            for url, url_headers in zip(urls, headers)
+        ]
+        wait(futures, timeout=self.total_timeout)
+
+        results = []
+        for url, future in zip(urls, futures):
+            if not future.done():
+                # Still running downloads give up on their own once they pass the deadline
+                future.cancel()
+                results.append(LoaderError(f"Download of {url} timed out"))
+            elif future.exception() is not None:
+                results.append(future.exception())
+            else:
+                results.append(future.result())
+        return results
+
+def create_downloader() -> Downloader:
+    workers = int(os.environ.get("DOWNLOAD_WORKERS", 8))
+    return Downloader(
+        create_http_session(workers),
+        workers=workers,
+        connect_timeout=float(os.environ.get("DOWNLOAD_CONNECT_TIMEOUT_SECONDS", 5)),
+        read_timeout=float(os.environ.get("DOWNLOAD_READ_TIMEOUT_SECONDS", 30)),
+        file_timeout=float(os.environ.get("DOWNLOAD_FILE_TIMEOUT_SECONDS", 60)),
+        total_timeout=float(os.environ.get("DOWNLOAD_TOTAL_TIMEOUT_SECONDS", 120)),
+        max_bytes=int(os.environ.get("DOWNLOAD_MAX_BYTES", 50 * 1024 * 1024))
+    )
+
+downloader = create_downloader()
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import time
+from array import array
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from app.services.logger import setup_logger
+from app.services.metrics import embedding_cache_lookups
+from app.services.sqlite_store import SQLiteLRUStore, STORE_ERRORS
+
+logger = setup_logger(__name__)
+
+# SQLite allows 999 parameters per statement in older builds
+LOOKUP_BATCH = 500
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+def as_float32(vector: List[float]) -> List[float]:
+    # Fresh vectors are rounded the way stored ones are, so a text gets the same vector whether it was cached or not
+    return array("f", vector).tolist()
+
+class EmbeddingStore:
+    """
+    Embedding vectors in a SQLite file as packed float32 arrays, shared by every worker process on the host that uses
+    the same file. Vectors are keyed on a namespace (the model and whether the text was embedded as a document or a
+    query) and the whitespace normalized text, and evicted least recently used first once they take more than `max_bytes`.
+    """
+    def __init__(self, db_path, max_bytes: int = 512 * 1024 * 1024):
+        self.db = SQLiteLRUStore(db_path, "embeddings", [
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)"
+        ], max_bytes)
+
+    def key(self, namespace: str, text: str) -> str:
+        return hashlib.sha256(f"{namespace}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """The stored vectors of those `keys` that are in the store. Keys that could not be read count as missing."""
+        found = {}
+        now = time.time()
+        try:
+            with self.db.connect() as connection:
+                for start in range(0, len(keys), LOOKUP_BATCH):
+                    batch = keys[start:start + LOOKUP_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    hits = connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+                    for key, vector in hits:
+                        found[key] = array("f", vector).tolist()
+                    if hits:
+                        placeholders = ",".join("?" * len(hits))
+                        connection.execute(f"UPDATE embeddings SET accessed_at = ? WHERE key IN ({placeholders})", [now, *(key for key, _ in hits)])
+        except STORE_ERRORS as e:
+            logger.error(f"Embedding cache lookup failed, embedding the texts: {e}")
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        rows = []
+        for key, vector in vectors.items():
+            blob = array("f", vector).tobytes()
+            rows.append((key, blob, len(blob), now))
+        try:
+            with self.db.connect() as connection:
+                connection.execute("BEGIN")
+                connection.executemany("INSERT OR REPLACE INTO embeddings (key, vector, size, accessed_at) VALUES (?, ?, ?, ?)", rows)
+                connection.execute("COMMIT")
+                self.db.enforce_budget(connection)
+        except STORE_ERRORS as e:
+            logger.error(f"Failed to write embedding cache entries: {e}")
+
+    def stats(self) -> dict:
+        return self.db.stats()
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model so texts embedded before are read from `store`, only the others reach the model."""
+    def __init__(self, embeddings: Embeddings, model: str, store: EmbeddingStore):
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Gemini embeds documents and queries differently, so they are cached apart
+        keys = [self.store.key(f"{self.model}:document", text) for text in texts]
+        vectors = self.store.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        embedding_cache_lookups.inc(len(texts) - len(missing), result="hit")
+        embedding_cache_lookups.inc(len(missing), result="miss")
+
+        if missing:
+            embedded = {key: as_float32(vector) for key, vector in zip(missing, self.embeddings.embed_documents(list(missing.values())))}
+            self.store.put_many(embedded)
+            vectors.update(embedded)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.store.key(f"{self.model}:query", text)
+        vector = self.store.get_many([key]).get(key)
+        embedding_cache_lookups.inc(result="hit" if vector is not None else "miss")
+        if vector is None:
+            vector = as_float32(self.embeddings.embed_query(text))
+            self.store.put_many({key: vector})
+        return vector
+
+def create_embedding_store() -> Optional[EmbeddingStore]:
+    # Only with an explicit path, the temp directory is memory backed on App Engine
+    path = os.environ.get("EMBEDDING_CACHE_PATH")
+    if not path:
+        return None
+    try:
+        store = EmbeddingStore(path, max_bytes=int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+    except STORE_ERRORS as e:
+        logger.error(f"Embedding cache disabled, failed to open {path}: {e}")
+        return None
+    store.db.register_size_gauge("kai_embedding_cache_bytes", "Bytes of vectors held by the embedding cache.")
+    return store
+
+embedding_store = create_embedding_store()
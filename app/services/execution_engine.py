@@ -0,0 +1,257 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+from app.services.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Defaults applied to any tool without an "execution" block in tools_config.json
+DEFAULT_EXECUTION_CONFIG = {
+    "pool": "thread",       # "thread" or "process"
+    "max_workers": 4,       # Number of tool executions that can run at once
+    "queue_depth": 16       # Number of executions allowed to wait for a free worker
+}
+
+# Number of recent samples kept per pool for percentile reporting
+SAMPLE_WINDOW = 512
+
+# Markers for items passed from a streaming worker back to the event loop
+_STREAM_ITEM = "item"
+_STREAM_ERROR = "error"
+_STREAM_DONE = "done"
+
+def _timed_call(func, args, kwargs):
+    # Runs inside the worker (thread or process), so wall clock time is used to stay comparable across processes
+    started_at = time.time()
+    result = func(*args, **kwargs)
+    return started_at, time.time(), result
+
+def _percentile(samples, percentile):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class TimingStats:
+    """Keeps running totals and a window of recent samples for a single timing measurement."""
+    def __init__(self, window=SAMPLE_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def snapshot(self) -> dict:
+        samples = list(self.samples)
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": _percentile(samples, 50),
+            "p95": _percentile(samples, 95),
+            "p99": _percentile(samples, 99)
+        }
+
+class ToolPool:
+    """
+    A bounded worker pool for a single tool.
+
+    At most `max_workers` executions run at once and at most `queue_depth` more may wait for a
+    worker. Submissions beyond that are rejected immediately instead of piling up on the worker.
+    """
+    def __init__(self, name, pool="thread", max_workers=4, queue_depth=16):
+        if pool not in ("thread", "process"):
+            raise ValueError(f"Unsupported pool type for {name}: {pool}")
+        if max_workers < 1 or queue_depth < 0:
+            raise ValueError(f"Invalid pool sizing for {name}: max_workers={max_workers}, queue_depth={queue_depth}")
+
+        self.name = name
+        self.pool_type = pool
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+
+        if pool == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"tool-{name}")
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+
+        self._lock = threading.Lock()
+        self._pending = 0  # Queued plus running executions
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait = TimingStats()
+        self.run_time = TimingStats()
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.queue_depth
+
+    def _admit(self):
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, succeeded, submitted_at=None, started_at=None, finished_at=None):
+        with self._lock:
+            self._pending -= 1
+            if succeeded:
+                self.completed += 1
+                self.queue_wait.observe(max(0.0, started_at - submitted_at))
+                self.run_time.observe(max(0.0, finished_at - started_at))
+            else:
+                self.failed += 1
+
+    async def run(self, func, *args, **kwargs):
+        if not self._admit():
+            logger.error(f"Tool pool {self.name} is full ({self.capacity} pending executions)")
+            raise HTTPException(status_code=503, detail="Tool is at capacity, please retry later")
+
+        call = functools.partial(_timed_call, func, args, kwargs)
+        if self.pool_type == "thread":
+            # Carry the caller's context (request scoped state) into the worker thread
+            call = functools.partial(contextvars.copy_context().run, call)
+
+        def release(future):
+            # Released when the worker is done, not when the caller stops waiting: a cancelled caller
+            # cannot stop a running execution, which keeps holding its slot until it finishes
+            if future.cancelled() or future.exception() is not None:
+                self._release(False)
+                return
+            started_at, finished_at, _ = future.result()
+            self._release(True, submitted_at, started_at, finished_at)
+
+        submitted_at = time.time()
+        future = self.executor.submit(call)
+        future.add_done_callback(release)
+        _, _, result = await asyncio.wrap_future(future)
+        return result
+
+    async def stream(self, func, *args, **kwargs):
+        """
+        Runs a generator function on the pool and yields its items on the event loop as they are produced.
+        The execution holds a worker for its whole duration. If the consumer stops early, the generator is
+        closed after the item it is currently producing.
+        """
+        if self.pool_type != "thread":
+            raise ValueError(f"Streaming requires a thread pool but tool {self.name} uses a {self.pool_type} pool")
+
+        if not self._admit():
+            logger.error(f"Tool pool {self.name} is full ({self.capacity} pending executions)")
+            raise HTTPException(status_code=503, detail="Tool is at capacity, please retry later")
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def publish(kind, value=None):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            except RuntimeError:
+                stopped.set()  # Event loop is gone, nobody is listening anymore
+
+        def produce():
+            started_at = time.time()
+            generator = func(*args, **kwargs)
+            try:
+                for item in generator:
+                    if stopped.is_set():
+                        break
+                    publish(_STREAM_ITEM, item)
+            except BaseException as e:
+                publish(_STREAM_ERROR, e)
+                return started_at, time.time(), False
+            finally:
+                generator.close()
+            publish(_STREAM_DONE)
+            return started_at, time.time(), True
+
+        def release(future):
+            if future.cancelled() or future.exception() is not None:
+                self._release(False)
+                return
+            started_at, finished_at, succeeded = future.result()
+            self._release(succeeded, submitted_at, started_at, finished_at)
+
+        submitted_at = time.time()
+        future = self.executor.submit(contextvars.copy_context().run, produce)
+        future.add_done_callback(release)
+
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == _STREAM_ITEM:
+                    yield value
+                elif kind == _STREAM_ERROR:
+                    raise value
+                else:
+                    return
+        finally:
+            stopped.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool": self.pool_type,
+                "max_workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "running": min(self._pending, self.max_workers),
+                "queued": max(0, self._pending - self.max_workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "queue_wait_seconds": self.queue_wait.snapshot(),
+                "run_time_seconds": self.run_time.snapshot()
+            }
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+class ExecutionEngine:
+    """Dispatches tool executions to per-tool bounded pools configured in tools_config.json."""
+    def __init__(self, tools_config: dict):
+        self.tools_config = tools_config
+        self.pools = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, tool_id) -> ToolPool:
+        key = str(tool_id)
+        pool = self.pools.get(key)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            if key not in self.pools:
+                tool_config = self.tools_config.get(key, {})
+                config = {**DEFAULT_EXECUTION_CONFIG, **tool_config.get("execution", {})}
+                self.pools[key] = ToolPool(key, **config)
+                logger.info(f"Created {config['pool']} pool for tool {key} with {config['max_workers']} workers and queue depth {config['queue_depth']}")
+            return self.pools[key]
+
+    async def run(self, tool_id, func, *args, **kwargs):
+        return await self.get_pool(tool_id).run(func, *args, **kwargs)
+
+    def stream(self, tool_id, func, *args, **kwargs):
+        return self.get_pool(tool_id).stream(func, *args, **kwargs)
+
+    def stats(self) -> dict:
+        return {tool_id: pool.stats() for tool_id, pool in self.pools.items()}
+
+    def shutdown(self, wait=True):
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
+        self.pools = {}
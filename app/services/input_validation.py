@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Union
+from typing_extensions import TypedDict
+from pydantic import TypeAdapter, ConfigDict, StrictStr, StrictInt, StrictFloat, ValidationError
+from app.services.tool_registry import ToolFile
+from app.services.logger import setup_logger
+from app.api.error_utilities import InputValidationError
+
+logger = setup_logger(__name__)
+
+# Metadata input type -> pydantic type. Unknown types are accepted as is.
+INPUT_TYPES = {
+    "text": StrictStr,
+    "string": StrictStr,
+    "number": Union[StrictInt, StrictFloat],
+    "file": List[ToolFile]
+}
+
+# Wording used in error messages for each metadata input type
+TYPE_DESCRIPTIONS = {
+    "text": "string",
+    "string": "string",
+    "number": "number"
+}
+
+class CompiledInputValidator:
+    """
+    Validates a tool's request inputs against its metadata input spec in a single pydantic-core pass.
+    File inputs come out as ToolFile objects, inputs not declared in the metadata are passed through untouched.
+    """
+    def __init__(self, inputs_spec: List[Dict[str, str]]):
+        self.input_types = {input_item['name']: input_item['type'] for input_item in inputs_spec}
+
+        fields = {name: INPUT_TYPES.get(input_type, Any) for name, input_type in self.input_types.items()}
+        schema = TypedDict("ToolInputs", fields)
+        schema.__pydantic_config__ = ConfigDict(extra='allow')
+        self.adapter = TypeAdapter(schema)
+
+    def validate(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return self.adapter.validate_python(inputs)
+        except ValidationError as e:
+            error_message = self._error_message(inputs, e.errors(include_url=False))
+            logger.error(error_message)
+            raise InputValidationError(error_message)
+
+    def _error_message(self, inputs: Dict[str, Any], errors: List[Dict[str, Any]]) -> str:
+        # Missing inputs are reported before type errors, as the per-field checks did
+        missing = [error for error in errors if error['type'] == 'missing' and len(error['loc']) == 1]
+        if missing:
+            return f"Missing input: `{missing[0]['loc'][0]}`"
+
+        error = errors[0]
+        input_name = error['loc'][0]
+        input_value = inputs.get(input_name)
+        input_type = self.input_types.get(input_name)
+
+        if input_type == 'file':
+            if len(error['loc']) == 1:
+                return f"Input `{input_name}` must be a list of file dictionaries but got {type(input_value)}"
+            if len(error['loc']) == 2 and error['type'] in ('model_type', 'model_attributes_type', 'dict_type'):
+                item = input_value[error['loc'][1]]
+                return f"Each item in the input `{input_name}` must be a dictionary representing a file but got {type(item)}"
+            return f"Each item in the input `{input_name}` must be a valid ToolFile where a URL is provided"
+
+        expected_type = TYPE_DESCRIPTIONS.get(input_type, input_type)
+        return f"Input `{input_name}` must be a {expected_type} but got {type(input_value)}"
@@ -0,0 +1,190 @@
+import contextvars
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from app.services.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+UNFINISHED_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# Id of the job the current execution belongs to, if any. Set by the job runner and carried into the worker thread.
+current_job_id = contextvars.ContextVar("current_job_id", default=None)
+
+def report_partial_result(item):
+    """
+    Appends an item to the partial results of the job currently executing.
+    Does nothing when the tool is not running as a job, so executors can call it unconditionally.
+    """
+    job_id = current_job_id.get()
+    if job_id is None:
+        return
+    try:
+        job_store.append_partial(job_id, item)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to store partial result for job {job_id}: {e}")
+
+class JobStore:
+    """
+    SQLite backed store for asynchronous tool jobs.
+
+    Each operation opens its own connection so the store can be shared between the event loop,
+    worker threads and other worker processes using the same database file.
+    """
+    def __init__(self, db_path, result_ttl=3600):
+        self.db_path = db_path
+        self.result_ttl = result_ttl
+        self.owner = uuid.uuid4().hex  # Identifies the worker process that runs a job
+        self._create_schema()
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def _create_schema(self):
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    tool_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    partial_result TEXT NOT NULL DEFAULT '[]',
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at)")
+
+    def create(self, tool_id, request: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, tool_id, status, request, owner, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, tool_id, JOB_QUEUED, json.dumps(request), self.owner, now, now)
+            )
+        return job_id
+
+    def mark_running(self, job_id):
+        self._update(job_id, "status = ?", (JOB_RUNNING,))
+
+    def append_partial(self, job_id, item):
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT partial_result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                connection.execute("ROLLBACK")
+                return
+            partial_result = json.loads(row["partial_result"])
+            partial_result.append(item)
+            connection.execute(
+                "UPDATE jobs SET partial_result = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(partial_result), time.time(), job_id)
+            )
+            connection.execute("COMMIT")
+
+    def complete(self, job_id, result):
+        self._finish(job_id, JOB_SUCCEEDED, "result = ?", json.dumps(result))
+
+    def fail(self, job_id, status_code: int, message):
+        self._finish(job_id, JOB_FAILED, "error = ?", json.dumps({"status": status_code, "message": message}))
+
+    def _finish(self, job_id, status, column, value):
+        now = time.time()
+        self._update(job_id, f"status = ?, {column}, expires_at = ?", (status, value, now + self.result_ttl), now)
+
+    def _update(self, job_id, assignments, values, now=None):
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?",
+                (*values, now or time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (job_id, time.time())
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "job_id": row["id"],
+            "tool_id": row["tool_id"],
+            "status": row["status"],
+            "partial_result": json.loads(row["partial_result"]),
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": json.loads(row["error"]) if row["error"] is not None else None,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "expires_at": row["expires_at"]
+        }
+
+    def heartbeat(self):
+        # Keeps this worker's unfinished jobs from being claimed by another worker
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE jobs SET updated_at = ? WHERE owner = ? AND status IN ({', '.join('?' * len(UNFINISHED_STATUSES))})",
+                (time.time(), self.owner, *UNFINISHED_STATUSES)
+            )
+
+    def claim_stale_jobs(self, stale_after: float):
+        """
+        Takes ownership of unfinished jobs whose worker stopped updating them, e.g. after a restart.
+        Returns a list of (job_id, request) tuples to be executed again.
+        """
+        now = time.time()
+        placeholders = ", ".join("?" * len(UNFINISHED_STATUSES))
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                f"SELECT id, request FROM jobs WHERE status IN ({placeholders}) AND updated_at < ? AND (owner IS NULL OR owner != ?)",
+                (*UNFINISHED_STATUSES, now - stale_after, self.owner)
+            ).fetchall()
+            for row in rows:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE id = ?",
+                    (JOB_QUEUED, self.owner, now, row["id"])
+                )
+            connection.execute("COMMIT")
+
+        return [(row["id"], json.loads(row["request"])) for row in rows]
+
+    def evict_expired(self) -> int:
+        with self._connect() as connection:
+            cursor = connection.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            evicted = cursor.rowcount
+
+        if evicted:
+            logger.info(f"Evicted {evicted} expired jobs")
+        return evicted
+
+def create_job_store():
+    db_path = os.environ.get("JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "kai-jobs.sqlite3"))
+    result_ttl = float(os.environ.get("JOB_RESULT_TTL_SECONDS", 3600))
+    return JobStore(db_path, result_ttl=result_ttl)
+
+job_store = create_job_store()
@@ -0,0 +1,108 @@
+import contextvars
+import hashlib
+import json
+import os
+import time
+from typing import Any, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.outputs import Generation
+from langchain_core.runnables.config import run_in_executor
+from app.services.logger import setup_logger
+from app.services.metrics import llm_cache_lookups, llm_cache_bytes_saved
+from app.services.sqlite_store import SQLiteLRUStore, STORE_ERRORS
+
+logger = setup_logger(__name__)
+
+# Set when a lookup in the current context was answered from the cache, so callers can tell it from a model call
+served_from_cache = contextvars.ContextVar("served_from_cache", default=False)
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LangChain LLM cache in a SQLite file, shared by every worker process on the host that uses the same file.
+    Entries are keyed on the LLM's serialized parameters (model name, temperature, ...) and the rendered prompt,
+    expire after `ttl` seconds and are evicted least recently used first once they take more than `max_bytes`.
+    """
+    def __init__(self, db_path, ttl: float = 86400, max_bytes: int = 256 * 1024 * 1024):
+        self.ttl = ttl
+        self.db = SQLiteLRUStore(db_path, "llm_cache", [
+            "CREATE TABLE IF NOT EXISTS llm_cache "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)"
+        ], max_bytes, before_evict=self._expire)
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self._key(prompt, llm_string)
+        # Wall clock time since the timestamps are compared across processes
+        now = time.time()
+        try:
+            with self.db.connect() as connection:
+                row = connection.execute("SELECT value, size, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[2] <= now:
+                    connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    connection.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except STORE_ERRORS as e:
+            logger.error(f"LLM cache lookup failed, calling the model: {e}")
+            row = None
+        if row is None:
+            llm_cache_lookups.inc(result="miss")
+            return None
+
+        llm_cache_lookups.inc(result="hit")
+        llm_cache_bytes_saved.inc(row[1])
+        served_from_cache.set(True)
+        return [Generation(**generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if any(type(generation) is not Generation for generation in return_val):
+            return  # Chat generations carry messages, only plain completions are cached
+        value = json.dumps([{"text": generation.text, "generation_info": generation.generation_info} for generation in return_val]).encode("utf-8")
+        now = time.time()
+        try:
+            with self.db.connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (self._key(prompt, llm_string), value, len(value), now + self.ttl, now)
+                )
+                self.db.enforce_budget(connection)
+        except STORE_ERRORS as e:
+            logger.error(f"Failed to write LLM cache entry: {e}")
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        # The lookup runs in a copy of the context, so the flag is set again in the caller's
+        result = await run_in_executor(None, self.lookup, prompt, llm_string)
+        if result is not None:
+            served_from_cache.set(True)
+        return result
+
+    def _expire(self, connection):
+        # Expired entries go before any that are merely old
+        connection.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self, **kwargs: Any) -> None:
+        with self.db.connect() as connection:
+            connection.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        return self.db.stats()
+
+def create_llm_cache() -> Optional[SQLiteLLMCache]:
+    # Needs a path on real disk to be turned on, App Engine's /tmp counts against the instance's RAM
+    path = os.environ.get("LLM_CACHE_PATH")
+    if not path:
+        return None
+    try:
+        cache = SQLiteLLMCache(
+            path,
+            ttl=float(os.environ.get("LLM_CACHE_TTL_SECONDS", 86400)),
+            max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        )
+    except STORE_ERRORS as e:
+        logger.error(f"LLM cache disabled, failed to open {path}: {e}")
+        return None
+    cache.db.register_size_gauge("kai_llm_cache_bytes", "Bytes of LLM responses held by the LLM cache.")
+    return cache
@@ -0,0 +1,63 @@
+import threading
+import time
+from typing import Any, Dict, List
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from app.services.metrics import llm_calls, llm_latency
+from app.services.tracing import tracer
+
+class LLMMetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Counts LLM calls, records their latency per model name and traces each call as an `llm.<model>` span.
+    Pass it in the `callbacks` of an LLM client.
+    """
+    def __init__(self, model_name: str = "unknown"):
+        self.model_name = model_name
+        self.started = {}  # run_id -> (model, start time, span)
+        self._lock = threading.Lock()
+
+    def _model(self, kwargs: Dict[str, Any]) -> str:
+        invocation_params = kwargs.get("invocation_params") or {}
+        return invocation_params.get("model") or invocation_params.get("model_name") or self.model_name
+
+    def _start(self, run_id, kwargs):
+        model = self._model(kwargs)
+        span = tracer.start_span(f"llm.{model}", **{"llm.model": model})
+        with self._lock:
+            self.started[run_id] = (model, time.perf_counter(), span)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id, **kwargs: Any):
+        self._start(run_id, kwargs)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id, **kwargs: Any):
+        self._start(run_id, kwargs)
+
+    def _finish(self, run_id, status: str, error: BaseException = None):
+        with self._lock:
+            model, started_at, span = self.started.pop(run_id, (self.model_name, None, None))
+        llm_calls.inc(model=model, status=status)
+        if started_at is not None:
+            llm_latency.observe(time.perf_counter() - started_at, model=model)
+        tracer.end_span(span, error)
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        self._finish(run_id, "success")
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs: Any):
+        self._finish(run_id, "error", error)
+
+def llm_metrics_callbacks(model_name: str) -> List[BaseCallbackHandler]:
+    return [LLMMetricsCallbackHandler(model_name)]
+
+class TracedEmbeddings(Embeddings):
+    """Wraps an embedding model so each embedding call is traced, LangChain has no callbacks for embeddings."""
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with tracer.span("embedding.embed_documents", **{"embedding.texts": len(texts)}):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with tracer.span("embedding.embed_query"):
+            return self.embeddings.embed_query(text)
@@ -1,15 +1,131 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
 
 # Global variable to track logger configuration state
 logger_configured = False
 
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def parse_module_levels(spec: str) -> dict:
+    """Parses LOG_LEVELS, e.g. "app.features.quizzify=DEBUG,app.api=WARNING", into {logger prefix: level}."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+def level_for(name: str, default_level: int, module_levels: dict) -> int:
+    # The most specific configured prefix wins
+    matches = [prefix for prefix in module_levels if name == prefix or name.startswith(f"{prefix}.")]
+    if not matches:
+        return default_level
+    return module_levels[max(matches, key=len)]
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the field names Google Cloud Logging picks up from stdout."""
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keeps only `rate` of the records at or below `max_level`. Warnings and errors always pass."""
+    def __init__(self, rate: float, max_level=logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record):
+        if record.levelno > self.max_level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Formats records on the calling thread and hands them to the writer thread.
+
+    Messages of records below WARNING are cut to `max_message_length` characters. When the queue is full those
+    records are dropped and counted, while warnings and errors wait for room so they are never lost.
+    """
+    def __init__(self, log_queue, max_message_length=2000):
+        super().__init__(log_queue)
+        self.max_message_length = max_message_length
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.levelno < logging.WARNING:
+            message = record.getMessage()
+            if len(message) > self.max_message_length:
+                record = logging.makeLogRecord(record.__dict__)
+                record.msg = f"{message[:self.max_message_length]}... [truncated {len(message) - self.max_message_length} chars]"
+                record.args = None
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record)
+            else:
+                self.dropped += 1
+
+class LoggingPipeline:
+    """The shared queue, handler and background writer thread every logger from setup_logger writes through."""
+    def __init__(self):
+        env_type = os.environ.get('ENV_TYPE', 'undefined')
+        self.default_level = logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        self.module_levels = parse_module_levels(os.environ.get('LOG_LEVELS', ''))
+
+        # Cloud environments parse structured JSON lines, local runs keep the readable format
+        log_format = os.environ.get('LOG_FORMAT', 'json' if env_type in ('sandbox', 'production') else 'text')
+        stream_handler = logging.StreamHandler()
+        if log_format == 'json':
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+        self.queue = queue.Queue(maxsize=int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+        self.handler = BoundedQueueHandler(self.queue, max_message_length=int(os.environ.get('LOG_MAX_MESSAGE_LENGTH', 2000)))
+        self.handler.addFilter(SamplingFilter(float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.1))))
+        self.listener = logging.handlers.QueueListener(self.queue, stream_handler, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        # Flushes everything still queued
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+def get_logging_pipeline() -> LoggingPipeline:
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = LoggingPipeline()
+    return _pipeline
+
 def setup_logger(name=__name__):
     """
-    Sets up a logger based on the environment.
+    Sets up a logger writing through the shared non-blocking logging pipeline.
 
-    If the environment variable ENV_TYPE is set to 'sandbox' or 'production', it configures
-    Google Cloud Logging. Otherwise, it uses the standard logging.
+    Records are queued on the calling thread and written by a background thread, as JSON lines when
+    ENV_TYPE is 'sandbox' or 'production' (or LOG_FORMAT=json) and as text otherwise. The level comes from
+    LOG_LEVELS for the most specific matching module prefix, falling back to LOG_LEVEL (default INFO).
 
     Parameters:
     name (str): The name of the logger.
@@ -18,19 +134,16 @@ def setup_logger(name=__name__):
     logging.Logger: Configured logger.
     """
     global logger_configured
-    env_type = os.environ.get('ENV_TYPE', 'undefined')
-    project = os.environ.get('PROJECT_ID', 'undefined')
+    pipeline = get_logging_pipeline()
+    logger_configured = True
 
     # Obtain a reference to the logger
     logger = logging.getLogger(name)
-    
+
     # Check if the logger is already configured
     if not logger.handlers:
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(logging.DEBUG)
+        logger.addHandler(pipeline.handler)
+        logger.setLevel(level_for(name, pipeline.default_level, pipeline.module_levels))
         logger.propagate = True
 
     return logger
@@ -0,0 +1,256 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+from app.services.logger import setup_logger
+from app.services.tracing import tracer
+
+logger = setup_logger(__name__)
+
+# Upper bounds in seconds, from cache hits and validation up to full quiz generations
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames} but got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], **extra) -> Dict[str, str]:
+        return {**dict(zip(self.labelnames, key)), **extra}
+
+    def header(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def render(self) -> Iterable[str]:
+        yield from self.header()
+        with self._lock:
+            values = list(self.values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count per label set, as Prometheus expects for a histogram."""
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # label key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def count(self, **labels) -> int:
+        series = self.series.get(self._key(labels))
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> Iterable[str]:
+        yield from self.header()
+        with self._lock:
+            all_series = [(key, list(series)) for key, series in self.series.items()]
+        for key, series in all_series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(self._labels(key, le=_format_value(bound)))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self._labels(key))} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self._labels(key))} {cumulative}"
+
+class MetricsRegistry:
+    """
+    Holds the application's metrics and renders them in the Prometheus text exposition format.
+    Collectors are callables returning (name, type, documentation, [(labels, value), ...]) tuples, for values
+    that already live elsewhere (pool and cache statistics) and are read only when scraped.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {collector} failed: {e}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+request_latency = metrics.histogram(
+    "kai_http_request_duration_seconds", "HTTP request latency until the response body is sent.", ("method", "route", "status")
+)
+tool_latency = metrics.histogram(
+    "kai_tool_request_duration_seconds", "Tool execution latency including queueing on the tool pool.", ("tool_id", "status")
+)
+stage_latency = metrics.histogram(
+    "kai_stage_duration_seconds", "Latency of the stages inside feature pipelines.", ("component", "stage")
+)
+llm_calls = metrics.counter(
+    "kai_llm_calls_total", "LLM calls by model and outcome.", ("model", "status")
+)
+llm_latency = metrics.histogram(
+    "kai_llm_call_duration_seconds", "LLM call latency by model.", ("model",)
+)
+llm_retries = metrics.counter(
+    "kai_llm_retries_total", "LLM call attempts retried after a transient failure or timeout.", ("model",)
+)
+llm_hedges = metrics.counter(
+    "kai_llm_hedged_requests_total", "Duplicate LLM requests sent because the first attempt was slow.", ("model",)
+)
+llm_hedge_wins = metrics.counter(
+    "kai_llm_hedge_wins_total", "Hedged LLM requests that answered before the attempt they duplicated.", ("model",)
+)
+llm_deadlines_exceeded = metrics.counter(
+    "kai_llm_deadline_exceeded_total", "LLM calls that gave up because they ran out of time.", ("model",)
+)
+llm_fallbacks = metrics.counter(
+    "kai_llm_fallbacks_total", "LLM calls sent to a fallback model because the model's circuit breaker was open.", ("model", "fallback")
+)
+llm_circuit_rejections = metrics.counter(
+    "kai_llm_circuit_rejections_total", "LLM calls failed fast because the model's circuit breaker was open.", ("model",)
+)
+llm_cache_lookups = metrics.counter(
+    "kai_llm_cache_lookups_total", "LLM cache lookups by result.", ("result",)
+)
+llm_cache_bytes_saved = metrics.counter(
+    "kai_llm_cache_bytes_saved_total", "Bytes of LLM responses served from the LLM cache instead of the model."
+)
+downloaded_bytes = metrics.counter(
+    "kai_loader_downloaded_bytes_total", "Bytes downloaded by document loaders.", ("loader",)
+)
+embedding_cache_lookups = metrics.counter(
+    "kai_embedding_cache_lookups_total", "Texts looked up in the embedding cache, by result.", ("result",)
+)
+page_cache_lookups = metrics.counter(
+    "kai_pdf_page_cache_lookups_total", "Lookups of extracted PDF pages by file hash, by result.", ("result",)
+)
+page_cache_revalidations = metrics.counter(
+    "kai_pdf_page_cache_revalidations_total", "Conditional downloads of cached PDFs, by whether the file had changed.", ("result",)
+)
+validation_failures = metrics.counter(
+    "kai_validation_failures_total", "Tool requests rejected by input validation.", ("tool_id",)
+)
+coalesced_requests = metrics.counter(
+    "kai_coalesced_requests_total", "Tool requests served by joining an identical in-flight execution.", ("tool_id",)
+)
+
+@contextmanager
+def time_stage(component: str, stage: str):
+    # Records the stage in the latency histogram and as a tracing span
+    with tracer.span(f"{component}.{stage}"), stage_latency.time(component=component, stage=stage):
+        yield
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request, labelled with the route template rather than
+    the raw path so path parameters do not create a series per request. Streaming responses are timed until
+    their last chunk.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            request_latency.observe(
+                time.perf_counter() - started_at,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_code
+            )
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+from app.services.logger import setup_logger
+from app.services.resilience import ResilientLLM, create_resilience_policy
+from app.services.llm_cache import create_llm_cache
+from app.services.embedding_cache import CachedEmbeddings, embedding_store
+from app.services.circuit_breaker import create_circuit_breaker, parse_fallbacks
+from app.services.metrics import metrics
+
+logger = setup_logger(__name__)
+
+class GeminiProvider:
+    """Google Generative AI clients. Each client keeps its own gRPC channel, so sharing a client reuses its connections."""
+    name = "gemini"
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+
+    def create_llm(self, model: str, cache=None):
+        from langchain_google_genai import GoogleGenerativeAI
+        from app.services.llm_callbacks import llm_metrics_callbacks
+        # Retries are left to ResilientLLM, the client's own would run inside a single attempt's timeout
+        return GoogleGenerativeAI(model=model, callbacks=llm_metrics_callbacks(model), cache=cache, timeout=self.timeout, max_retries=1)
+
+    def create_embeddings(self, model: str):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        from app.services.llm_callbacks import TracedEmbeddings
+        return TracedEmbeddings(GoogleGenerativeAIEmbeddings(model=model))
+
+def _sleep(latency):
+    seconds = latency() if callable(latency) else latency
+    if seconds:
+        time.sleep(seconds)
+
+def echo_response(prompt: str) -> str:
+    return f"Fake response to a prompt of {len(prompt)} characters ({hashlib.sha256(prompt.encode()).hexdigest()[:12]})"
+
+class FakeProvider:
+    """
+    Local stand-in for tests and benchmarks, no network or credentials. The same prompt always gives the same
+    response and the same text the same embedding. `respond` maps a prompt to the response text, latencies are
+    the seconds slept per call, or a callable returning them.
+    """
+    name = "fake"
+
+    def __init__(self, respond: Callable[[str], str] = echo_response, llm_latency=0.0, embedding_latency=0.0, embedding_size: int = 768):
+        self.respond = respond
+        self.llm_latency = llm_latency
+        self.embedding_latency = embedding_latency
+        self.embedding_size = embedding_size
+
+    def create_llm(self, model: str, cache=None):
+        from langchain_core.language_models.llms import LLM
+        from app.services.llm_callbacks import llm_metrics_callbacks
+        provider = self
+
+        class FakeLLM(LLM):
+            model: str
+
+            @property
+            def _llm_type(self) -> str:
+                return "fake"
+
+            @property
+            def _identifying_params(self):
+                return {"model": self.model}
+
+            def _call(self, prompt, stop=None, run_manager=None, **kwargs) -> str:
+                _sleep(provider.llm_latency)
+                return provider.respond(prompt)
+
+        return FakeLLM(model=model, callbacks=llm_metrics_callbacks(model), cache=cache)
+
+    def create_embeddings(self, model: str):
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from app.services.llm_callbacks import TracedEmbeddings
+        provider = self
+
+        class FakeEmbeddings(DeterministicFakeEmbedding):
+            def embed_documents(self, texts):
+                _sleep(provider.embedding_latency)
+                return super().embed_documents(texts)
+
+            def embed_query(self, text):
+                _sleep(provider.embedding_latency)
+                return super().embed_query(text)
+
+        return TracedEmbeddings(FakeEmbeddings(size=self.embedding_size))
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "fake": FakeProvider
+}
+
+class ModelRegistry:
+    """
+    Hands out one long-lived LLM or embedding client per model name, created on first use and shared by every
+    request. LangChain clients are thread safe and have both sync (invoke, embed_documents) and async (ainvoke,
+    astream, aembed_documents) methods, so one client serves the worker threads and the event loop.
+    LLMs are wrapped in ResilientLLM when a resilience policy is given, and answer repeated prompts from `cache`
+    (a LangChain BaseCache) when one is given. With a `breaker_factory` every model gets one circuit breaker,
+    calls to a model whose breaker is open go to its entry in `fallbacks` (model name -> fallback model name).
+    Embedding clients read texts they embedded before from `embedding_store` when one is given.
+    """
+    def __init__(self, provider, policy=None, cache=None, breaker_factory=None, fallbacks=None, embedding_store=None):
+        self.provider = provider
+        self.policy = policy
+        self.cache = cache
+        self.embedding_store = embedding_store
+        self.breaker_factory = breaker_factory
+        self.fallbacks = fallbacks or {}
+        self.clients: Dict[Tuple[str, str], object] = {}
+        self.breakers = {}
+        self._lock = threading.Lock()
+        self._breakers_lock = threading.Lock()
+
+    def _get(self, key: tuple, create):
+        client = self.clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self.clients.get(key)
+                if client is None:
+                    logger.info(f"Creating {self.provider.name} client {key}")
+                    client = self.clients[key] = create()
+        return client
+
+    def breaker(self, model: str):
+        # Shared by every client of the model, cached or not and whether used directly or as a fallback
+        if self.breaker_factory is None:
+            return None
+        with self._breakers_lock:
+            if model not in self.breakers:
+                self.breakers[model] = self.breaker_factory(model)
+            return self.breakers[model]
+
+    def _create_llm(self, model: str, cache: bool, fallback=None):
+        # False rather than None, None would fall back to LangChain's global cache
+        llm = self.provider.create_llm(model, cache=self.cache if cache and self.cache is not None else False)
+        if self.policy is None:
+            return llm
+        return ResilientLLM(llm, model, self.policy, breaker=self.breaker(model), fallback=fallback)
+
+    def llm(self, model: str, cache: bool = True):
+        """The shared client for `model`. Pass cache=False for calls that must not repeat an earlier answer."""
+        fallback = None
+        fallback_model = self.fallbacks.get(model)
+        if fallback_model is not None and self.policy is not None:
+            # Fallbacks have no fallback of their own, so a misconfigured pair cannot send calls back and forth
+            fallback = self._get(("fallback", fallback_model, cache), lambda: self._create_llm(fallback_model, cache))
+        return self._get(("llm", model, cache), lambda: self._create_llm(model, cache, fallback))
+
+    def _create_embeddings(self, model: str):
+        embeddings = self.provider.create_embeddings(model)
+        if self.embedding_store is None:
+            return embeddings
+        return CachedEmbeddings(embeddings, model, self.embedding_store)
+
+    def embeddings(self, model: str):
+        return self._get(("embeddings", model), lambda: self._create_embeddings(model))
+
+    def use(self, provider):
+        """Switches provider, dropping the clients created by the previous one. Returns the previous provider."""
+        with self._lock:
+            previous, self.provider = self.provider, provider
+            self.clients = {}
+        with self._breakers_lock:
+            self.breakers = {}
+        return previous
+
+    def collect_metrics(self):
+        with self._breakers_lock:
+            breakers = list(self.breakers.items())
+        return [
+            ("kai_llm_circuit_state", "gauge", "LLM circuit breaker state: 0 closed, 1 half open, 2 open.", [({"model": model}, breaker.state_value()) for model, breaker in breakers])
+        ]
+
+def create_model_registry():
+    provider_name = os.environ.get("MODEL_PROVIDER", "gemini")
+    if provider_name not in PROVIDERS:
+        raise ValueError(f"Unknown MODEL_PROVIDER {provider_name}, expected one of {', '.join(PROVIDERS)}")
+    policy = create_resilience_policy()
+    provider = GeminiProvider(timeout=policy.attempt_timeout) if provider_name == "gemini" else PROVIDERS[provider_name]()
+    breaker_factory = create_circuit_breaker if os.environ.get("LLM_CIRCUIT_BREAKER", "true").lower() == "true" else None
+    return ModelRegistry(
+        provider,
+        policy,
+        cache=create_llm_cache(),
+        breaker_factory=breaker_factory,
+        fallbacks=parse_fallbacks(os.environ.get("LLM_FALLBACKS", "gemini-1.0-pro=gemini-1.5-flash")),
+        embedding_store=embedding_store
+    )
+
+model_registry = create_model_registry()
+metrics.register_collector(model_registry.collect_metrics)
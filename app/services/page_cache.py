@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional
+from app.services.logger import setup_logger
+from app.services.metrics import page_cache_lookups
+from app.services.sqlite_store import SQLiteLRUStore, STORE_ERRORS
+
+logger = setup_logger(__name__)
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class PageCache:
+    """
+    Extracted page texts of PDFs in a SQLite file, keyed by the SHA-256 of the file bytes and shared by every worker
+    process on the host that uses the same file. URLs are mapped to the hash of the file last downloaded from them,
+    along with its ETag and Last-Modified, so a repeat download can be revalidated instead of fetched again.
+    Page texts are evicted least recently used first once they take more than `max_bytes`.
+    """
+    def __init__(self, db_path, max_bytes: int = 512 * 1024 * 1024):
+        self.db = SQLiteLRUStore(db_path, "pdf_pages", [
+            "CREATE TABLE IF NOT EXISTS pdf_pages "
+            "(sha256 TEXT PRIMARY KEY, pages BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS pdf_pages_accessed_at ON pdf_pages (accessed_at)",
+            "CREATE TABLE IF NOT EXISTS pdf_urls "
+            "(url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, etag TEXT, last_modified TEXT)"
+        ], max_bytes, key_column="sha256", after_evict=self._forget_evicted_urls)
+
+    def get(self, sha256: str) -> Optional[List[str]]:
+        try:
+            with self.db.connect() as connection:
+                row = connection.execute("SELECT pages FROM pdf_pages WHERE sha256 = ?", (sha256,)).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE pdf_pages SET accessed_at = ? WHERE sha256 = ?", (time.time(), sha256))
+        except STORE_ERRORS as e:
+            logger.error(f"Page cache lookup failed, extracting the file: {e}")
+            row = None
+        if row is None:
+            page_cache_lookups.inc(result="miss")
+            return None
+
+        page_cache_lookups.inc(result="hit")
+        return json.loads(row[0])
+
+    def put(self, sha256: str, pages: List[str]):
+        value = json.dumps(pages).encode("utf-8")
+        try:
+            with self.db.connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO pdf_pages (sha256, pages, size, accessed_at) VALUES (?, ?, ?, ?)",
+                    (sha256, value, len(value), time.time())
+                )
+                self.db.enforce_budget(connection)
+        except STORE_ERRORS as e:
+            logger.error(f"Failed to write page cache entry: {e}")
+
+    def validators(self, url: str) -> Optional[dict]:
+        """The hash, ETag and Last-Modified of the file last downloaded from `url`, if its pages are still cached."""
+        try:
+            with self.db.connect() as connection:
+                row = connection.execute(
+                    "SELECT u.sha256, u.etag, u.last_modified FROM pdf_urls u JOIN pdf_pages p ON p.sha256 = u.sha256 WHERE u.url = ?",
+                    (url,)
+                ).fetchone()
+        except STORE_ERRORS as e:
+            logger.error(f"Page cache lookup failed, downloading {url} unconditionally: {e}")
+            return None
+        if row is None or not (row[1] or row[2]):
+            return None
+        return {"sha256": row[0], "etag": row[1], "last_modified": row[2]}
+
+    def remember_url(self, url: str, sha256: str, etag: Optional[str], last_modified: Optional[str]):
+        try:
+            with self.db.connect() as connection:
+                if etag or last_modified:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO pdf_urls (url, sha256, etag, last_modified) VALUES (?, ?, ?, ?)",
+                        (url, sha256, etag, last_modified)
+                    )
+                else:
+                    connection.execute("DELETE FROM pdf_urls WHERE url = ?", (url,))
+        except STORE_ERRORS as e:
+            logger.error(f"Failed to record validators for {url}: {e}")
+
+    def _forget_evicted_urls(self, connection):
+        connection.execute("DELETE FROM pdf_urls WHERE sha256 NOT IN (SELECT sha256 FROM pdf_pages)")
+
+    def stats(self) -> dict:
+        return self.db.stats()
+
+def create_page_cache() -> Optional[PageCache]:
+    # Opt-in like the response cache's disk tier: on App Engine /tmp lives in the instance's memory
+    path = os.environ.get("PDF_PAGE_CACHE_PATH")
+    if not path:
+        return None
+    try:
+        cache = PageCache(path, max_bytes=int(os.environ.get("PDF_PAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+    except STORE_ERRORS as e:
+        logger.error(f"Page cache disabled, failed to open {path}: {e}")
+        return None
+    cache.db.register_size_gauge("kai_pdf_page_cache_bytes", "Bytes of extracted PDF text held by the page cache.")
+    return cache
+
+page_cache = create_page_cache()
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from io import BytesIO
+from typing import List, Union
+from pypdf import PdfReader
+from app.services.logger import setup_logger
+from app.services.page_cache import page_cache, content_hash
+
+logger = setup_logger(__name__)
+
+PDFSource = Union[bytes, str]  # File contents or a path
+
+def _open(source: PDFSource) -> PdfReader:
+    return PdfReader(BytesIO(source) if isinstance(source, bytes) else source)
+
+def _extract_pages(source: PDFSource, start: int, stop: int) -> List[str]:
+    # Runs in the worker processes, each task opens the file again and only parses its own pages
+    reader = _open(source)
+    return [reader.pages[index].extract_text() for index in range(start, stop)]
+
+class PDFExtractor:
+    """
+    Extracts the text of every page of a batch of PDFs. Large batches are split into ranges of `pages_per_task`
+    pages that run on a pool of `workers` processes, so the API worker's GIL stays free; batches under `min_pages`
+    pages are extracted in process, where starting the tasks would cost more than it saves.
+    With a `cache`, files whose bytes were extracted before are served from it without being parsed.
+    """
+    def __init__(self, workers=None, pages_per_task=16, min_pages=32, cache=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.min_pages = min_pages
+        self.cache = cache
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Started on first use, spawned rather than forked since the API process runs threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _reset_pool(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, sources: List[PDFSource]) -> List[List[str]]:
+        """Returns the text of each page of each source, in order."""
+        if self.cache is None:
+            return self._extract(sources)
+
+        hashes = [content_hash(self._read(source)) for source in sources]
+        texts = [self.cache.get(sha256) for sha256 in hashes]
+        missing = [index for index, pages in enumerate(texts) if pages is None]
+        if missing:
+            for index, pages in zip(missing, self._extract([sources[index] for index in missing])):
+                texts[index] = pages
+                self.cache.put(hashes[index], pages)
+        return texts
+
+    def _read(self, source: PDFSource) -> bytes:
+        if isinstance(source, bytes):
+            return source
+        with open(source, "rb") as file:
+            return file.read()
+
+    def _extract(self, sources: List[PDFSource]) -> List[List[str]]:
+        page_counts = [len(_open(source).pages) for source in sources]
+        if self.workers <= 1 or sum(page_counts) < self.min_pages:
+            return [_extract_pages(source, 0, count) for source, count in zip(sources, page_counts)]
+
+        try:
+            return self._extract_in_pool(sources, page_counts)
+        except BrokenProcessPool:
+            logger.warning("PDF extraction pool broke, extracting in process")
+            self._reset_pool()
+            return [_extract_pages(source, 0, count) for source, count in zip(sources, page_counts)]
+
+    def _extract_in_pool(self, sources, page_counts) -> List[List[str]]:
+        with ExitStack() as stack:
+            pool = self._pool()
+            tasks = []
+            for index, (source, count) in enumerate(zip(sources, page_counts)):
+                if isinstance(source, bytes):
+                    # Workers read the file from disk instead of receiving a pickled copy for every range
+                    source = self._spool(source, stack)
+                for start in range(0, count, self.pages_per_task):
+                    tasks.append((index, pool.submit(_extract_pages, source, start, min(count, start + self.pages_per_task))))
+
+            texts = [[] for _ in sources]
+            for index, future in tasks:
+                texts[index].extend(future.result())
+            return texts
+
+    def _spool(self, data: bytes, stack: ExitStack) -> str:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as file:
+            file.write(data)
+        stack.callback(os.unlink, file.name)
+        return file.name
+
+def create_pdf_extractor() -> PDFExtractor:
+    workers = os.environ.get("PDF_EXTRACTION_WORKERS")
+    return PDFExtractor(
+        workers=int(workers) if workers else None,
+        pages_per_task=int(os.environ.get("PDF_PAGES_PER_TASK", 16)),
+        min_pages=int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 32)),
+        cache=page_cache
+    )
+
+pdf_extractor = create_pdf_extractor()
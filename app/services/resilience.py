@@ -0,0 +1,402 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, AsyncIterator, Iterator, Optional
+from langchain_core.runnables import Runnable, RunnableConfig
+from app.services.logger import setup_logger
+from app.services.metrics import llm_retries, llm_hedges, llm_hedge_wins, llm_deadlines_exceeded, llm_fallbacks, llm_circuit_rejections
+from app.services.llm_cache import served_from_cache
+from app.services.circuit_breaker import CircuitBreaker
+from app.api.error_utilities import ModelDeadlineError, ModelUnavailableError
+
+logger = setup_logger(__name__)
+
+class ResiliencePolicy:
+    """
+    How model calls are bounded and retried. `deadline` bounds a whole call including retries, `attempt_timeout`
+    a single attempt from when it starts running. Streams fail when the first chunk takes longer than
+    `first_chunk_timeout` or the gap between two chunks is longer than `chunk_timeout`.
+    Hedging sends one duplicate of an attempt that is slower than the model's recent
+    `hedge_percentile` latency, at most `hedge_max_in_flight` duplicates run at once across all calls.
+    """
+    def __init__(self, deadline=120.0, attempt_timeout=30.0, max_attempts=3, retry_base_delay=0.5, retry_max_delay=8.0,
+                 hedging=True, hedge_percentile=0.95, hedge_min_samples=20, hedge_max_in_flight=4,
+                 first_chunk_timeout=30.0, chunk_timeout=30.0):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.first_chunk_timeout = first_chunk_timeout
+        self.chunk_timeout = chunk_timeout
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_slots = threading.BoundedSemaphore(hedge_max_in_flight)
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter, so retries from requests that failed together do not arrive together
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1)))
+
+def create_resilience_policy():
+    return ResiliencePolicy(
+        deadline=float(os.environ.get("LLM_DEADLINE_SECONDS", 120)),
+        attempt_timeout=float(os.environ.get("LLM_ATTEMPT_TIMEOUT_SECONDS", 30)),
+        max_attempts=int(os.environ.get("LLM_MAX_ATTEMPTS", 3)),
+        retry_base_delay=float(os.environ.get("LLM_RETRY_BASE_DELAY_SECONDS", 0.5)),
+        retry_max_delay=float(os.environ.get("LLM_RETRY_MAX_DELAY_SECONDS", 8)),
+        hedging=os.environ.get("LLM_HEDGING", "true").lower() == "true",
+        hedge_percentile=float(os.environ.get("LLM_HEDGE_PERCENTILE", 0.95)),
+        hedge_min_samples=int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", 20)),
+        hedge_max_in_flight=int(os.environ.get("LLM_HEDGE_MAX_IN_FLIGHT", 4)),
+        first_chunk_timeout=float(os.environ.get("LLM_STREAM_FIRST_CHUNK_TIMEOUT_SECONDS", 30)),
+        chunk_timeout=float(os.environ.get("LLM_STREAM_CHUNK_TIMEOUT_SECONDS", 30))
+    )
+
+# Attempts run here so the caller can stop waiting on one that hangs, abandoned attempts end at the client timeout
+attempt_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("LLM_ATTEMPT_WORKERS", 32)), thread_name_prefix="llm-attempt")
+
+# Returned by a finished sync stream in place of a chunk
+_END_OF_STREAM = object()
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    # Overload and transient server errors, requests the API rejected will be rejected again
+    return isinstance(error, (exceptions.TooManyRequests, exceptions.ServiceUnavailable, exceptions.InternalServerError,
+                              exceptions.DeadlineExceeded, exceptions.GatewayTimeout))
+
+class LatencyWindow:
+    """Latencies of the most recent successful attempts of one model."""
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class ResilientLLM(Runnable):
+    """
+    Wraps an LLM so each call has a deadline, transient failures are retried with jittered backoff and slow
+    attempts are hedged. Streams are not retried, since chunks may have been sent already, but fail with
+    ModelDeadlineError when the model stalls before or between chunks.
+    With a circuit breaker, calls made while it is open go to `fallback` (another ResilientLLM) or fail fast
+    with ModelUnavailableError when there is none.
+    """
+    def __init__(self, llm: Runnable, model: str, policy: ResiliencePolicy, breaker: CircuitBreaker = None, fallback: "ResilientLLM" = None):
+        self.llm = llm
+        self.model = model
+        self.policy = policy
+        self.breaker = breaker
+        self.fallback = fallback
+        self.latencies = LatencyWindow()
+
+    @property
+    def InputType(self):
+        return self.llm.InputType
+
+    @property
+    def OutputType(self):
+        return self.llm.OutputType
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.policy.hedging:
+            return None
+        return self.latencies.percentile(self.policy.hedge_percentile, self.policy.hedge_min_samples)
+
+    def _record_primary(self, started_at, context):
+        # Only primaries that reached the model are recorded, hedges winning and cache hits would pull the percentile down
+        def record(future):
+            if not future.cancelled() and future.exception() is None and not context.get(served_from_cache):
+                self.latencies.record(time.monotonic() - started_at)
+        return record
+
+    def _attempt_context(self):
+        # Each attempt runs in its own copy of the caller's context, a context cannot be entered by two threads
+        context = contextvars.copy_context()
+        context.run(served_from_cache.set, False)
+        return context
+
+    def _remaining(self, deadline: float) -> float:
+        return deadline - time.monotonic()
+
+    def _retry_or_raise(self, error: Exception, attempt: int, deadline: float) -> float:
+        # Returns the backoff before the next attempt, or raises when the call should give up
+        retry = attempt < self.policy.max_attempts and is_retryable(error)
+        delay = self.policy.backoff(attempt) if retry else 0
+        if not retry or delay >= self._remaining(deadline):
+            if isinstance(error, ModelDeadlineError):
+                llm_deadlines_exceeded.inc(model=self.model)
+            raise error
+        llm_retries.inc(model=self.model)
+        logger.warning(f"Retrying {self.model} call after attempt {attempt} failed: {error}")
+        return delay
+
+    def _route(self) -> Optional["ResilientLLM"]:
+        # Returns the fallback to use instead of this model, or None when the call may go to this model
+        if self.breaker is None or self.breaker.allow():
+            return None
+        if self.fallback is None:
+            llm_circuit_rejections.inc(model=self.model)
+            raise ModelUnavailableError(f"{self.model} is unavailable, its circuit breaker is open")
+        llm_fallbacks.inc(model=self.model, fallback=self.fallback.model)
+        return self.fallback
+
+    def _record_call(self, started_at: float, error: BaseException = None, context=None):
+        if self.breaker is None:
+            return
+        if error is None and not context.get(served_from_cache):
+            self.breaker.record(True, time.monotonic() - started_at)
+        elif isinstance(error, Exception) and is_retryable(error):
+            self.breaker.record(False, time.monotonic() - started_at)
+        else:
+            # Cache hits, rejected requests and cancellations say nothing about the model's health
+            self.breaker.release()
+
+    def _start(self, function, *args, **kwargs):
+        # Returns the future and an event that is set once a worker picks the call up
+        started = threading.Event()
+
+        def run():
+            started.set()
+            return function(*args, **kwargs)
+
+        return attempt_executor.submit(run), started
+
+    def _wait_for_worker(self, future, started: threading.Event, deadline: float) -> float:
+        # Time spent queued behind abandoned attempts only counts against the call's deadline, not the attempt's timeout
+        if not started.wait(timeout=max(0, self._remaining(deadline))):
+            future.cancel()
+            raise ModelDeadlineError(f"{self.model} found no free attempt worker before its deadline")
+        return time.monotonic()
+
+    def _submit(self, input, config, kwargs, context):
+        return self._start(context.run, self.llm.invoke, input, config, **kwargs)
+
+    def _attempt(self, input, config, kwargs, deadline: float):
+        context = self._attempt_context()
+        primary, primary_started = self._submit(input, config, kwargs, context)
+        started_at = self._wait_for_worker(primary, primary_started, deadline)
+        attempt_deadline = min(deadline, started_at + self.policy.attempt_timeout)
+        primary.add_done_callback(self._record_primary(started_at, context))
+        futures = [primary]
+        contexts = {primary: context}
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None:
+            wait(futures, timeout=max(0, min(hedge_delay, self._remaining(attempt_deadline))))
+            if not primary.done() and self._remaining(attempt_deadline) > 0 and self.policy.hedge_slots.acquire(blocking=False):
+                llm_hedges.inc(model=self.model)
+                hedge_context = self._attempt_context()
+                hedge, _ = self._submit(input, config, kwargs, hedge_context)
+                hedge.add_done_callback(lambda _: self.policy.hedge_slots.release())
+                futures.append(hedge)
+                contexts[hedge] = hedge_context
+
+        errors = []
+        while futures:
+            done, _ = wait(futures, timeout=max(0, self._remaining(attempt_deadline)), return_when=FIRST_COMPLETED)
+            if not done:
+                for future in futures:
+                    future.cancel()
+                raise ModelDeadlineError(f"{self.model} did not answer within {time.monotonic() - started_at:.1f}s")
+            for future in done:
+                futures.remove(future)
+                if future.exception() is None:
+                    if future is not primary:
+                        llm_hedge_wins.inc(model=self.model)
+                    return future.result(), contexts[future]
+                errors.append(future.exception())
+        raise errors[0]
+
+    def _call(self, input, config, kwargs):
+        deadline = time.monotonic() + self.policy.deadline
+        attempt = 1
+        while True:
+            try:
+                return self._attempt(input, config, kwargs, deadline)
+            except Exception as e:
+                time.sleep(self._retry_or_raise(e, attempt, deadline))
+                attempt += 1
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        fallback = self._route()
+        if fallback is not None:
+            return fallback.invoke(input, config, **kwargs)
+
+        started_at = time.monotonic()
+        try:
+            result, context = self._call(input, config, kwargs)
+        except BaseException as e:
+            self._record_call(started_at, e)
+            raise
+        self._record_call(started_at, context=context)
+        return result
+
+    async def _aattempt(self, input, config, kwargs, deadline: float):
+        attempt_deadline = min(deadline, time.monotonic() + self.policy.attempt_timeout)
+        started_at = time.monotonic()
+        context = self._attempt_context()
+        primary = asyncio.get_running_loop().create_task(self.llm.ainvoke(input, config, **kwargs), context=context)
+        primary.add_done_callback(self._record_primary(started_at, context))
+        tasks = [primary]
+        contexts = {primary: context}
+        hedge_slot = False
+
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None:
+                await asyncio.wait(tasks, timeout=max(0, min(hedge_delay, self._remaining(attempt_deadline))))
+                if not primary.done() and self._remaining(attempt_deadline) > 0 and self.policy.hedge_slots.acquire(blocking=False):
+                    hedge_slot = True
+                    llm_hedges.inc(model=self.model)
+                    hedge_context = self._attempt_context()
+                    hedge = asyncio.get_running_loop().create_task(self.llm.ainvoke(input, config, **kwargs), context=hedge_context)
+                    tasks.append(hedge)
+                    contexts[hedge] = hedge_context
+
+            errors = []
+            pending = list(tasks)
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=max(0, self._remaining(attempt_deadline)), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise ModelDeadlineError(f"{self.model} did not answer within {time.monotonic() - started_at:.1f}s")
+                for task in done:
+                    pending.remove(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            llm_hedge_wins.inc(model=self.model)
+                        return task.result(), contexts[task]
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            # Unlike threads, the losing and timed out coroutines can actually be stopped
+            for task in tasks:
+                task.cancel()
+            if hedge_slot:
+                self.policy.hedge_slots.release()
+
+    async def _acall(self, input, config, kwargs):
+        deadline = time.monotonic() + self.policy.deadline
+        attempt = 1
+        while True:
+            try:
+                return await self._aattempt(input, config, kwargs, deadline)
+            except Exception as e:
+                await asyncio.sleep(self._retry_or_raise(e, attempt, deadline))
+                attempt += 1
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        fallback = self._route()
+        if fallback is not None:
+            return await fallback.ainvoke(input, config, **kwargs)
+
+        started_at = time.monotonic()
+        try:
+            result, context = await self._acall(input, config, kwargs)
+        except BaseException as e:
+            self._record_call(started_at, e)
+            raise
+        self._record_call(started_at, context=context)
+        return result
+
+    def _stalled(self, waited: float, first: bool) -> ModelDeadlineError:
+        llm_deadlines_exceeded.inc(model=self.model)
+        return ModelDeadlineError(f"{self.model} sent no {'first ' if first else ''}chunk within {waited:.1f}s")
+
+    def _record_stream(self, started_at: float, error: BaseException = None):
+        if self.breaker is None:
+            return
+        if isinstance(error, ModelDeadlineError):
+            self.breaker.record(False, time.monotonic() - started_at)
+        else:
+            self.breaker.release()
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        fallback = self._route()
+        if fallback is not None:
+            yield from fallback.stream(input, config, **kwargs)
+            return
+
+        # Chunks are read on the attempt workers, so a stalled stream can be abandoned like a hung attempt
+        started_at = time.monotonic()
+        chunks = iter(self.llm.stream(input, config, **kwargs))
+        context = contextvars.copy_context()
+        first = True
+        abandoned = False
+        try:
+            while True:
+                timeout = self.policy.first_chunk_timeout if first else self.policy.chunk_timeout
+                future, started = self._start(context.run, next, chunks, _END_OF_STREAM)
+                self._wait_for_worker(future, started, time.monotonic() + self.policy.deadline)
+                done, _ = wait([future], timeout=timeout)
+                if not done:
+                    abandoned = True
+                    raise self._stalled(timeout, first)
+                chunk = future.result()
+                if chunk is _END_OF_STREAM:
+                    break
+                yield chunk
+                first = False
+        except BaseException as e:
+            self._record_stream(started_at, e)
+            raise
+        else:
+            self._record_stream(started_at)
+        finally:
+            # A stream still being read by an abandoned worker cannot be closed from here
+            if not abandoned and hasattr(chunks, "close"):
+                chunks.close()
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        fallback = self._route()
+        if fallback is not None:
+            async for chunk in fallback.astream(input, config, **kwargs):
+                yield chunk
+            return
+
+        started_at = time.monotonic()
+        chunks = self.llm.astream(input, config, **kwargs).__aiter__()
+        first = True
+        abandoned = False
+        try:
+            while True:
+                timeout = self.policy.first_chunk_timeout if first else self.policy.chunk_timeout
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+                done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+                if not done:
+                    # The cancelled read finishes the stream, it is not waited for
+                    next_chunk.cancel()
+                    abandoned = True
+                    raise self._stalled(timeout, first)
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                yield chunk
+                first = False
+        except BaseException as e:
+            self._record_stream(started_at, e)
+            raise
+        else:
+            self._record_stream(started_at)
+        finally:
+            if not abandoned and hasattr(chunks, "aclose"):
+                await chunks.aclose()
@@ -0,0 +1,237 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi.encoders import jsonable_encoder
+from app.services.logger import setup_logger
+from app.services.tool_registry import ToolFile
+from app.services.downloads import downloader
+
+logger = setup_logger(__name__)
+
+# Inputs that change how a tool runs but not what it returns
+IGNORED_INPUTS = {"verbose"}
+
+FINGERPRINT_TIMEOUT = 10  # Seconds allowed for asking the server about a file to fingerprint it
+
+def fingerprint_url(url: str) -> str:
+    """
+    Returns a content hash for the file at `url`.
+    Uses the MD5 the server publishes (Google Cloud Storage x-goog-hash or Content-MD5) when available, then the URL
+    with its ETag or Last-Modified, and only downloads the body to hash it when the server sends none of those.
+    """
+    head = downloader.session.head(url, allow_redirects=True, timeout=(downloader.connect_timeout, FINGERPRINT_TIMEOUT))
+    if head.status_code == 200:
+        for part in head.headers.get("x-goog-hash", "").split(","):
+            name, _, value = part.strip().partition("=")
+            if name == "md5" and value:
+                return f"md5:{base64.b64decode(value).hex()}"
+        if head.headers.get("Content-MD5"):
+            return f"md5:{base64.b64decode(head.headers['Content-MD5']).hex()}"
+
+        validator = head.headers.get("ETag") or head.headers.get("Last-Modified")
+        if validator:
+            version = f"{url}\x00{validator}\x00{head.headers.get('Content-Length', '')}"
+            return f"url:{hashlib.sha256(version.encode('utf-8')).hexdigest()}"
+
+    # Same size cap and deadlines as the loaders' downloads
+    body = downloader.fetch(url, loader="fingerprint")
+    return f"sha256:{hashlib.sha256(body.getbuffer()).hexdigest()}"
+
+def normalize_input(value, fingerprint):
+    if isinstance(value, ToolFile):
+        # The same file under a different URL or name gives the same result
+        return {"content": fingerprint(value.url)}
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, list):
+        return [normalize_input(item, fingerprint) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize_input(item, fingerprint) for key, item in value.items()}
+    return value
+
+def request_cache_key(tool_id, request_inputs_dict, fingerprint=fingerprint_url) -> str:
+    """Canonical hash of a tool request: the tool id, normalized inputs and the content hash of each file."""
+    normalized = {
+        name: normalize_input(value, fingerprint)
+        for name, value in request_inputs_dict.items()
+        if name not in IGNORED_INPUTS
+    }
+    canonical = json.dumps({"tool_id": str(tool_id), "inputs": normalized}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class DiskCacheTier:
+    """One JSON file per entry. Writes are atomic renames so several worker processes can share the directory."""
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._approximate_bytes = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+        if entry["expires_at"] <= time.time():
+            self._remove(path)
+            return None
+
+        os.utime(path)  # mtime doubles as last access time for LRU eviction
+        return entry
+
+    def set(self, key, value, expires_at):
+        data = json.dumps({"expires_at": expires_at, "value": value}).encode("utf-8")
+        path = self._path(key)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            if self._approximate_bytes is None:
+                self._approximate_bytes = self._scan_size()
+            self._approximate_bytes += len(data)
+            if self._approximate_bytes > self.max_bytes:
+                self._approximate_bytes = self._evict()
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _evict(self) -> int:
+        # Removes least recently used entries until the directory is back under 90% of its budget
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            self._remove(path)
+            total -= stat.st_size
+        return total
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class ResponseCache:
+    """
+    Two tier cache of tool responses: an LRU in memory bounded by `max_bytes`, and an optional disk tier.
+    Entries expire after their TTL. Values must be JSON serializable.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_tier=None):
+        self.max_bytes = max_bytes
+        self.disk_tier = disk_tier
+        self.entries = OrderedDict()  # key -> (expires_at, size, value)
+        self.current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, size, value = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        if self.disk_tier is not None:
+            disk_entry = self.disk_tier.get(key)
+            if disk_entry is not None:
+                self._store_in_memory(key, disk_entry["value"], disk_entry["expires_at"])
+                with self._lock:
+                    self.disk_hits += 1
+                return disk_entry["value"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, ttl: float):
+        value = jsonable_encoder(value)
+        expires_at = time.time() + ttl
+        self._store_in_memory(key, value, expires_at)
+        if self.disk_tier is not None:
+            try:
+                self.disk_tier.set(key, value, expires_at)
+            except OSError as e:
+                logger.error(f"Failed to write response cache entry to disk: {e}")
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def _store_in_memory(self, key, value, expires_at):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (expires_at, size, value)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self.entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.current_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.current_bytes
+            }
+
+def create_response_cache():
+    disk_tier = None
+    if os.environ.get("RESPONSE_CACHE_DIR"):
+        disk_tier = DiskCacheTier(os.environ["RESPONSE_CACHE_DIR"], int(os.environ.get("RESPONSE_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)))
+    return ResponseCache(max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)), disk_tier=disk_tier)
+
+response_cache = create_response_cache()
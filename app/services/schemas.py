@@ -54,3 +54,33 @@ class ChatMessage(BaseModel):
     type: str
     text: str
 
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+class JobResponse(BaseModel):
+    job_id: str
+    tool_id: int
+    status: JobStatus
+    partial_result: List[Any] = []
+    result: Optional[Any] = None
+    error: Optional[Any] = None
+    created_at: float
+    updated_at: float
+    expires_at: Optional[float] = None
+
+class ToolBatchRequest(BaseModel):
+    requests: List[ToolRequest]
+    max_concurrency: Optional[int] = None  # Lowers the server's fan-out limit for this batch
+
+class ToolBatchItemResult(BaseModel):
+    index: int  # Position of the item in ToolBatchRequest.requests
+    status: int
+    data: Optional[Any] = None
+    error: Optional[Any] = None
+
+class ToolBatchResponse(BaseModel):
+    data: List[ToolBatchItemResult]
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+from app.services.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key into one execution. Every caller waiting on the key receives the
+    execution's result or its exception. A caller that is cancelled only stops waiting, the shared execution is
+    cancelled once no caller is waiting on it anymore.
+    Must be used from a single event loop.
+    """
+    def __init__(self):
+        self.flights = {}  # key -> Flight
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]], on_coalesced: Callable[[], None] = None) -> Any:
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.ensure_future(func()))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        elif on_coalesced is not None:
+            on_coalesced()
+
+        flight.waiters += 1
+        try:
+            # Shielded so a waiter being cancelled does not cancel the execution the other waiters share
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                logger.info(f"Cancelling in-flight execution {key}, no callers are waiting for it")
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key, flight):
+        # A cancelled flight may already have been replaced by a new one for the same key
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+    def in_flight(self) -> int:
+        return len(self.flights)
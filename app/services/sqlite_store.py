@@ -0,0 +1,79 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+from app.services.logger import setup_logger
+from app.services.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Raised when a cache file is locked, corrupt or cannot be opened, callers treat it as a miss and serve without the cache
+STORE_ERRORS = (sqlite3.Error, OSError)
+
+class SQLiteLRUStore:
+    """
+    A table in a SQLite file, shared by every worker process on the host that uses the same file. Each row records its
+    `size` in bytes and when it was last read (`accessed_at`); rows are evicted least recently used first once the
+    table holds more than `max_bytes`. The total is read from the table on every check, so writes from the other
+    processes count towards the budget too.
+    `before_evict` and `after_evict` run inside the eviction transaction, to expire or clean up related rows.
+    """
+    def __init__(
+        self, db_path, table: str, schema: Iterable[str], max_bytes: int, key_column: str = "key",
+        before_evict: Optional[Callable[[sqlite3.Connection], None]] = None,
+        after_evict: Optional[Callable[[sqlite3.Connection], None]] = None
+    ):
+        self.db_path = db_path
+        self.table = table
+        self.key_column = key_column
+        self.max_bytes = max_bytes
+        self.before_evict = before_evict
+        self.after_evict = after_evict
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in schema:
+                connection.execute(statement)
+
+    @contextmanager
+    def connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def size(self, connection: sqlite3.Connection) -> int:
+        return connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def enforce_budget(self, connection: sqlite3.Connection):
+        """Called after every write, evicts once the table is over its budget."""
+        if self.size(connection) > self.max_bytes:
+            self.evict(connection)
+
+    def evict(self, connection: sqlite3.Connection) -> int:
+        # Drops least recently used rows until the table is back under 90% of its budget
+        connection.execute("BEGIN IMMEDIATE")
+        if self.before_evict is not None:
+            self.before_evict(connection)
+        total = self.size(connection)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for key, size in connection.execute(f"SELECT {self.key_column}, size FROM {self.table} ORDER BY accessed_at").fetchall():
+            if total <= target:
+                break
+            connection.execute(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", (key,))
+            total -= size
+            evicted += 1
+        if self.after_evict is not None:
+            self.after_evict(connection)
+        connection.execute("COMMIT")
+        if evicted:
+            logger.info(f"Evicted {evicted} rows from {self.table}")
+        return total
+
+    def stats(self) -> dict:
+        with self.connect() as connection:
+            entries, total = connection.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        return {"entries": entries, "bytes": total}
+
+    def register_size_gauge(self, name: str, documentation: str):
+        metrics.register_collector(lambda: [(name, "gauge", documentation, [({}, self.stats()["bytes"])])])
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.admission import AdmissionController, InMemoryRateLimitBackend, SQLiteRateLimitBackend
+from app.api.error_utilities import AdmissionRejectedError
+
+@pytest.mark.parametrize("make_backend", [lambda tmp_path: InMemoryRateLimitBackend(), lambda tmp_path: SQLiteRateLimitBackend(str(tmp_path / "buckets.sqlite3"))])
+def test_token_bucket_allows_burst_then_limits(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+
+    assert [backend.acquire("user:1", rate=1, capacity=2) for _ in range(2)] == [0.0, 0.0]
+    assert backend.acquire("user:1", rate=1, capacity=2) > 0
+    assert backend.acquire("user:2", rate=1, capacity=2) == 0.0
+
+def test_rate_limited_user_is_rejected_with_retry_hint():
+    controller = AdmissionController(rate=0.1, burst=1)
+
+    async def admit_twice():
+        async with controller.admit("1"):
+            pass
+        async with controller.admit("1"):
+            pass
+
+    with pytest.raises(AdmissionRejectedError) as exc_info:
+        asyncio.run(admit_twice())
+    assert 9 < exc_info.value.retry_after <= 10
+
+def test_waiting_requests_get_released_slots():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1, rate=100, burst=100)
+    order = []
+
+    async def request(name, hold):
+        async with controller.admit(name):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def run():
+        await asyncio.gather(request("first", 0.05), request("second", 0))
+
+    asyncio.run(run())
+    assert order == ["first", "second"]
+    assert controller.in_flight == 0
+
+def test_full_queue_rejects_immediately():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, rate=100, burst=100)
+
+    async def run():
+        async with controller.admit("1"):
+            with pytest.raises(AdmissionRejectedError):
+                await controller._acquire_slot()
+
+    asyncio.run(run())
+    assert controller.rejected == 1
+
+def test_queue_timeout_rejects():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.01, rate=100, burst=100)
+
+    async def run():
+        async with controller.admit("1"):
+            with pytest.raises(AdmissionRejectedError):
+                await controller._acquire_slot()
+
+    asyncio.run(run())
+    assert controller.in_flight == 0
+
+def test_submit_tool_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    request = {
+        "user": {"id": "limited", "fullName": "Ada Lovelace", "email": "ada@example.com"},
+        "type": "tool",
+        "tool_data": {"tool_id": 1, "inputs": []}
+    }
+
+    with patch('app.api.router.admission_controller', AdmissionController(rate=0.01, burst=1)):
+        with TestClient(app) as client:
+            first = client.post("/submit-tool", json=request, headers={"api-key": "dev"})
+            second = client.post("/submit-tool", json=request, headers={"api-key": "dev"})
+
+    assert first.status_code == 400
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+
+def test_batch_larger_than_burst_is_admitted_once_and_leaves_the_bucket_in_debt():
+    backend = InMemoryRateLimitBackend()
+
+    assert backend.acquire("user:1", rate=1, capacity=2, cost=5) == 0.0
+    assert 3.9 < backend.acquire("user:1", rate=1, capacity=2) <= 4
+
+def test_refilled_buckets_are_pruned():
+    backend = InMemoryRateLimitBackend()
+    backend.acquire("user:idle", rate=1000, capacity=1)
+    backend.acquire("user:busy", rate=0.001, capacity=1)
+
+    time.sleep(0.01)
+    backend._pruned_at -= backend.PRUNE_INTERVAL
+    backend.acquire("user:other", rate=0.001, capacity=1)
+
+    assert set(backend.buckets) == {"user:busy", "user:other"}
+
+def test_refilled_sqlite_buckets_are_pruned(tmp_path):
+    backend = SQLiteRateLimitBackend(str(tmp_path / "buckets.sqlite3"))
+    backend.acquire("user:idle", rate=0.001, capacity=1)
+    backend.acquire("user:busy", rate=0.001, capacity=1, cost=0.5)
+    with backend._connect() as connection:
+        connection.execute("UPDATE buckets SET updated_at = updated_at - 1000 WHERE key = 'user:idle'")
+
+    backend._pruned_at -= backend.PRUNE_INTERVAL
+    backend.acquire("user:other", rate=0.001, capacity=1)
+
+    with backend._connect() as connection:
+        keys = {key for key, in connection.execute("SELECT key FROM buckets")}
+    assert keys == {"user:busy", "user:other"}
+
+def test_blocking_backend_runs_off_the_event_loop(tmp_path):
+    backend = SQLiteRateLimitBackend(str(tmp_path / "buckets.sqlite3"))
+    controller = AdmissionController(backend=backend)
+    threads = []
+    acquire = backend.acquire
+
+    def recording_acquire(*args):
+        threads.append(threading.current_thread())
+        return acquire(*args)
+
+    async def run():
+        with patch.object(backend, "acquire", recording_acquire):
+            await controller.check_rate_limit("1")
+
+    asyncio.run(run())
+    assert threads and threads[0] is not threading.main_thread()
+
+def test_batch_items_are_charged_to_their_user(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    tool_request = {
+        "user": {"id": "batched", "fullName": "Ada Lovelace", "email": "ada@example.com"},
+        "type": "tool",
+        "tool_data": {"tool_id": 1, "inputs": []}
+    }
+
+    with patch('app.api.router.admission_controller', AdmissionController(rate=0.01, burst=3)):
+        with TestClient(app) as client:
+            first = client.post("/submit-tools-batch", json={"requests": [tool_request] * 3}, headers={"api-key": "dev"})
+            second = client.post("/submit-tool", json=tool_request, headers={"api-key": "dev"})
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+
+def test_streaming_routes_are_admitted(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    request = {
+        "user": {"id": "streaming", "fullName": "Ada Lovelace", "email": "ada@example.com"},
+        "type": "tool",
+        "tool_data": {"tool_id": 1, "inputs": []}
+    }
+    controller = AdmissionController(rate=0.01, burst=1)
+
+    with patch('app.api.router.admission_controller', controller):
+        with TestClient(app) as client:
+            first = client.post("/submit-tool/stream", json=request, headers={"api-key": "dev"})
+            second = client.post("/submit-tool/stream", json=request, headers={"api-key": "dev"})
+            job = client.post("/jobs", json=request, headers={"api-key": "dev"})
+
+    assert first.status_code == 400
+    assert second.status_code == 429
+    assert job.status_code == 429
+    assert controller.in_flight == 0
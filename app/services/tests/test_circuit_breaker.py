@@ -0,0 +1,122 @@
+import pytest
+from langchain_core.runnables import RunnableLambda
+from app.services.circuit_breaker import CircuitBreaker, parse_fallbacks, CLOSED, HALF_OPEN, OPEN
+from app.services.model_provider import ModelRegistry
+from app.services.resilience import ResiliencePolicy
+from app.services.metrics import llm_fallbacks
+from app.api.error_utilities import ModelUnavailableError
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def breaker(clock, **overrides):
+    settings = {"window": 10, "min_calls": 4, "error_rate": 0.5, "slow_seconds": 5, "open_seconds": 30, "half_open_probes": 2}
+    return CircuitBreaker("gemini-1.0-pro", clock=clock, **{**settings, **overrides})
+
+def test_breaker_opens_on_error_rate_and_recovers_through_half_open_probes():
+    clock = Clock()
+    circuit = breaker(clock)
+    for succeeded in (True, False, True, False):
+        assert circuit.allow()
+        circuit.record(succeeded, 0.1)
+
+    assert circuit.state == OPEN
+    assert not circuit.allow()
+
+    clock.now = 31
+    assert circuit.allow() and circuit.allow()
+    assert circuit.state == HALF_OPEN
+    assert not circuit.allow()  # Only two probes at a time
+
+    circuit.record(True, 0.1)
+    circuit.record(True, 0.1)
+    assert circuit.state == CLOSED
+
+def test_failed_probe_opens_the_breaker_again():
+    clock = Clock()
+    circuit = breaker(clock, min_calls=1)
+    circuit.record(False, 0.1)
+
+    clock.now = 31
+    assert circuit.allow()
+    circuit.record(False, 0.1)
+
+    assert circuit.state == OPEN
+    clock.now = 40
+    assert not circuit.allow()
+
+def test_breaker_opens_when_calls_are_slow():
+    circuit = breaker(Clock())
+    for _ in range(4):
+        circuit.record(True, 6)
+
+    assert circuit.state == OPEN
+
+def test_released_probes_free_their_slot():
+    clock = Clock()
+    circuit = breaker(clock, min_calls=1, half_open_probes=1)
+    circuit.record(False, 0.1)
+    clock.now = 31
+
+    assert circuit.allow()
+    circuit.release()
+    assert circuit.allow()
+
+def test_parse_fallbacks():
+    assert parse_fallbacks("gemini-1.0-pro=gemini-1.5-flash, gemini-1.5-pro = gemini-1.5-flash,broken,self=self") == {
+        "gemini-1.0-pro": "gemini-1.5-flash",
+        "gemini-1.5-pro": "gemini-1.5-flash"
+    }
+
+class DegradedProvider:
+    """gemini-1.0-pro fails, every other model answers with its name."""
+    name = "degraded"
+
+    def __init__(self):
+        self.calls = []
+
+    def create_llm(self, model, cache=None):
+        def call(prompt):
+            self.calls.append(model)
+            if model == "gemini-1.0-pro":
+                raise ConnectionError("unavailable")
+            return model
+        return RunnableLambda(call)
+
+def registry(provider, fallbacks):
+    return ModelRegistry(
+        provider,
+        ResiliencePolicy(max_attempts=1, hedging=False),
+        breaker_factory=lambda model: CircuitBreaker(model, min_calls=2, open_seconds=60),
+        fallbacks=fallbacks
+    )
+
+def test_open_breaker_sends_calls_to_the_fallback_model():
+    provider = DegradedProvider()
+    models = registry(provider, {"gemini-1.0-pro": "gemini-1.5-flash"})
+    llm = models.llm("gemini-1.0-pro")
+    fallbacks = llm_fallbacks.value(model="gemini-1.0-pro", fallback="gemini-1.5-flash")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            llm.invoke("prompt")
+
+    assert llm.invoke("prompt") == "gemini-1.5-flash"
+    assert provider.calls == ["gemini-1.0-pro", "gemini-1.0-pro", "gemini-1.5-flash"]
+    assert llm_fallbacks.value(model="gemini-1.0-pro", fallback="gemini-1.5-flash") - fallbacks == 1
+    assert ({"model": "gemini-1.0-pro"}, 2) in models.collect_metrics()[0][3]
+
+def test_open_breaker_without_fallback_fails_fast():
+    provider = DegradedProvider()
+    llm = registry(provider, {}).llm("gemini-1.0-pro")
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            llm.invoke("prompt")
+
+    with pytest.raises(ModelUnavailableError):
+        llm.invoke("prompt")
+    assert len(provider.calls) == 2
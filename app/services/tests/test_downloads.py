@@ -0,0 +1,80 @@
+import time
+import pytest
+from app.services.downloads import Downloader
+from app.api.error_utilities import LoaderError
+
+class FakeResponse:
+    def __init__(self, body=b"%PDF", status_code=200, content_type="application/pdf", length=True, delay=0.0):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type}
+        if length:
+            self.headers["Content-Length"] = str(len(body))
+        self.delay = delay
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            time.sleep(self.delay)
+            self.read += chunk_size
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+    """Answers each URL with its FakeResponse after `latency` seconds."""
+    def __init__(self, responses, latency=0.0):
+        self.responses = responses
+        self.latency = latency
+
+    def get(self, url, **kwargs):
+        time.sleep(self.latency)
+        return self.responses[url]
+
+def downloader(responses, latency=0.0, **overrides):
+    return Downloader(FakeSession(responses, latency), **{"workers": 4, **overrides})
+
+def test_files_are_downloaded_concurrently_and_returned_in_order():
+    responses = {f"https://example.com/{index}.pdf": FakeResponse(f"%PDF {index}".encode()) for index in range(4)}
+
+    started_at = time.monotonic()
+    results = downloader(responses, latency=0.2).fetch_all(list(responses))
+
+    assert time.monotonic() - started_at < 0.6
+    assert [result.read() for result in results] == [f"%PDF {index}".encode() for index in range(4)]
+    assert all(response.closed for response in responses.values())
+
+def test_unexpected_content_type_is_rejected_before_the_body_is_read():
+    response = FakeResponse(b"<html>Sign in</html>", content_type="text/html; charset=utf-8")
+
+    with pytest.raises(LoaderError):
+        downloader({"https://example.com/a.pdf": response}).fetch("https://example.com/a.pdf", {"application/pdf"})
+    assert response.read == 0
+
+def test_oversized_files_are_rejected():
+    announced = FakeResponse(b"x" * 100)
+    streamed = FakeResponse(b"x" * 200 * 1024, length=False)
+    responses = {"https://example.com/announced.pdf": announced, "https://example.com/streamed.pdf": streamed}
+
+    results = downloader(responses, max_bytes=64).fetch_all(list(responses))
+    assert isinstance(results[0], LoaderError) and announced.read == 0
+
+    results = downloader(responses, max_bytes=100 * 1024).fetch_all(list(responses))
+    assert isinstance(results[1], LoaderError) and streamed.read < len(streamed.body)
+
+def test_failed_and_slow_downloads_do_not_hide_the_others():
+    responses = {
+        "https://example.com/ok.pdf": FakeResponse(),
+        "https://example.com/missing.pdf": FakeResponse(status_code=404),
+        "https://example.com/slow.pdf": FakeResponse(b"x" * 10 * 64 * 1024, delay=0.1)
+    }
+
+    started_at = time.monotonic()
+    ok, missing, slow = downloader(responses, total_timeout=0.3).fetch_all(list(responses))
+
+    assert time.monotonic() - started_at < 0.5
+    assert ok.read() == b"%PDF"
+    assert isinstance(missing, LoaderError)
+    assert isinstance(slow, LoaderError)
@@ -0,0 +1,105 @@
+import sqlite3
+from unittest.mock import patch
+from langchain_core.embeddings import Embeddings
+from app.services.embedding_cache import EmbeddingStore, CachedEmbeddings, create_embedding_store
+from app.services.model_provider import ModelRegistry, FakeProvider
+from app.services.metrics import embedding_cache_lookups
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+
+    def embed_documents(self, texts):
+        self.documents.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), -0.5]
+
+def test_only_new_chunks_are_embedded(tmp_path):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, "models/embedding-001", EmbeddingStore(str(tmp_path / "embeddings.sqlite3")))
+    hits = embedding_cache_lookups.value(result="hit")
+
+    first = embeddings.embed_documents(["residuals", "least squares", "residuals"])
+    second = embeddings.embed_documents(["least  squares\n", "slope", "residuals"])
+
+    assert model.documents == ["residuals", "least squares", "slope"]
+    assert first == [[9.0, 0.5], [13.0, 0.5], [9.0, 0.5]]
+    assert second == [[13.0, 0.5], [5.0, 0.5], [9.0, 0.5]]
+    assert embedding_cache_lookups.value(result="hit") - hits == 3
+
+def test_queries_and_models_are_cached_apart(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, "models/embedding-001", store)
+
+    embeddings.embed_documents(["residuals"])
+    assert embeddings.embed_query("residuals") == [9.0, -0.5]
+    assert embeddings.embed_query("residuals") == [9.0, -0.5]
+    CachedEmbeddings(model, "textembedding-gecko@003", store).embed_documents(["residuals"])
+
+    assert model.queries == ["residuals"]
+    assert model.documents == ["residuals", "residuals"]
+
+def test_vectors_persist_as_float32(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingStore(path).put_many({"key": [0.1, 0.2, 0.3]})
+
+    store = EmbeddingStore(path)
+    vector = store.get_many(["key", "other"])
+
+    assert list(vector) == ["key"]
+    assert vector["key"] == [float.fromhex("0x1.99999a0000000p-4"), float.fromhex("0x1.99999a0000000p-3"), float.fromhex("0x1.3333340000000p-2")]
+    assert store.stats() == {"entries": 1, "bytes": 12}
+
+def test_least_recently_used_vectors_are_evicted(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"), max_bytes=100)
+    store.put_many({f"old {index}": [0.0] * 8 for index in range(3)})
+    store.put_many({"new": [0.0] * 8})
+
+    assert store.stats()["bytes"] <= 90
+    assert "new" in store.get_many(["new"])
+
+def test_registry_caches_embedding_clients(tmp_path):
+    registry = ModelRegistry(FakeProvider(), embedding_store=EmbeddingStore(str(tmp_path / "embeddings.sqlite3")))
+    embeddings = registry.embeddings("models/embedding-001")
+
+    assert isinstance(embeddings, CachedEmbeddings)
+    assert embeddings.embed_documents(["residuals"]) == embeddings.embed_documents(["residuals"])
+    assert len(embeddings.embed_query("residuals")) == 768
+
+def test_budget_counts_vectors_written_by_other_processes(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    first, second = EmbeddingStore(path, max_bytes=100), EmbeddingStore(path, max_bytes=100)
+    first.put_many({"first": [0.0] * 8})
+
+    for index in range(3):
+        (first if index % 2 else second).put_many({f"key {index}": [0.0] * 8})
+
+    assert first.stats()["bytes"] <= 100
+
+def test_unreadable_store_falls_back_to_the_model(tmp_path):
+    model = CountingEmbeddings()
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    embeddings = CachedEmbeddings(model, "models/embedding-001", store)
+
+    with patch.object(store.db, "connect", side_effect=sqlite3.OperationalError("database is locked")):
+        assert embeddings.embed_documents(["residuals"]) == [[9.0, 0.5]]
+        assert embeddings.embed_query("residuals") == [9.0, -0.5]
+
+    assert model.documents == ["residuals"] and model.queries == ["residuals"]
+
+def test_store_that_cannot_be_opened_is_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "missing" / "embeddings.sqlite3"))
+
+    assert create_embedding_store() is None
+
+def test_store_is_off_unless_a_path_is_set(tmp_path, monkeypatch):
+    monkeypatch.delenv("EMBEDDING_CACHE_PATH", raising=False)
+    assert create_embedding_store() is None
+
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    assert create_embedding_store().db.max_bytes == 64 * 1024 * 1024
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from app.services.execution_engine import ExecutionEngine, ToolPool
+
+def test_run_returns_result_and_records_timings():
+    pool = ToolPool("test", max_workers=1, queue_depth=1)
+
+    result = asyncio.run(pool.run(lambda x, y: x + y, 2, y=3))
+
+    assert result == 5
+    stats = pool.stats()
+    assert stats["completed"] == 1
+    assert stats["run_time_seconds"]["count"] == 1
+    assert stats["queue_wait_seconds"]["count"] == 1
+    pool.shutdown()
+
+def test_run_rejects_when_queue_is_full():
+    pool = ToolPool("test", max_workers=1, queue_depth=1)
+    release = threading.Event()
+
+    async def submit_three():
+        first = asyncio.ensure_future(pool.run(release.wait))
+        second = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc_info:
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(first, second)
+        return exc_info.value
+
+    error = asyncio.run(submit_three())
+    assert error.status_code == 503
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["completed"] == 2
+    pool.shutdown()
+
+def test_run_does_not_block_event_loop():
+    pool = ToolPool("test", max_workers=1, queue_depth=0)
+
+    async def run_with_ticker():
+        ticks = 0
+        task = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return ticks
+
+    assert asyncio.run(run_with_ticker()) > 5
+    pool.shutdown()
+
+def test_failed_execution_is_counted_and_raised():
+    pool = ToolPool("test", max_workers=1, queue_depth=0)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(pool.run(fail))
+    assert pool.stats()["failed"] == 1
+    pool.shutdown()
+
+def test_engine_uses_tool_execution_config():
+    engine = ExecutionEngine({"0": {"path": "features.quizzify.core", "execution": {"max_workers": 2, "queue_depth": 3}}})
+
+    pool = engine.get_pool(0)
+
+    assert pool.max_workers == 2
+    assert pool.queue_depth == 3
+    assert engine.get_pool("0") is pool
+    assert engine.get_pool(99).max_workers == 4
+    engine.shutdown()
+
+def test_cancelled_callers_keep_their_slot_until_the_worker_finishes():
+    pool = ToolPool("test", max_workers=1, queue_depth=0)
+    release = threading.Event()
+
+    async def cancel_five():
+        rejected = 0
+        for _ in range(5):
+            task = asyncio.ensure_future(pool.run(release.wait))
+            await asyncio.sleep(0.02)
+            if task.done():
+                rejected += isinstance(task.exception(), HTTPException)
+            else:
+                task.cancel()
+                await asyncio.sleep(0.01)
+        return rejected
+
+    assert asyncio.run(cancel_five()) == 4
+    assert pool.stats()["running"] == 1
+    release.set()
+    time.sleep(0.05)
+    assert pool.stats()["running"] == 0
+    pool.shutdown()
@@ -0,0 +1,50 @@
+import pytest
+from app.services.input_validation import CompiledInputValidator
+from app.services.tool_registry import ToolFile
+from app.api.error_utilities import InputValidationError
+
+quizzify_inputs = [
+    {"label": "Topic", "name": "topic", "type": "text"},
+    {"label": "Number of Questions", "name": "num_questions", "type": "number"},
+    {"label": "Upload PDF files", "name": "files", "type": "file"}
+]
+
+@pytest.fixture
+def validator():
+    return CompiledInputValidator(quizzify_inputs)
+
+def test_valid_inputs_convert_files(validator):
+    inputs = validator.validate({
+        "topic": "Quantum Mechanics",
+        "num_questions": 5,
+        "files": [{"url": "https://example.com/a.pdf", "filename": "a.pdf"}],
+        "extra_input": "Extra Value"
+    })
+
+    assert inputs["topic"] == "Quantum Mechanics"
+    assert isinstance(inputs["files"][0], ToolFile)
+    assert inputs["files"][0].filename == "a.pdf"
+    assert inputs["extra_input"] == "Extra Value"
+
+@pytest.mark.parametrize("inputs, message", [
+    ({"topic": "Quantum Mechanics", "files": []}, "Missing input: `num_questions`"),
+    ({"topic": 3, "num_questions": 5, "files": []}, "Input `topic` must be a string but got <class 'int'>"),
+    ({"topic": "Quantum Mechanics", "num_questions": "five", "files": []}, "Input `num_questions` must be a number but got <class 'str'>"),
+    ({"topic": "Quantum Mechanics", "num_questions": 5, "files": "a.pdf"}, "Input `files` must be a list of file dictionaries but got <class 'str'>"),
+    ({"topic": "Quantum Mechanics", "num_questions": 5, "files": ["a.pdf"]}, "Each item in the input `files` must be a dictionary representing a file but got <class 'str'>"),
+    ({"topic": "Quantum Mechanics", "num_questions": 5, "files": [{"filename": "a.pdf"}]}, "Each item in the input `files` must be a valid ToolFile where a URL is provided"),
+])
+def test_invalid_inputs(validator, inputs, message):
+    with pytest.raises(InputValidationError) as exc_info:
+        validator.validate(inputs)
+    assert exc_info.value.message == message
+
+def test_string_type_is_validated():
+    validator = CompiledInputValidator([{"label": "Youtube URL", "name": "youtube_url", "type": "string"}])
+
+    assert validator.validate({"youtube_url": "https://youtu.be/abc"}) == {"youtube_url": "https://youtu.be/abc"}
+    with pytest.raises(InputValidationError):
+        validator.validate({"youtube_url": ["https://youtu.be/abc"]})
+
+def test_number_accepts_floats(validator):
+    assert validator.validate({"topic": "t", "num_questions": 2.0, "files": []})["num_questions"] == 2.0
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from fastapi import HTTPException
+from app.services.job_store import JobStore, current_job_id, report_partial_result
+import app.services.job_store as job_store_module
+import app.api.job_utilities as job_utilities
+
+def make_store(tmp_path, result_ttl=3600):
+    return JobStore(str(tmp_path / "jobs.sqlite3"), result_ttl=result_ttl)
+
+def test_job_lifecycle(tmp_path):
+    store = make_store(tmp_path)
+    job_id = store.create(0, {"tool_data": {"tool_id": 0, "inputs": []}})
+    assert store.get(job_id)["status"] == "queued"
+
+    store.mark_running(job_id)
+    store.append_partial(job_id, {"question": "Q1"})
+    job = store.get(job_id)
+    assert job["status"] == "running"
+    assert job["partial_result"] == [{"question": "Q1"}]
+
+    store.complete(job_id, [{"question": "Q1"}, {"question": "Q2"}])
+    job = store.get(job_id)
+    assert job["status"] == "succeeded"
+    assert len(job["result"]) == 2
+    assert job["expires_at"] > time.time()
+
+def test_failed_job_records_error(tmp_path):
+    store = make_store(tmp_path)
+    job_id = store.create(1, {})
+
+    store.fail(job_id, 400, "No video found")
+
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == {"status": 400, "message": "No video found"}
+
+def test_finished_jobs_expire_after_ttl(tmp_path):
+    store = make_store(tmp_path, result_ttl=0)
+    job_id = store.create(0, {})
+    store.complete(job_id, [])
+
+    assert store.get(job_id) is None
+    assert store.evict_expired() == 1
+
+def test_jobs_survive_a_new_store_instance(tmp_path):
+    store = make_store(tmp_path)
+    job_id = store.create(0, {"tool_data": {"tool_id": 0, "inputs": []}})
+    store.mark_running(job_id)
+
+    restarted = make_store(tmp_path)
+    claimed = restarted.claim_stale_jobs(stale_after=-1)
+
+    assert claimed == [(job_id, {"tool_data": {"tool_id": 0, "inputs": []}})]
+    assert restarted.get(job_id)["status"] == "queued"
+    assert restarted.claim_stale_jobs(stale_after=-1) == []
+
+def test_report_partial_result_uses_current_job(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    monkeypatch.setattr(job_store_module, "job_store", store)
+    job_id = store.create(0, {})
+
+    report_partial_result({"ignored": True})
+    token = current_job_id.set(job_id)
+    try:
+        report_partial_result({"question": "Q1"})
+    finally:
+        current_job_id.reset(token)
+
+    assert store.get(job_id)["partial_result"] == [{"question": "Q1"}]
+
+def test_jobs_wait_for_a_tool_pool_slot_instead_of_failing(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    monkeypatch.setattr(job_utilities, "job_store", store)
+    monkeypatch.setattr(job_utilities, "JOB_RETRY_DELAY", 0.01)
+    attempts = []
+
+    async def run_tool(tool_id, request_inputs_dict):
+        attempts.append(tool_id)
+        if len(attempts) < 3:
+            raise HTTPException(status_code=503, detail="Tool is at capacity, please retry later")
+        return [{"question": "Q1"}]
+
+    monkeypatch.setattr(job_utilities, "run_tool", run_tool)
+    job_id = store.create(0, {})
+
+    asyncio.run(job_utilities.run_tool_job(job_id, 0, {}))
+
+    assert len(attempts) == 3
+    assert store.get(job_id)["status"] == "succeeded"
+
+def test_jobs_fail_with_503_once_they_waited_too_long_for_capacity(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    monkeypatch.setattr(job_utilities, "job_store", store)
+    monkeypatch.setattr(job_utilities, "JOB_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(job_utilities, "JOB_MAX_CAPACITY_WAIT", 0.05)
+
+    async def run_tool(tool_id, request_inputs_dict):
+        raise HTTPException(status_code=503, detail="Tool is at capacity, please retry later")
+
+    monkeypatch.setattr(job_utilities, "run_tool", run_tool)
+    job_id = store.create(0, {})
+
+    asyncio.run(job_utilities.run_tool_job(job_id, 0, {}))
+
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"]["status"] == 503
+    assert "Tool is at capacity" in job["error"]["message"]
@@ -0,0 +1,109 @@
+import asyncio
+import sqlite3
+import time
+from unittest.mock import patch
+from langchain_core.outputs import Generation
+from app.services.llm_cache import SQLiteLLMCache, create_llm_cache
+from app.services.model_provider import ModelRegistry, FakeProvider
+from app.services.resilience import ResiliencePolicy
+from app.services.metrics import llm_cache_lookups, llm_cache_bytes_saved
+
+def counting_provider():
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        return f"answer {len(prompts)}"
+
+    return FakeProvider(respond=respond), prompts
+
+def test_repeated_prompts_are_served_from_the_cache(tmp_path):
+    provider, prompts = counting_provider()
+    registry = ModelRegistry(provider, cache=SQLiteLLMCache(str(tmp_path / "llm.sqlite3")))
+    hits, saved = llm_cache_lookups.value(result="hit"), llm_cache_bytes_saved.value()
+
+    first = registry.llm("gemini-1.0-pro").invoke("Explain residuals")
+    second = registry.llm("gemini-1.0-pro").invoke("Explain residuals")
+    asynchronous = asyncio.run(registry.llm("gemini-1.0-pro").ainvoke("Explain residuals"))
+
+    assert first == second == asynchronous == "answer 1"
+    assert len(prompts) == 1
+    assert llm_cache_lookups.value(result="hit") - hits == 2
+    assert llm_cache_bytes_saved.value() > saved
+
+def test_cache_is_keyed_on_model_and_prompt(tmp_path):
+    provider, prompts = counting_provider()
+    registry = ModelRegistry(provider, cache=SQLiteLLMCache(str(tmp_path / "llm.sqlite3")))
+
+    registry.llm("gemini-1.0-pro").invoke("Explain residuals")
+    registry.llm("gemini-1.5-flash").invoke("Explain residuals")
+    registry.llm("gemini-1.0-pro").invoke("Explain  residuals")
+
+    assert len(prompts) == 3
+
+def test_opted_out_calls_always_reach_the_model(tmp_path):
+    provider, prompts = counting_provider()
+    registry = ModelRegistry(provider, cache=SQLiteLLMCache(str(tmp_path / "llm.sqlite3")))
+
+    answers = [registry.llm("gemini-1.0-pro", cache=False).invoke("Write a quiz question") for _ in range(3)]
+
+    assert answers == ["answer 1", "answer 2", "answer 3"]
+
+def test_entries_persist_and_expire(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    SQLiteLLMCache(path).update("prompt", "llm", [Generation(text="cached")])
+
+    assert SQLiteLLMCache(path).lookup("prompt", "llm")[0].text == "cached"
+
+    expiring = SQLiteLLMCache(path, ttl=0)
+    expiring.update("prompt", "llm", [Generation(text="cached")])
+    assert expiring.lookup("prompt", "llm") is None
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Each entry takes 85 bytes, the fourth goes over the budget
+    cache = SQLiteLLMCache(str(tmp_path / "llm.sqlite3"), max_bytes=300)
+    for index in range(3):
+        cache.update(f"prompt {index}", "llm", [Generation(text="x" * 50)])
+        time.sleep(0.01)
+    cache.lookup("prompt 0", "llm")
+    time.sleep(0.01)
+
+    cache.update("prompt 3", "llm", [Generation(text="x" * 50)])
+
+    assert cache.stats()["bytes"] <= 300 * 0.9
+    assert cache.lookup("prompt 0", "llm") is not None
+    assert cache.lookup("prompt 1", "llm") is None
+    assert cache.lookup("prompt 3", "llm") is not None
+
+def test_cache_hits_do_not_count_towards_hedging_latency(tmp_path):
+    provider, _ = counting_provider()
+    policy = ResiliencePolicy(hedge_min_samples=1)
+    registry = ModelRegistry(provider, policy, cache=SQLiteLLMCache(str(tmp_path / "llm.sqlite3")))
+    llm = registry.llm("gemini-1.0-pro")
+
+    for _ in range(3):
+        llm.invoke("Explain residuals")
+
+    assert len(llm.latencies.samples) == 1
+
+def test_unreadable_cache_falls_back_to_the_model(tmp_path):
+    provider, prompts = counting_provider()
+    cache = SQLiteLLMCache(str(tmp_path / "llm.sqlite3"))
+    registry = ModelRegistry(provider, cache=cache)
+
+    with patch.object(cache.db, "connect", side_effect=sqlite3.OperationalError("database is locked")):
+        answers = [registry.llm("gemini-1.0-pro").invoke("Explain residuals") for _ in range(2)]
+
+    assert answers == ["answer 1", "answer 2"]
+
+def test_cache_that_cannot_be_opened_is_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "missing" / "llm.sqlite3"))
+
+    assert create_llm_cache() is None
+
+def test_cache_is_off_unless_a_path_is_set(tmp_path, monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_PATH", raising=False)
+    assert create_llm_cache() is None
+
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite3"))
+    assert create_llm_cache().db.max_bytes == 64 * 1024 * 1024
@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+from app.services.logger import parse_module_levels, level_for, JsonFormatter, SamplingFilter, BoundedQueueHandler
+
+def make_record(level=logging.INFO, msg="message", args=None):
+    return logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+
+def test_most_specific_module_level_wins():
+    levels = parse_module_levels("app=WARNING, app.features.quizzify=DEBUG,broken")
+
+    assert level_for("app.features.quizzify.tools", logging.INFO, levels) == logging.DEBUG
+    assert level_for("app.api.router", logging.INFO, levels) == logging.WARNING
+    assert level_for("features.dynamo.core", logging.INFO, levels) == logging.INFO
+
+def test_long_messages_are_truncated_below_warning():
+    handler = BoundedQueueHandler(queue.Queue(), max_message_length=10)
+
+    handler.handle(make_record(msg="Generated response: %s", args=("x" * 100,)))
+    handler.handle(make_record(level=logging.ERROR, msg="y" * 100))
+
+    info, error = handler.queue.get_nowait(), handler.queue.get_nowait()
+    assert info.msg == "Generated ... [truncated 110 chars]"
+    assert error.msg == "y" * 100
+
+def test_full_queue_drops_debug_but_not_errors():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record())
+    handler.handle(make_record(level=logging.DEBUG))
+
+    assert handler.dropped == 1
+    assert handler.queue.qsize() == 1
+
+def test_sampling_never_drops_warnings():
+    sampling = SamplingFilter(rate=0.0)
+
+    assert not sampling.filter(make_record(level=logging.DEBUG))
+    assert sampling.filter(make_record(level=logging.WARNING))
+
+def test_json_formatter_emits_cloud_logging_fields():
+    entry = json.loads(JsonFormatter().format(make_record(msg="hello %s", args=("world",))))
+
+    assert entry["severity"] == "INFO"
+    assert entry["logger"] == "app.test"
+    assert entry["message"] == "hello world"
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models import FakeListLLM
+from app.services.metrics import MetricsRegistry, llm_calls, llm_latency
+from app.services.llm_callbacks import llm_metrics_callbacks
+from app.main import app
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage latency.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="load")
+    histogram.observe(0.5, stage="load")
+    histogram.observe(5, stage="load")
+
+    text = registry.render()
+
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="load",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="load",le="1.0"} 2' in text
+    assert 'stage_seconds_bucket{stage="load",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="load"} 3' in text
+    assert 'stage_seconds_sum{stage="load"} 5.55' in text
+
+def test_counter_requires_declared_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("downloads_total", "Downloads.", ("loader",))
+    counter.inc(10, loader="url")
+    counter.inc(5, loader="url")
+
+    assert counter.value(loader="url") == 15
+    assert 'downloads_total{loader="url"} 15' in registry.render()
+    with pytest.raises(ValueError):
+        counter.inc(1)
+
+def test_collectors_are_rendered():
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: [("pool_running", "gauge", "Running.", [({"tool_id": "0"}, 2)])])
+
+    assert 'pool_running{tool_id="0"} 2' in registry.render()
+
+def test_llm_callback_counts_calls_per_model():
+    before = llm_calls.value(model="fake-model", status="success")
+    llm = FakeListLLM(responses=["a", "b"], callbacks=llm_metrics_callbacks("fake-model"))
+
+    llm.invoke("first")
+    llm.invoke("second")
+
+    assert llm_calls.value(model="fake-model", status="success") == before + 2
+    assert llm_latency.count(model="fake-model") >= 2
+
+def test_metrics_endpoint_reports_request_latency_by_route(monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    with TestClient(app) as client:
+        client.get("/")
+        client.get("/jobs/unknown-job", headers={"api-key": "dev"})
+        response = client.get("/metrics", headers={"api-key": "dev"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'kai_http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert 'route="/jobs/{job_id}",status="404"' in response.text
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.services.model_provider import ModelRegistry, FakeProvider, create_model_registry
+
+def test_clients_are_shared_per_model():
+    registry = ModelRegistry(FakeProvider())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: registry.llm("gemini-1.0-pro"), range(16)))
+
+    assert all(client is clients[0] for client in clients)
+    assert registry.llm("gemini-1.5-flash") is not clients[0]
+    assert registry.embeddings("models/embedding-001") is registry.embeddings("models/embedding-001")
+
+def test_fake_provider_is_deterministic_with_sync_and_async_calls():
+    registry = ModelRegistry(FakeProvider(respond=lambda prompt: prompt.upper()))
+    llm = registry.llm("gemini-1.0-pro")
+    embeddings = registry.embeddings("models/embedding-001")
+
+    assert llm.invoke("hello") == "HELLO"
+    assert asyncio.run(llm.ainvoke("hello")) == "HELLO"
+    assert embeddings.embed_query("topic") == embeddings.embed_query("topic")
+    assert len(embeddings.embed_documents(["a", "b"])) == 2
+
+def test_switching_provider_drops_existing_clients():
+    registry = ModelRegistry(FakeProvider(respond=lambda prompt: "first"))
+    registry.llm("gemini-1.0-pro")
+
+    previous = registry.use(FakeProvider(respond=lambda prompt: "second"))
+
+    assert registry.llm("gemini-1.0-pro").invoke("hi") == "second"
+    assert previous.respond("hi") == "first"
+
+def test_provider_is_chosen_from_environment(monkeypatch):
+    monkeypatch.setenv("MODEL_PROVIDER", "fake")
+    assert create_model_registry().provider.name == "fake"
+
+    monkeypatch.setenv("MODEL_PROVIDER", "openai")
+    with pytest.raises(ValueError):
+        create_model_registry()
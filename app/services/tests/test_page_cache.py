@@ -0,0 +1,79 @@
+import sqlite3
+import time
+from unittest.mock import patch
+from app.services.page_cache import PageCache, content_hash, create_page_cache
+from app.services.pdf_extraction import PDFExtractor
+from app.services.metrics import page_cache_lookups
+from app.services.tests.test_pdf_extraction import LINEAR_REGRESSION, serial_text
+
+def test_pages_persist_across_instances(tmp_path):
+    path = str(tmp_path / "pages.sqlite3")
+    hits, misses = page_cache_lookups.value(result="hit"), page_cache_lookups.value(result="miss")
+
+    PageCache(path).put("abc", ["page 1", "page 2"])
+
+    assert PageCache(path).get("abc") == ["page 1", "page 2"]
+    assert PageCache(path).get("def") is None
+    assert page_cache_lookups.value(result="hit") - hits == 1
+    assert page_cache_lookups.value(result="miss") - misses == 1
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    # Each entry takes 54 bytes, the fourth goes over the budget
+    cache = PageCache(str(tmp_path / "pages.sqlite3"), max_bytes=200)
+    for index in range(3):
+        cache.put(f"file {index}", ["x" * 50])
+        time.sleep(0.01)
+    cache.get("file 0")
+    time.sleep(0.01)
+
+    cache.put("file 3", ["x" * 50])
+
+    assert cache.stats()["bytes"] <= 200 * 0.9
+    assert cache.get("file 0") is not None
+    assert cache.get("file 1") is None
+
+def test_urls_are_only_revalidated_while_their_pages_are_cached(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"), max_bytes=100)
+    cache.remember_url("https://example.com/a.pdf", "abc", '"v1"', None)
+    cache.remember_url("https://example.com/b.pdf", "def", None, None)
+    assert cache.validators("https://example.com/a.pdf") is None
+
+    cache.put("abc", ["page"])
+    cache.put("def", ["page"])
+
+    assert cache.validators("https://example.com/a.pdf") == {"sha256": "abc", "etag": '"v1"', "last_modified": None}
+    assert cache.validators("https://example.com/b.pdf") is None  # Nothing to revalidate with
+
+    cache.put("ghi", ["x" * 200])
+    assert cache.validators("https://example.com/a.pdf") is None
+
+def test_extractor_skips_parsing_files_it_has_seen(tmp_path):
+    with open(LINEAR_REGRESSION, "rb") as file:
+        data = file.read()
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    extractor = PDFExtractor(workers=1, cache=cache)
+
+    assert extractor.extract([data]) == [serial_text(LINEAR_REGRESSION)]
+    with patch.object(extractor, "_extract") as extract:
+        assert extractor.extract([LINEAR_REGRESSION]) == [serial_text(LINEAR_REGRESSION)]
+    extract.assert_not_called()
+    assert cache.get(content_hash(data)) is not None
+
+def test_unreadable_cache_is_a_miss(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    cache.put("abc", ["page"])
+
+    with patch.object(cache.db, "connect", side_effect=sqlite3.OperationalError("database is locked")):
+        assert cache.get("abc") is None
+        assert cache.validators("https://example.com/a.pdf") is None
+        cache.put("def", ["page"])
+        cache.remember_url("https://example.com/a.pdf", "def", '"v1"', None)
+
+    assert cache.get("abc") == ["page"]
+
+def test_cache_is_off_unless_a_path_is_set(tmp_path, monkeypatch):
+    monkeypatch.delenv("PDF_PAGE_CACHE_PATH", raising=False)
+    assert create_page_cache() is None
+
+    monkeypatch.setenv("PDF_PAGE_CACHE_PATH", str(tmp_path / "pages.sqlite3"))
+    assert create_page_cache().db.max_bytes == 64 * 1024 * 1024
@@ -0,0 +1,37 @@
+import os
+from io import BytesIO
+from pypdf import PdfReader, PdfWriter
+from app.services.pdf_extraction import PDFExtractor
+
+TESTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "api", "tests")
+LINEAR_REGRESSION = os.path.join(TESTS_DIR, "linear_regression.pdf")
+TEST_PDF = os.path.join(TESTS_DIR, "test.pdf")
+
+def scaled(path, copies) -> bytes:
+    writer = PdfWriter()
+    for _ in range(copies):
+        writer.append(path)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def serial_text(source):
+    reader = PdfReader(BytesIO(source) if isinstance(source, bytes) else source)
+    return [page.extract_text() for page in reader.pages]
+
+def test_small_batches_are_extracted_in_process():
+    extractor = PDFExtractor(workers=2, min_pages=32)
+
+    assert extractor.extract([LINEAR_REGRESSION]) == [serial_text(LINEAR_REGRESSION)]
+    assert extractor._executor is None
+
+def test_pool_keeps_files_and_pages_in_order():
+    sources = [scaled(LINEAR_REGRESSION, 3), TEST_PDF, scaled(TEST_PDF, 2)]
+    extractor = PDFExtractor(workers=2, pages_per_task=2, min_pages=1)
+    try:
+        texts = extractor.extract(sources)
+    finally:
+        extractor._reset_pool()
+
+    assert texts == [serial_text(source) for source in sources]
+    assert [len(pages) for pages in texts] == [9, 1, 2]
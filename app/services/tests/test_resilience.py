@@ -0,0 +1,170 @@
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import pytest
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+from app.services.resilience import ResilientLLM, ResiliencePolicy
+from app.services.metrics import llm_retries, llm_hedges, llm_hedge_wins, llm_deadlines_exceeded
+from app.api.error_utilities import ModelDeadlineError
+
+def policy(**overrides):
+    settings = {"deadline": 5, "attempt_timeout": 2, "max_attempts": 3, "retry_base_delay": 0.01, "retry_max_delay": 0.01, "hedge_min_samples": 5}
+    return ResiliencePolicy(**{**settings, **overrides})
+
+def scripted(*behaviours):
+    # Each call takes the next behaviour: an exception to raise, or (seconds to sleep, answer)
+    calls = itertools.count()
+
+    def call(prompt):
+        behaviour = behaviours[min(next(calls), len(behaviours) - 1)]
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        seconds, answer = behaviour
+        time.sleep(seconds)
+        return answer
+
+    return RunnableLambda(call), calls
+
+def primed(llm, seconds=0.01, samples=5):
+    for _ in range(samples):
+        llm.latencies.record(seconds)
+    return llm
+
+def test_transient_errors_are_retried():
+    runnable, calls = scripted(ConnectionError("reset"), (0, "answer"))
+    llm = ResilientLLM(runnable, "retry-model", policy())
+
+    assert llm.invoke("prompt") == "answer"
+    assert next(calls) == 2
+    assert llm_retries.value(model="retry-model") == 1
+
+def test_rejected_requests_are_not_retried():
+    runnable, calls = scripted(ValueError("invalid argument"), (0, "answer"))
+    llm = ResilientLLM(runnable, "reject-model", policy())
+
+    with pytest.raises(ValueError):
+        llm.invoke("prompt")
+    assert next(calls) == 1
+
+def test_hung_attempt_is_abandoned_and_retried():
+    runnable, calls = scripted((1, "late"), (0, "answer"))
+    llm = ResilientLLM(runnable, "hang-model", policy(attempt_timeout=0.1, hedging=False))
+
+    started_at = time.monotonic()
+    assert llm.invoke("prompt") == "answer"
+    assert time.monotonic() - started_at < 0.5
+
+def test_deadline_bounds_the_whole_call():
+    runnable, _ = scripted((1, "late"))
+    llm = ResilientLLM(runnable, "deadline-model", policy(deadline=0.2, attempt_timeout=0.1, hedging=False))
+
+    with pytest.raises(ModelDeadlineError):
+        llm.invoke("prompt")
+    assert llm_deadlines_exceeded.value(model="deadline-model") == 1
+
+def test_slow_attempt_is_hedged():
+    runnable, calls = scripted((1, "slow"), (0, "hedged"))
+    llm = primed(ResilientLLM(runnable, "hedge-model", policy()))
+
+    started_at = time.monotonic()
+    assert llm.invoke("prompt") == "hedged"
+    assert time.monotonic() - started_at < 0.5
+    assert llm_hedges.value(model="hedge-model") == 1
+    assert llm_hedge_wins.value(model="hedge-model") == 1
+
+def test_hedges_are_capped():
+    runnable, calls = scripted((0.2, "primary"), (0, "hedged"))
+    llm = primed(ResilientLLM(runnable, "capped-model", policy(hedge_max_in_flight=1)))
+    llm.policy.hedge_slots.acquire()  # Another call holds the only hedge slot
+
+    assert llm.invoke("prompt") == "primary"
+    assert next(calls) == 1
+    assert llm_hedges.value(model="capped-model") == 0
+
+def test_async_hedge_cancels_the_slower_attempt():
+    cancelled = threading.Event()
+    calls = itertools.count()
+
+    async def call(prompt):
+        if next(calls) == 0:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "slow"
+        return "hedged"
+
+    llm = primed(ResilientLLM(RunnableLambda(lambda prompt: None, afunc=call), "async-hedge-model", policy()))
+
+    assert asyncio.run(llm.ainvoke("prompt")) == "hedged"
+    assert cancelled.is_set()
+    assert llm.policy.hedge_slots.acquire(blocking=False)
+
+def test_composes_with_prompts():
+    runnable, _ = scripted((0, "answer"))
+    chain = PromptTemplate.from_template("Explain {topic}") | ResilientLLM(runnable, "chain-model", policy())
+
+    assert chain.invoke({"topic": "residuals"}) == "answer"
+
+def stalling_stream(chunks, stall_after, seconds):
+    # Yields `chunks`, sleeping `seconds` before the chunk at index `stall_after`
+    def stream(prompt):
+        for index, chunk in enumerate(chunks):
+            if index == stall_after:
+                time.sleep(seconds)
+            yield chunk
+
+    async def astream(prompt):
+        for index, chunk in enumerate(chunks):
+            if index == stall_after:
+                await asyncio.sleep(seconds)
+            yield chunk
+
+    return RunnableLambda(stream, afunc=astream)
+
+def test_stream_that_never_starts_hits_the_first_chunk_timeout():
+    llm = ResilientLLM(stalling_stream(["a", "b"], 0, 1), "first-chunk-model", policy(first_chunk_timeout=0.1))
+
+    started_at = time.monotonic()
+    with pytest.raises(ModelDeadlineError):
+        list(llm.stream("prompt"))
+    assert time.monotonic() - started_at < 0.5
+    assert llm_deadlines_exceeded.value(model="first-chunk-model") == 1
+
+def test_stream_that_stalls_between_chunks_hits_the_chunk_timeout():
+    llm = ResilientLLM(stalling_stream(["a", "b", "c"], 2, 1), "idle-stream-model", policy(chunk_timeout=0.1))
+    received = []
+
+    async def consume():
+        async for chunk in llm.astream("prompt"):
+            received.append(chunk)
+
+    started_at = time.monotonic()
+    with pytest.raises(ModelDeadlineError):
+        asyncio.run(consume())
+    assert time.monotonic() - started_at < 0.5
+    assert received == ["a", "b"]
+
+def test_streams_within_their_timeouts_are_passed_through():
+    llm = ResilientLLM(stalling_stream(["a", "b"], 1, 0.05), "steady-stream-model", policy(first_chunk_timeout=1, chunk_timeout=1))
+
+    async def consume():
+        return [chunk async for chunk in llm.astream("prompt")]
+
+    assert list(llm.stream("prompt")) == ["a", "b"]
+    assert asyncio.run(consume()) == ["a", "b"]
+
+def test_attempt_timeout_starts_when_a_worker_picks_the_attempt_up():
+    workers = ThreadPoolExecutor(max_workers=1)
+    runnable, _ = scripted((0.05, "answer"))
+    llm = ResilientLLM(runnable, "queued-model", policy(attempt_timeout=0.1, max_attempts=1, hedging=False))
+
+    with patch("app.services.resilience.attempt_executor", workers):
+        blocker = workers.submit(time.sleep, 0.2)
+        assert llm.invoke("prompt") == "answer"
+    blocker.result()
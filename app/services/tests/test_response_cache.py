@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import time
+from io import BytesIO
+import pytest
+from unittest.mock import patch, MagicMock
+from app.services.response_cache import ResponseCache, DiskCacheTier, request_cache_key, fingerprint_url
+from app.services.tool_registry import ToolFile
+from app.api.tool_utilities import execute_tool, response_cache
+
+def fake_fingerprint(url):
+    # Two URLs serving the same bytes
+    return {"https://a.example/doc.pdf": "sha256:same", "https://b.example/copy.pdf": "sha256:same"}.get(url, f"sha256:{url}")
+
+def test_key_ignores_whitespace_verbose_and_file_location():
+    first = request_cache_key(0, {"topic": "  Linear   regression ", "num_questions": 5, "files": [ToolFile(url="https://a.example/doc.pdf")]}, fake_fingerprint)
+    second = request_cache_key("0", {"topic": "Linear regression", "num_questions": 5, "verbose": True, "files": [ToolFile(url="https://b.example/copy.pdf")]}, fake_fingerprint)
+
+    assert first == second
+
+def test_key_changes_with_inputs_and_tool():
+    base = request_cache_key(0, {"topic": "Math", "num_questions": 5}, fake_fingerprint)
+
+    assert base != request_cache_key(0, {"topic": "Math", "num_questions": 6}, fake_fingerprint)
+    assert base != request_cache_key(1, {"topic": "Math", "num_questions": 5}, fake_fingerprint)
+
+@patch('app.services.response_cache.downloader')
+def test_fingerprint_prefers_published_md5(mock_downloader):
+    md5 = hashlib.md5(b"pdf").digest()
+    mock_downloader.session.head.return_value = MagicMock(status_code=200, headers={"x-goog-hash": f"crc32c=AAAA==,md5={base64.b64encode(md5).decode()}", "ETag": '"v1"'})
+
+    assert fingerprint_url("https://a.example/doc.pdf") == f"md5:{md5.hex()}"
+    mock_downloader.fetch.assert_not_called()
+
+@patch('app.services.response_cache.downloader')
+def test_fingerprint_uses_url_and_validators_without_published_hash(mock_downloader):
+    mock_downloader.session.head.return_value = MagicMock(status_code=200, headers={"ETag": '"v1"'})
+    first = fingerprint_url("https://a.example/doc.pdf")
+
+    mock_downloader.session.head.return_value = MagicMock(status_code=200, headers={"ETag": '"v2"'})
+    assert fingerprint_url("https://a.example/doc.pdf") != first
+    assert fingerprint_url("https://b.example/doc.pdf") != first
+    assert first.startswith("url:")
+    mock_downloader.fetch.assert_not_called()
+
+@patch('app.services.response_cache.downloader')
+def test_fingerprint_hashes_body_without_published_hash(mock_downloader):
+    mock_downloader.session.head.return_value = MagicMock(status_code=200, headers={})
+    mock_downloader.fetch.return_value = BytesIO(b"pdf")
+
+    assert fingerprint_url("https://a.example/doc.pdf") == f"sha256:{hashlib.sha256(b'pdf').hexdigest()}"
+    mock_downloader.fetch.assert_called_once_with("https://a.example/doc.pdf", loader="fingerprint")
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=30)
+    cache.set("a", "x" * 10, ttl=60)
+    cache.set("b", "y" * 10, ttl=60)
+    cache.get("a")
+    cache.set("c", "z" * 10, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire():
+    cache = ResponseCache()
+    cache.set("a", {"value": 1}, ttl=0.05)
+    assert cache.get("a") == {"value": 1}
+
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    ResponseCache(disk_tier=DiskCacheTier(str(tmp_path), max_bytes=1024)).set("a", [{"question": "?"}], ttl=60)
+
+    cache = ResponseCache(disk_tier=DiskCacheTier(str(tmp_path), max_bytes=1024))
+    assert cache.get("a") == [{"question": "?"}]
+    assert cache.stats()["disk_hits"] == 1
+
+def test_disk_tier_evicts_oldest_entries(tmp_path):
+    tier = DiskCacheTier(str(tmp_path), max_bytes=200)
+    for key in "abcd":
+        tier.set(key, "x" * 50, time.time() + 60)
+        time.sleep(0.01)
+
+    assert tier.get("a") is None
+    assert tier.get("d") is not None
+
+@pytest.fixture
+def dynamo_executor():
+    executor = MagicMock(return_value=[{"concept": "c", "definition": "d"}])
+    with patch('app.api.tool_utilities.tool_registry.get_executor', return_value=executor):
+        yield executor
+
+def test_execute_tool_serves_repeated_requests_from_cache(dynamo_executor):
+    first = execute_tool(1, {"youtube_url": "https://youtu.be/abc"})
+    second = execute_tool(1, {"youtube_url": "https://youtu.be/abc"})
+
+    assert first == second
+    assert dynamo_executor.call_count == 1
+    assert response_cache.stats()["hits"] >= 1
+
+def test_execute_tool_bypass_runs_the_tool(dynamo_executor):
+    execute_tool(1, {"youtube_url": "https://youtu.be/abc"})
+    execute_tool(1, {"youtube_url": "https://youtu.be/abc"}, use_cache=False)
+
+    assert dynamo_executor.call_count == 2
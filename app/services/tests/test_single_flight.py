@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from app.services.single_flight import SingleFlight
+from app.services.execution_engine import ToolPool
+from app.services.metrics import coalesced_requests
+from app.api.error_utilities import ClientDisconnectedError
+from app.api.response_utilities import run_until_disconnected
+from app.api.tool_utilities import run_tool, tool_flights
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+    coalesced = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 1}
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.run("key", work, on_coalesced=lambda: coalesced.append(1)) for _ in range(5)))
+        return flights, results
+
+    flights, results = asyncio.run(main())
+
+    assert calls == [1]
+    assert len(coalesced) == 4
+    assert results == [{"value": 1}] * 5
+    assert flights.in_flight() == 0
+
+def test_errors_reach_every_waiter():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        flights = SingleFlight()
+        return await asyncio.gather(*(flights.run("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, ValueError) and str(result) == "boom" for result in results)
+
+def test_cancelled_leader_does_not_cancel_the_shared_execution():
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flights = SingleFlight()
+        leader = asyncio.ensure_future(flights.run("key", work))
+        follower = asyncio.ensure_future(flights.run("key", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(main()) == ("done", True)
+
+def test_execution_is_cancelled_when_every_waiter_is_gone():
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        flights = SingleFlight()
+        waiters = [asyncio.ensure_future(flights.run("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flights
+
+    flights = asyncio.run(main())
+
+    assert cancelled == [1]
+    assert flights.in_flight() == 0
+
+class DisconnectingRequest:
+    def __init__(self, after):
+        self.after = after
+
+    async def receive(self):
+        await asyncio.sleep(self.after)
+        return {"type": "http.disconnect"}
+
+def test_run_until_disconnected_cancels_the_work():
+    async def main():
+        work = asyncio.ensure_future(asyncio.sleep(10))
+        with pytest.raises(ClientDisconnectedError):
+            await run_until_disconnected(DisconnectingRequest(0.01), work)
+        await asyncio.sleep(0)
+        return work.cancelled()
+
+    assert asyncio.run(main())
+
+def test_run_until_disconnected_returns_the_result():
+    async def work():
+        return "result"
+
+    assert asyncio.run(run_until_disconnected(DisconnectingRequest(10), work())) == "result"
+
+def test_disconnects_cannot_queue_executions_past_the_pool_bound():
+    pool = ToolPool("disconnects", max_workers=1, queue_depth=0)
+    release = threading.Event()
+
+    async def main():
+        flights = SingleFlight()
+        outcomes = []
+        for index in range(5):
+            # Distinct keys, so every request would start its own execution
+            work = flights.run(index, lambda: pool.run(release.wait, 5))
+            try:
+                await run_until_disconnected(DisconnectingRequest(0.01), work)
+            except Exception as e:
+                outcomes.append(type(e).__name__)
+        return outcomes
+
+    outcomes = asyncio.run(main())
+
+    assert outcomes == ["ClientDisconnectedError"] + ["HTTPException"] * 4
+    assert pool.stats()["running"] == 1 and pool.stats()["queued"] == 0
+    release.set()
+    pool.shutdown()
+
+def test_identical_tool_requests_are_coalesced():
+    release = threading.Event()
+    calls = []
+
+    def executor(youtube_url, verbose=False):
+        calls.append(youtube_url)
+        release.wait(5)
+        return [{"concept": "c", "definition": "d"}]
+
+    async def main():
+        requests = [asyncio.ensure_future(run_tool(1, {"youtube_url": "https://youtu.be/abc"}, use_cache=False)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*requests)
+
+    before = coalesced_requests.value(tool_id=1)
+    with patch('app.api.tool_utilities.tool_registry.get_executor', return_value=executor):
+        results = asyncio.run(main())
+
+    assert calls == ["https://youtu.be/abc"]
+    assert results == [[{"concept": "c", "definition": "d"}]] * 3
+    assert coalesced_requests.value(tool_id=1) - before == 2
+    assert tool_flights.in_flight() == 0
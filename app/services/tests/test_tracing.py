@@ -0,0 +1,76 @@
+import json
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.services.tracing import Tracer, SpanExporter, FileSpanSink, server_timing_header, request_spans
+from app.services.metrics import time_stage
+from app.main import app
+
+user = {"id": "1", "fullName": "Ada Lovelace", "email": "ada@example.com"}
+
+def test_spans_are_not_recorded_without_exporter_or_timing_request():
+    with Tracer().span("execute_tool") as span:
+        assert span is None
+
+def test_nested_spans_are_exported_as_otlp_json(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(SpanExporter(FileSpanSink(str(path)), service_name="test", flush_interval=0.05))
+
+    with tracer.span("execute_tool", **{"tool.id": "0"}) as parent:
+        with tracer.span("rag_pipeline.load") as child:
+            pass
+    tracer.shutdown()
+
+    payload = json.loads(path.read_text().splitlines()[0])
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["rag_pipeline.load", "execute_tool"]
+    assert spans[0]["parentSpanId"] == parent.span_id
+    assert spans[0]["traceId"] == spans[1]["traceId"] == child.trace_id
+    assert {"key": "tool.id", "value": {"stringValue": "0"}} in spans[1]["attributes"]
+    assert payload["resourceSpans"][0]["resource"]["attributes"][0]["value"]["stringValue"] == "test"
+
+def test_failed_spans_carry_error_status(tmp_path):
+    tracer = Tracer()
+    token = request_spans.set([])
+    try:
+        try:
+            with tracer.span("loader.download"):
+                raise ValueError("404")
+        except ValueError:
+            pass
+        span = request_spans.get()[0]
+    finally:
+        request_spans.reset(token)
+
+    assert span.to_otlp()["status"] == {"code": 2, "message": "404"}
+
+def test_server_timing_header_sums_repeated_spans():
+    tracer = Tracer()
+    token = request_spans.set([])
+    try:
+        for _ in range(3):
+            with tracer.span("llm.gemini-1.0-pro"):
+                pass
+        header = server_timing_header(request_spans.get())
+    finally:
+        request_spans.reset(token)
+
+    assert header.startswith("llm.gemini-1.0-pro;dur=")
+    assert header.endswith(';desc="3 calls"')
+
+def staged_executor(youtube_url, verbose=False):
+    with time_stage("rag_pipeline", "load"):
+        pass
+    return [{"concept": "c", "definition": "d"}]
+
+@patch('app.api.tool_utilities.tool_registry.get_executor', return_value=staged_executor)
+def test_server_timing_is_opt_in(mock_get_executor, monkeypatch):
+    monkeypatch.setenv("ENV_TYPE", "dev")
+    request = {"user": user, "type": "tool", "tool_data": {"tool_id": 1, "inputs": [{"name": "youtube_url", "value": "https://youtu.be/abc"}]}}
+
+    with TestClient(app) as client:
+        plain = client.post("/submit-tool", json=request, headers={"api-key": "dev"})
+        timed = client.post("/submit-tool", json=request, headers={"api-key": "dev", "X-Server-Timing": "true", "Cache-Control": "no-cache"})
+
+    assert "server-timing" not in plain.headers
+    assert "execute_tool;dur=" in timed.headers["server-timing"]
+    assert "rag_pipeline.load;dur=" in timed.headers["server-timing"]
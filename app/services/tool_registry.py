@@ -1,4 +1,9 @@
+import json
+import os
+import threading
+import time
 from pydantic import BaseModel
+from fastapi import HTTPException
 from app.services.logger import setup_logger
 from typing import List, Any, Optional, Dict
 from app.api.error_utilities import InputValidationError
@@ -20,3 +25,133 @@ class ToolFile(BaseModel):
     filePath: Optional[str] = None
     url: str
     filename: Optional[str] = None
+
+class RegisteredTool:
+    """A tool from tools_config.json with its metadata, input types and executors loaded into memory."""
+    def __init__(self, tool_id: str, config: Dict[str, Any], metadata_path: str):
+        self.tool_id = tool_id
+        self.config = config
+        self.metadata_path = metadata_path
+        self.metadata = None
+        self.input_types = {}  # Input name -> metadata type
+        self.validator = None  # CompiledInputValidator built from the metadata inputs
+        self.mtime = None
+        self.checked_at = 0.0
+        self.executors = {}  # Executor name -> function, imported once
+
+    def load_metadata(self):
+        if not os.path.exists(self.metadata_path) or os.path.getsize(self.metadata_path) == 0:
+            logger.error(f"Metadata file missing or empty at: {self.metadata_path}")
+            raise HTTPException(status_code=404, detail="Tool metadata not found")
+        
+        with open(self.metadata_path, 'r') as f:
+            metadata = json.load(f)
+        
+        # Imported here since input validation depends on ToolFile from this module
+        from app.services.input_validation import CompiledInputValidator
+        
+        # Nothing is replaced until the whole file parsed, a failed reload leaves the loaded version intact
+        validator = CompiledInputValidator(metadata.get('inputs', []))
+        self.metadata = metadata
+        self.validator = validator
+        self.input_types = validator.input_types
+        self.mtime = os.stat(self.metadata_path).st_mtime
+        self.checked_at = time.monotonic()
+        logger.debug(f"Loaded metadata for tool {self.tool_id} from {self.metadata_path}")
+
+class ToolRegistry:
+    """
+    In-memory registry of every tool in tools_config.json.
+    
+    `build` is called once at startup so requests only do dictionary lookups. Metadata files are re-read
+    when their mtime changes, checked at most once every `reload_interval` seconds per tool.
+    """
+    def __init__(self, tools_config: Dict[str, Any], base_dir: str, executor_loader, reload_interval: float = 2.0):
+        self.tools_config = tools_config
+        self.base_dir = base_dir
+        self.executor_loader = executor_loader  # Callable (module_path, executor_name) -> function
+        self.reload_interval = reload_interval
+        self.tools = {}
+        self._lock = threading.Lock()
+
+    def _metadata_path(self, tool_config: Dict[str, Any]) -> str:
+        module_dir_path = os.path.join(self.base_dir, *tool_config['path'].split('.')[:-1])
+        return os.path.abspath(os.path.join(module_dir_path, tool_config['metadata_file']))
+
+    def _register(self, tool_id: str) -> RegisteredTool:
+        tool_config = self.tools_config.get(tool_id)
+        
+        if not tool_config:
+            logger.error(f"No tool configuration found for tool_id: {tool_id}")
+            raise HTTPException(status_code=404, detail="Tool configuration not found")
+        
+        tool = RegisteredTool(tool_id, tool_config, self._metadata_path(tool_config))
+        tool.load_metadata()
+        self.tools[tool_id] = tool
+        return tool
+
+    def build(self, import_executors: bool = True):
+        for tool_id in self.tools_config:
+            try:
+                with self._lock:
+                    self._register(tool_id)
+                if import_executors:
+                    self.get_executor(tool_id)
+            except (HTTPException, ImportError) as e:
+                # Leave the tool to fail on request rather than stopping the whole application
+                logger.error(f"Could not register tool {tool_id} at startup: {e}")
+        logger.info(f"Tool registry built with {len(self.tools)} tools")
+
+    def import_executors(self, executor_names=('executor', 'stream_executor')):
+        """Imports the executors of every registered tool, for warming up feature modules off the request path."""
+        for tool_id in list(self.tools):
+            for executor_name in executor_names:
+                try:
+                    self.get_executor(tool_id, executor_name)
+                except (HTTPException, ImportError) as e:
+                    logger.debug(f"Skipping warmup of {executor_name} for tool {tool_id}: {e}")
+
+    def _refresh(self, tool: RegisteredTool):
+        now = time.monotonic()
+        if now - tool.checked_at < self.reload_interval:
+            return
+        
+        tool.checked_at = now
+        try:
+            mtime = os.stat(tool.metadata_path).st_mtime
+        except OSError:
+            logger.error(f"Metadata file for tool {tool.tool_id} disappeared, keeping the loaded version")
+            return
+        
+        if mtime != tool.mtime:
+            with self._lock:
+                logger.info(f"Metadata for tool {tool.tool_id} changed on disk, reloading")
+                try:
+                    tool.load_metadata()
+                except Exception as e:
+                    # A file caught mid-write or broken by an edit keeps the loaded version serving until it changes again
+                    logger.error(f"Could not reload metadata for tool {tool.tool_id}, keeping the loaded version: {e}")
+                    tool.mtime = mtime
+
+    def get(self, tool_id) -> RegisteredTool:
+        key = str(tool_id)
+        tool = self.tools.get(key)
+        
+        if tool is None:
+            # Tools are registered lazily when build was not called, e.g. in unit tests
+            with self._lock:
+                tool = self.tools.get(key) or self._register(key)
+        else:
+            self._refresh(tool)
+        
+        return tool
+
+    def get_executor(self, tool_id, executor_name: str = 'executor'):
+        tool = self.get(tool_id)
+        executor = tool.executors.get(executor_name)
+        
+        if executor is None:
+            executor = self.executor_loader(tool.config['path'], executor_name)
+            tool.executors[executor_name] = executor
+        
+        return executor
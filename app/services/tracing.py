@@ -0,0 +1,265 @@
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.services.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Span of the code currently running, worker threads inherit it through the copied request context
+current_span = ContextVar("current_span", default=None)
+
+# Finished spans of the current request when it asked for a Server-Timing header, otherwise None
+request_spans = ContextVar("request_spans", default=None)
+
+# OTLP span status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+        self.attributes["exception.type"] = type(error).__name__
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+class FileSpanSink:
+    """Appends one OTLP/JSON ExportTraceServiceRequest per line, the format of the collector's file exporter."""
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, payload: dict):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(payload) + "\n")
+
+class OTLPHttpSpanSink:
+    """Posts OTLP/JSON to a collector's /v1/traces endpoint."""
+    def __init__(self, endpoint, timeout=5):
+        self.url = f"{endpoint.rstrip('/')}/v1/traces"
+        self.timeout = timeout
+
+    def write(self, payload: dict):
+        import requests
+        response = requests.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+class SpanExporter:
+    """Batches finished spans on a background thread and writes them to a sink in OTLP/JSON."""
+    def __init__(self, sink, service_name="kai-backend", batch_size=512, flush_interval=5.0, max_queue=10000):
+        self.sink = sink
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name})}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    span = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stop = True
+                    break
+                batch.append(span)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        payload = {"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": [span.to_otlp() for span in batch]}]
+        }]}
+        try:
+            self.sink.write(payload)
+        except Exception as e:
+            logger.error(f"Failed to export {len(batch)} spans: {e}")
+
+    def shutdown(self):
+        # Flushes queued spans before returning
+        self.queue.put(None)
+        self._thread.join(timeout=self.flush_interval + 5)
+
+class Tracer:
+    """
+    Lightweight span tracing. Spans nest through `current_span` and are recorded only when an exporter is
+    configured or the current request asked for a Server-Timing header, so untraced requests only pay for two
+    context variable lookups per span.
+    """
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    def is_recording(self) -> bool:
+        return self.exporter is not None or request_spans.get() is not None
+
+    def start_span(self, name, **attributes):
+        """Starts a span without making it current, for instrumentation with separate start and end hooks."""
+        if not self.is_recording():
+            return None
+        return Span(name, current_span.get(), attributes)
+
+    def end_span(self, span, error: BaseException = None):
+        if span is None:
+            return
+        if error is not None:
+            span.record_exception(error)
+        span.end_ns = time.time_ns()
+        spans = request_spans.get()
+        if spans is not None:
+            spans.append(span)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield None
+            return
+
+        token = current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span, error)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+def server_timing_header(spans) -> str:
+    """Sums span durations by name, e.g. `rag_pipeline.load;dur=812.4, llm.call;dur=5230.1;desc="5 calls"`."""
+    totals = {}
+    for span in spans:
+        duration, count = totals.get(span.name, (0.0, 0))
+        totals[span.name] = (duration + span.duration_ms, count + 1)
+
+    entries = []
+    for name, (duration, count) in totals.items():
+        entry = f"{name.replace(' ', '_')};dur={duration:.1f}"
+        if count > 1:
+            entry += f';desc="{count} calls"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of each HTTP request.
+
+    A request sending `X-Server-Timing: true` gets a Server-Timing header with the time spent per span name.
+    Spans finishing after the response headers are sent, as in streaming responses, are not included.
+    """
+    def __init__(self, app, tracer=None):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        active_tracer = self.tracer or tracer
+        wants_timing = any(name == b"x-server-timing" and value.lower() == b"true" for name, value in scope["headers"])
+        spans_token = request_spans.set([]) if wants_timing else None
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and wants_timing:
+                header = server_timing_header(request_spans.get())
+                if header:
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            with active_tracer.span(f"{scope['method']} {scope['path']}", **{"http.method": scope["method"], "http.target": scope["path"]}) as span:
+                await self.app(scope, receive, send_with_timing)
+                if span is not None and scope.get("route") is not None:
+                    span.set_attribute("http.route", scope["route"].path)
+        finally:
+            if spans_token is not None:
+                request_spans.reset(spans_token)
+
+def create_tracer():
+    exporter_type = os.environ.get("TRACE_EXPORTER", "none")
+    service_name = os.environ.get("OTEL_SERVICE_NAME", "kai-backend")
+
+    if exporter_type == "file":
+        sink = FileSpanSink(os.environ.get("TRACE_FILE_PATH", "traces.jsonl"))
+    elif exporter_type == "otlp":
+        sink = OTLPHttpSpanSink(os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"))
+    else:
+        return Tracer()
+
+    logger.info(f"Exporting traces with the {exporter_type} exporter")
+    return Tracer(SpanExporter(sink, service_name=service_name))
+
+tracer = create_tracer()
@@ -1,24 +1,142 @@
-from fastapi import HTTPException, Header
-from google.cloud import secretmanager
+from fastapi import HTTPException, Header, WebSocket
+from app.services.logger import setup_logger
+import hmac
 import os
+import threading
+import time
 
-def access_secret_file(secret_id, version_id="latest"):
+logger = setup_logger(__name__)
+
+class SecretManagerSource:
+    """Reads the key from Google Cloud Secret Manager, reusing one client for every refresh."""
+    def __init__(self, secret_id, project_id=None, version_id="latest"):
+        self.name = f"projects/{project_id or os.environ.get('PROJECT_ID')}/secrets/{secret_id}/versions/{version_id}"
+        self.client = None
+
+    def fetch(self) -> str:
+        if self.client is None:
+            # Imported on first use, the Secret Manager client library is slow to import and unused outside production
+            from google.cloud import secretmanager
+            self.client = secretmanager.SecretManagerServiceClient()
+        response = self.client.access_secret_version(name=self.name)
+        return response.payload.data.decode("UTF-8")
+
+class FileSecretSource:
+    """Reads the key from a local file, a stand-in for Secret Manager in tests and local setups."""
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self) -> str:
+        with open(self.path, 'r') as f:
+            return f.read().strip()
+
+class StaticSecretSource:
+    def __init__(self, value):
+        self.value = value
+
+    def fetch(self) -> str:
+        return self.value
+
+class KeyProvider:
     """
-    Access a secret file in Google Cloud Secret Manager and parse it.
+    Caches the API key from a secret source and refreshes it in the background every `ttl` seconds.
+
+    When the key changes, the previous key stays valid for `rotation_grace` seconds so callers can roll over.
+    A failed refresh keeps the cached keys, so the secret source being down does not reject requests.
     """
-    project_id = os.environ.get('PROJECT_ID')
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/{project_id}/secrets/{secret_id}/versions/{version_id}"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode("UTF-8")
+    def __init__(self, source, ttl=300, rotation_grace=600):
+        self.source = source
+        self.ttl = ttl
+        self.rotation_grace = rotation_grace
+        self.current_key = None
+        self.previous_key = None
+        self.previous_key_expires_at = 0.0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> bool:
+        try:
+            key = self.source.fetch()
+        except Exception as e:
+            logger.error(f"Failed to refresh API key, keeping cached key: {e}")
+            return False
+
+        with self._lock:
+            if key != self.current_key:
+                if self.current_key is not None:
+                    logger.info("API key rotated, previous key accepted during the rotation grace period")
+                    self.previous_key = self.current_key
+                    self.previous_key_expires_at = time.monotonic() + self.rotation_grace
+                self.current_key = key
+        return True
+
+    def _refresh_loop(self):
+        while not self._stopped.wait(self.ttl):
+            self.refresh()
+
+    def start(self):
+        self.refresh()
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="api-key-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def is_valid(self, api_key) -> bool:
+        if api_key is None:
+            return False
+
+        if self.current_key is None and not self.refresh():
+            return False
+
+        with self._lock:
+            candidates = [self.current_key]
+            if self.previous_key is not None and time.monotonic() < self.previous_key_expires_at:
+                candidates.append(self.previous_key)
+
+        # Compare against every candidate so timing does not reveal which one matched
+        provided = api_key.encode("UTF-8")
+        matches = [hmac.compare_digest(provided, candidate.encode("UTF-8")) for candidate in candidates]
+        return any(matches)
+
+def create_key_provider():
+    ttl = float(os.environ.get('API_KEY_REFRESH_SECONDS', 300))
+    rotation_grace = float(os.environ.get('API_KEY_ROTATION_GRACE_SECONDS', 600))
+
+    if os.environ.get('API_KEY_FILE'):
+        source = FileSecretSource(os.environ['API_KEY_FILE'])
+    elif os.environ['ENV_TYPE'] == "production":
+        source = SecretManagerSource("backend-access")
+    else:
+        source = StaticSecretSource("dev")
+
+    return KeyProvider(source, ttl=ttl, rotation_grace=rotation_grace)
+
+key_provider = None
+
+def get_key_provider() -> KeyProvider:
+    # Created on first use so the environment (ENV_TYPE, .env) is loaded first
+    global key_provider
+    if key_provider is None:
+        key_provider = create_key_provider()
+    return key_provider
+
+def is_valid_key(api_key):
+  return get_key_provider().is_valid(api_key)
 
 # Function to ensure incoming request is from controller with key
 def key_check(api_key: str = Header(None)):
-  
-  if os.environ['ENV_TYPE'] == "production":
-    set_key = access_secret_file("backend-access")
-  else:
-    set_key = "dev"
-  
-  if api_key is None or api_key != set_key:
-    raise HTTPException(status_code=401, detail="Invalid API Request Key")
\ No newline at end of file
+
+  if not is_valid_key(api_key):
+    raise HTTPException(status_code=401, detail="Invalid API Request Key")
+
+# WebSocket variant of key_check, browsers cannot set headers on a WebSocket so the key may also come as a query parameter
+def websocket_key_check(websocket: WebSocket):
+  api_key = websocket.headers.get("api-key") or websocket.query_params.get("api_key")
+  return is_valid_key(api_key)
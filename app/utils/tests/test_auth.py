@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import MagicMock
+from fastapi import HTTPException
+from app.utils.auth import KeyProvider, FileSecretSource, key_check
+import app.utils.auth as auth
+
+@pytest.fixture
+def key_file(tmp_path):
+    path = tmp_path / "backend-access"
+    path.write_text("first-key\n")
+    return path
+
+def test_key_is_fetched_once_and_cached(key_file):
+    source = FileSecretSource(str(key_file))
+    source.fetch = MagicMock(wraps=source.fetch)
+    provider = KeyProvider(source)
+    provider.start()
+
+    assert provider.is_valid("first-key")
+    assert provider.is_valid("first-key")
+    assert not provider.is_valid("wrong-key")
+    assert not provider.is_valid(None)
+    assert source.fetch.call_count == 1
+    provider.stop()
+
+def test_previous_key_is_accepted_during_rotation(key_file):
+    provider = KeyProvider(FileSecretSource(str(key_file)), rotation_grace=60)
+    provider.refresh()
+
+    key_file.write_text("second-key")
+    provider.refresh()
+
+    assert provider.is_valid("second-key")
+    assert provider.is_valid("first-key")
+
+def test_previous_key_expires_after_grace_period(key_file):
+    provider = KeyProvider(FileSecretSource(str(key_file)), rotation_grace=0)
+    provider.refresh()
+
+    key_file.write_text("second-key")
+    provider.refresh()
+
+    assert provider.is_valid("second-key")
+    assert not provider.is_valid("first-key")
+
+def test_failed_refresh_keeps_cached_key(key_file):
+    provider = KeyProvider(FileSecretSource(str(key_file)))
+    provider.refresh()
+
+    key_file.unlink()
+
+    assert provider.refresh() is False
+    assert provider.is_valid("first-key")
+
+def test_key_check_uses_provider(key_file, monkeypatch):
+    monkeypatch.setattr(auth, "key_provider", KeyProvider(FileSecretSource(str(key_file))))
+
+    key_check("first-key")
+    with pytest.raises(HTTPException) as exc_info:
+        key_check("dev")
+    assert exc_info.value.status_code == 401
@@ -0,0 +1,67 @@
+"""
+Benchmark of tool input validation for requests with many file entries.
+
+Compares the previous per-field Python validation (name -> type map rebuilt per call, ToolFile.model_validate
+per file, then every ToolFile built a second time) with the validator compiled from the tool's metadata.
+
+Run from the repository root:
+    PYTHONPATH=app:. python -m benchmarks.bench_input_validation
+"""
+import os
+import sys
+import timeit
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'app')]
+
+from app.services.tool_registry import ToolFile
+from app.services.input_validation import CompiledInputValidator
+
+quizzify_inputs = [
+    {"label": "Topic", "name": "topic", "type": "text"},
+    {"label": "Number of Questions", "name": "num_questions", "type": "number"},
+    {"label": "Upload PDF files", "name": "files", "type": "file"}
+]
+
+def legacy_finalize(inputs, validate_data):
+    # Mirrors validate_inputs and convert_files_to_tool_files before compiled validators
+    validate_inputs = {input_item['name']: input_item['type'] for input_item in validate_data}
+    for name in validate_inputs:
+        if name not in inputs:
+            raise ValueError(f"Missing input: `{name}`")
+    for name, value in inputs.items():
+        expected_type = validate_inputs.get(name)
+        if expected_type == 'text' and not isinstance(value, str):
+            raise ValueError(name)
+        elif expected_type == 'number' and not isinstance(value, (int, float)):
+            raise ValueError(name)
+        elif expected_type == 'file':
+            if not isinstance(value, list):
+                raise ValueError(name)
+            for file_obj in value:
+                if not isinstance(file_obj, dict):
+                    raise ValueError(name)
+                ToolFile.model_validate(file_obj, from_attributes=True)
+    if 'files' in inputs:
+        inputs['files'] = [ToolFile(**file_object) for file_object in inputs['files']]
+    return inputs
+
+def make_inputs(file_count):
+    return {
+        "topic": "Linear regression",
+        "num_questions": 10,
+        "files": [{"url": f"https://example.com/chapter-{i}.pdf", "filename": f"chapter-{i}.pdf"} for i in range(file_count)]
+    }
+
+def main():
+    validator = CompiledInputValidator(quizzify_inputs)
+
+    for file_count in (1, 100, 500):
+        number = max(20, 20000 // file_count)
+        inputs = make_inputs(file_count)
+        legacy = min(timeit.repeat(lambda: legacy_finalize(dict(inputs), quizzify_inputs), number=number, repeat=3)) / number
+        compiled = min(timeit.repeat(lambda: validator.validate(inputs), number=number, repeat=3)) / number
+        print(f"{file_count:4d} files: legacy {legacy * 1e6:10.1f} us   compiled {compiled * 1e6:10.1f} us   speedup {legacy / compiled:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cost of logging on the request thread.
+
+Compares the previous setup (a synchronous StreamHandler at DEBUG writing every verbose message in full) with
+the queue-based pipeline from app.services.logger (INFO by default, debug sampling, truncated payloads, writes
+on a background thread). Output goes to a temporary file so the terminal does not dominate the timings.
+
+Run from the repository root:
+    PYTHONPATH=app:. python -m benchmarks.bench_logging
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'app')]
+
+from app.services.logger import BoundedQueueHandler, SamplingFilter
+
+# Roughly what one verbose quiz request logged: a metadata dump, file lists and a full LLM response per attempt
+LLM_RESPONSE = '{"question": "' + "What is the slope of the regression line? " * 40 + '"}'
+
+def simulate_request(logger, verbose=True):
+    logger.debug(f"Loading tool metadata: {'{}' * 200}")
+    if verbose:
+        logger.debug(f"Files: {[{'url': f'https://example.com/{i}.pdf'} for i in range(10)]}")
+        for attempt in range(10):
+            logger.info(f"Generated response attempt {attempt + 1}: {LLM_RESPONSE}")
+            logger.debug(f"Valid question added: {LLM_RESPONSE}")
+    logger.error("Only generated 9 out of 10 requested questions")
+
+def run(logger, requests=500, verbose=True):
+    started_at = time.perf_counter()
+    for _ in range(requests):
+        simulate_request(logger, verbose)
+    return (time.perf_counter() - started_at) / requests
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        sync_path = os.path.join(directory, "sync.log")
+        sync_logger = logging.getLogger("bench.sync")
+        sync_logger.propagate = False
+        sync_logger.setLevel(logging.DEBUG)
+        sync_handler = logging.StreamHandler(open(sync_path, "w"))
+        sync_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        sync_logger.addHandler(sync_handler)
+
+        queued_path = os.path.join(directory, "queued.log")
+        queued_logger = logging.getLogger("bench.queued")
+        queued_logger.propagate = False
+        queued_logger.setLevel(logging.INFO)
+        file_handler = logging.StreamHandler(open(queued_path, "w"))
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        log_queue = queue.Queue(maxsize=10000)
+        queue_handler = BoundedQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(0.1))
+        queued_logger.addHandler(queue_handler)
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        listener.start()
+
+        sync_seconds = run(sync_logger)
+        queued_seconds = run(queued_logger)
+        listener.stop()
+        queued_size = os.path.getsize(queued_path)
+
+        # TOOL_VERBOSE is off by default, so the per-attempt messages are not logged at all
+        listener.start()
+        quiet_seconds = run(queued_logger, verbose=False)
+        listener.stop()
+
+        sync_handler.flush()
+        file_handler.flush()
+        print(f"synchronous DEBUG: {sync_seconds * 1e3:7.3f} ms/request on the request thread, {os.path.getsize(sync_path) / 1e6:7.2f} MB written")
+        print(f"queued INFO:       {queued_seconds * 1e3:7.3f} ms/request on the request thread, {queued_size / 1e6:7.2f} MB written")
+        print(f"queued, quiet:     {quiet_seconds * 1e3:7.3f} ms/request on the request thread, {(os.path.getsize(queued_path) - queued_size) / 1e6:7.2f} MB written")
+
+if __name__ == "__main__":
+    main()
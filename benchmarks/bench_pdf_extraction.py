@@ -0,0 +1,73 @@
+"""
+Benchmark of PDF text extraction, serial against the process pool in app.services.pdf_extraction.
+
+The bundled test.pdf and linear_regression.pdf are repeated into a textbook sized document (--pages),
+optionally several of them (--files), and each worker count is checked to give the same text as the serial run.
+
+Run from the repository root:
+    PYTHONPATH=app:. python -m benchmarks.bench_pdf_extraction --pages 300 --files 2 --workers 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'app')]
+
+from pypdf import PdfReader, PdfWriter
+from app.services.pdf_extraction import PDFExtractor
+
+SAMPLES = [os.path.join(ROOT_DIR, 'app', 'api', 'tests', name) for name in ("linear_regression.pdf", "test.pdf")]
+
+def textbook(pages: int) -> bytes:
+    writer = PdfWriter()
+    while len(writer.pages) < pages:
+        for path in SAMPLES:
+            for page in PdfReader(path).pages[:pages - len(writer.pages)]:
+                writer.add_page(page)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def serial(sources):
+    # The loaders before the extraction pool
+    return [[page.extract_text() for page in PdfReader(BytesIO(source)).pages] for source in sources]
+
+def timed(func, sources, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func(sources)
+        best = min(best, time.perf_counter() - started_at)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="Pages per document")
+    parser.add_argument("--files", type=int, default=1, help="Documents per batch")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4], help="Pool sizes to compare")
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sources = [textbook(args.pages) for _ in range(args.files)]
+    print(f"{args.files} x {args.pages} pages, {os.cpu_count()} CPUs")
+
+    baseline, expected = timed(serial, sources, args.repeat)
+    print(f"serial              {baseline * 1000:9.1f} ms")
+
+    for workers in args.workers:
+        extractor = PDFExtractor(workers=workers, pages_per_task=args.pages_per_task, min_pages=1)
+        try:
+            extractor.extract(sources[:1])  # Start the workers outside the measurement
+            elapsed, texts = timed(extractor.extract, sources, args.repeat)
+        finally:
+            extractor._reset_pool()
+        if texts != expected:
+            sys.exit(f"{workers} workers extracted different text than the serial run")
+        print(f"{workers:2d} workers          {elapsed * 1000:9.1f} ms   speedup {baseline / elapsed:5.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Request decoding and response encoding cost.
+
+Compares FastAPI's default paths (stdlib json.loads for request bodies, jsonable_encoder plus json.dumps in
+JSONResponse, or response_model validation plus a pydantic dump, for responses) with the orjson path in app.api.response_utilities, for a ChatRequest carrying a
+long message history and a ToolResponse holding 10 quiz questions.
+
+Run from the repository root:
+    PYTHONPATH=app:. python -m benchmarks.bench_serialization
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'app')]
+
+import orjson
+from typing import Union
+from pydantic import TypeAdapter
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.services.schemas import ChatRequest, ToolResponse
+from app.api.response_utilities import FastJSONResponse, model_response
+from app.api.error_utilities import ErrorResponse
+
+user = {"id": "1", "fullName": "Ada Lovelace", "email": "ada@example.com"}
+
+def chat_request_body(history=400):
+    messages = [
+        {"role": "human" if i % 2 == 0 else "ai", "type": "text", "timestamp": "2024-05-01T12:00:00Z", "payload": {"text": "Explain how gradient descent converges. " * 8}}
+        for i in range(history)
+    ]
+    return json.dumps({"user": user, "type": "chat", "messages": messages}).encode()
+
+def quiz_response(num_questions=10):
+    questions = [{
+        "question": f"Question {i}: which statement about linear regression is correct?",
+        "choices": [{"key": key, "value": f"Choice {key} with a reasonably long explanation of the option"} for key in "ABCD"],
+        "answer": "C",
+        "explanation": "Because the least squares estimate minimises the sum of squared residuals. " * 3
+    } for i in range(num_questions)]
+    return ToolResponse(data=questions)
+
+def compare(label, default, fast, number):
+    default_time = min(timeit.repeat(default, number=number, repeat=5)) / number
+    fast_time = min(timeit.repeat(fast, number=number, repeat=5)) / number
+    print(f"{label:42s} default {default_time * 1e6:9.1f} us   orjson {fast_time * 1e6:9.1f} us   speedup {default_time / fast_time:5.1f}x")
+
+def main():
+    body = chat_request_body()
+    compare(
+        f"decode ChatRequest ({len(body) / 1024:.0f} KiB history)",
+        lambda: ChatRequest(**json.loads(body)),
+        lambda: ChatRequest(**orjson.loads(body)),
+        number=200
+    )
+
+    response = quiz_response()
+    compare(
+        "encode ToolResponse (10 questions)",
+        lambda: JSONResponse(content=jsonable_encoder(response)),
+        lambda: model_response(response),
+        number=2000
+    )
+
+    # Recent FastAPI versions validate the returned model against response_model, then dump it with pydantic-core
+    response_model = TypeAdapter(Union[ToolResponse, ErrorResponse])
+    compare(
+        "encode ToolResponse via response_model",
+        lambda: response_model.dump_json(response_model.validate_python(response)),
+        lambda: model_response(response),
+        number=2000
+    )
+
+    chat = ChatRequest(**json.loads(body))
+    compare(
+        "encode ChatRequest history",
+        lambda: JSONResponse(content=jsonable_encoder(chat)),
+        lambda: FastJSONResponse(content=chat.model_dump()),
+        number=200
+    )
+
+if __name__ == "__main__":
+    main()
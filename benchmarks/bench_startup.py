@@ -0,0 +1,87 @@
+"""
+Import time budget for application startup.
+
+Imports `app.main` in fresh interpreters with `-X importtime`, reports the slowest modules by cumulative
+import time and exits with status 1 when the import exceeds the budget or pulls in a module that should only
+load with a feature (LangChain, Chroma, pypdf, the Secret Manager client).
+
+Run from the repository root:
+    PYTHONPATH=app:. python -m benchmarks.bench_startup --budget-ms 1000
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Top level packages that must stay out of the startup import graph
+DEFERRED_MODULES = (
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "langchain_google_genai",
+    "langchain_chroma",
+    "chromadb",
+    "pypdf",
+    "google.cloud.secretmanager"
+)
+
+def measure_imports(target="app.main"):
+    """Returns {module: cumulative import time in ms} for one fresh import of `target`."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.join(ROOT_DIR, 'app'), ROOT_DIR])}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            timings[module.strip()] = int(cumulative) / 1000
+    return timings
+
+def deferred_package(module):
+    for name in DEFERRED_MODULES:
+        if module == name or module.startswith(f"{name}."):
+            return name
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", 1000)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    # Best of several runs per module, to keep disk cache and scheduler noise out of the report
+    runs = [measure_imports(args.target) for _ in range(args.runs)]
+    timings = {module: min(run.get(module, float("inf")) for run in runs) for module in runs[0]}
+
+    print(f"Slowest imports under {args.target} (cumulative, best of {args.runs} runs):")
+    for module, milliseconds in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {milliseconds:9.1f} ms  {module}")
+
+    failures = []
+    total = timings.get(args.target, 0.0)
+    if total > args.budget_ms:
+        failures.append(f"importing {args.target} took {total:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+
+    deferred = sorted({deferred_package(module) for run in runs for module in run} - {None})
+    if deferred:
+        failures.append(f"{args.target} imports modules that should load lazily: {', '.join(deferred)}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+
+    print(f"OK: {args.target} imported in {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
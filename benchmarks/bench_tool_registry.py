@@ -0,0 +1,49 @@
+"""
+Microbenchmark of the per-request tool lookup overhead.
+
+Compares the previous request path (resolve paths, stat and re-parse metadata.json, __import__ the
+executor and rebuild the input type map on every request) with lookups in the prebuilt ToolRegistry.
+
+Run from the repository root:
+    PYTHONPATH=app:. python -m benchmarks.bench_tool_registry
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'app')]
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")  # Feature modules build clients at import time
+
+from app.api.tool_utilities import tools_config, tool_registry
+
+API_DIR = os.path.join(ROOT_DIR, 'app', 'api')
+
+def legacy_request_overhead(tool_id):
+    # Mirrors load_tool_metadata, get_executor_by_name and validate_inputs before the registry existed
+    tool_config = tools_config.get(str(tool_id))
+    module_dir_path = os.path.abspath(os.path.join(API_DIR, '..', *tool_config['path'].split('.')[:-1]))
+    file_path = os.path.join(module_dir_path, tool_config['metadata_file'])
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        raise FileNotFoundError(file_path)
+    with open(file_path, 'r') as f:
+        metadata = json.load(f)
+    input_types = {input_item['name']: input_item['type'] for input_item in metadata['inputs']}
+    module = __import__(tool_config['path'], fromlist=['executor'])
+    return metadata, input_types, getattr(module, 'executor')
+
+def registry_request_overhead(tool_id):
+    tool = tool_registry.get(tool_id)
+    return tool.metadata, tool.input_types, tool_registry.get_executor(tool_id)
+
+def main(number=20000):
+    tool_registry.build()
+
+    for tool_id in tools_config:
+        legacy = min(timeit.repeat(lambda: legacy_request_overhead(tool_id), number=number, repeat=3)) / number
+        registry = min(timeit.repeat(lambda: registry_request_overhead(tool_id), number=number, repeat=3)) / number
+        print(f"tool {tool_id}: legacy {legacy * 1e6:8.2f} us/request   registry {registry * 1e6:8.2f} us/request   speedup {legacy / registry:6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Load test replaying a JSONL request log against the app in process.
+
+Each log line is one request:
+    {"method": "POST", "path": "/submit-tool", "headers": {"api-key": "dev"}, "body": {...}}
+The log is replayed in order, cycling until --requests have been sent, at --rate requests per second
+(0 sends as fast as the --concurrency limit allows). Latency percentiles, throughput and error rate are
+reported per endpoint and tool_id.
+
+Gemini and the embeddings are served by the fake model provider, YouTube transcripts and file downloads
+are patched with local fakes, so the run is offline and measures the service itself. Their latency is set
+with the --*-latency options.
+
+Run from the repository root:
+    PYTHONPATH=app:. python -m benchmarks.load_test benchmarks/load_test_requests.jsonl --requests 200 --concurrency 16
+
+With --max-p95-ms or --max-error-rate the exit code is 1 when a group goes over, for catching regressions.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from unittest.mock import patch
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'app')]
+
+DEFAULT_LOG = os.path.join(os.path.dirname(__file__), "load_test_requests.jsonl")
+DEFAULT_PDF = os.path.join(ROOT_DIR, "app", "api", "tests", "test.pdf")
+
+class Latency:
+    """Fixed delay with +/- `jitter` spread, as a fraction of the delay."""
+    def __init__(self, seconds: float, jitter: float = 0.0):
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def __call__(self) -> float:
+        return max(0.0, self.seconds * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def sleep(self):
+        if self.seconds > 0:
+            time.sleep(self())
+
+def feature_response(prompt: str) -> str:
+    # A well formed answer for each feature's prompt
+    if "quiz question" in prompt:
+        return json.dumps({
+            "question": "Which method fits a line by minimizing squared residuals?",
+            "choices": [{"key": key, "value": value} for key, value in zip("ABCD", ["Least squares", "Bisection", "Newton", "Simplex"])],
+            "answer": "A",
+            "explanation": "Ordinary least squares minimizes the sum of squared residuals."
+        })
+    if "flashcard" in prompt:
+        return json.dumps([{"concept": f"Concept {i}", "definition": f"Definition of concept {i}."} for i in range(8)])
+    if "summariz" in prompt:
+        return "The video explains linear regression, residuals and how least squares finds the best fit line. " * 5
+    return "Here is an explanation of the topic you asked about."
+
+class FakeYoutubeLoader:
+    latency = Latency(0)
+
+    def __init__(self, url):
+        self.url = url
+
+    @classmethod
+    def from_youtube_url(cls, youtube_url, **kwargs):
+        return cls(youtube_url)
+
+    def load(self):
+        from langchain_core.documents import Document
+        self.latency.sleep()
+        transcript = "In this video we look at linear regression and the least squares method. " * 60
+        return [Document(page_content=transcript, metadata={"length": 300, "title": f"Fake video {self.url}"})]
+
+class FakeHTTPResponse:
+    def __init__(self, content: bytes, content_type: str):
+        self.status_code = 200
+        self.content = content
+        self.headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(content)),
+            "Content-MD5": base64.b64encode(hashlib.md5(content).digest()).decode()
+        }
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class FakeDownloads:
+    """Serves the same local file for every URL, in place of the download session."""
+    def __init__(self, path: str, latency: Latency):
+        with open(path, "rb") as file:
+            self.content = file.read()
+        self.latency = latency
+
+    def get(self, url, headers=None, **kwargs):
+        self.latency.sleep()
+        etag = f'"{hashlib.md5(self.content).hexdigest()}"'
+        if headers and headers.get("If-None-Match") == etag:
+            response = FakeHTTPResponse(b"", "application/pdf")
+            response.status_code = 304
+            return response
+        response = FakeHTTPResponse(self.content, "application/pdf")
+        response.headers["ETag"] = etag
+        return response
+
+    def head(self, url, **kwargs):
+        response = FakeHTTPResponse(b"", "application/pdf")
+        response.headers["Content-MD5"] = base64.b64encode(hashlib.md5(self.content).digest()).decode()
+        return response
+
+def install_fakes(stack: ExitStack, llm_latency: Latency, embedding_latency: Latency, youtube_latency: Latency, download_latency: Latency, pdf_path: str):
+    """Swaps in the fake model provider and patches the download clients, undone when `stack` closes."""
+    import app.features.dynamo.tools as dynamo_tools
+    from app.services.model_provider import FakeProvider, model_registry
+    from app.services.downloads import downloader
+
+    previous = model_registry.use(FakeProvider(respond=feature_response, llm_latency=llm_latency, embedding_latency=embedding_latency))
+    stack.callback(model_registry.use, previous)
+
+    downloads = FakeDownloads(pdf_path, download_latency)
+    FakeYoutubeLoader.latency = youtube_latency
+
+    stack.enter_context(patch.object(dynamo_tools, "YoutubeLoader", FakeYoutubeLoader))
+    stack.enter_context(patch.object(downloader.session, "get", downloads.get))
+    stack.enter_context(patch.object(downloader.session, "head", downloads.head))
+
+def load_log(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def group_of(entry):
+    body = entry.get("body") or {}
+    tool_data = body.get("tool_data") if isinstance(body, dict) else None
+    tool_id = tool_data.get("tool_id") if isinstance(tool_data, dict) else None
+    return (entry["path"], "-" if tool_id is None else str(tool_id))
+
+async def send(client, entry, extra_headers):
+    headers = {**entry.get("headers", {}), **extra_headers}
+    started_at = time.perf_counter()
+    try:
+        response = await client.request(entry.get("method", "POST"), entry["path"], json=entry.get("body"), headers=headers)
+        status = response.status_code
+    except Exception:
+        status = 0  # Raised inside the app, reported as an error
+    return time.perf_counter() - started_at, status
+
+async def replay(app, entries, total, concurrency, rate, extra_headers):
+    import httpx
+
+    results = defaultdict(list)  # group -> [(seconds, status)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(client, entry):
+        async with semaphore:
+            results[group_of(entry)].append(await send(client, entry, extra_headers))
+
+    # ASGITransport does not run the lifespan, it is entered here so the app starts as it does when served
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            started_at = time.perf_counter()
+            tasks = []
+            for index in range(total):
+                if rate > 0:
+                    # Open loop: requests arrive on schedule whether or not earlier ones have finished
+                    delay = started_at + index / rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(run_one(client, entries[index % len(entries)])))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started_at
+
+    return results, elapsed
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(results, elapsed):
+    summary = []
+    for (path, tool_id), samples in sorted(results.items()):
+        latencies = sorted(seconds for seconds, _ in samples)
+        errors = sum(1 for _, status in samples if status == 0 or status >= 400)
+        summary.append({
+            "endpoint": path,
+            "tool_id": tool_id,
+            "requests": len(samples),
+            "errors": errors,
+            "error_rate": errors / len(samples),
+            "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "statuses": {str(status): sum(1 for _, s in samples if s == status) for status in sorted({s for _, s in samples})}
+        })
+    return summary
+
+def print_summary(summary, elapsed):
+    print(f"{'endpoint':<24}{'tool':>6}{'reqs':>7}{'err%':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for row in summary:
+        statuses = " ".join(f"{status}:{count}" for status, count in row["statuses"].items())
+        print(
+            f"{row['endpoint']:<24}{row['tool_id']:>6}{row['requests']:>7}{row['error_rate'] * 100:>6.1f}%{row['throughput_rps']:>8.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}  {statuses}"
+        )
+    total = sum(row["requests"] for row in summary)
+    print(f"\n{total} requests in {elapsed:.2f}s, {total / elapsed if elapsed else 0:.1f} requests/s overall")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("log", nargs="?", default=DEFAULT_LOG, help="JSONL request log to replay")
+    parser.add_argument("--requests", type=int, default=100, help="Requests to send, the log is cycled as needed")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at most")
+    parser.add_argument("--rate", type=float, default=0, help="Arrival rate in requests per second, 0 for as fast as possible")
+    parser.add_argument("--no-cache", action="store_true", help="Send Cache-Control: no-cache so every request runs its tool")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake Gemini call")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Seconds per fake embedding call")
+    parser.add_argument("--youtube-latency", type=float, default=0.2, help="Seconds per fake transcript load")
+    parser.add_argument("--download-latency", type=float, default=0.1, help="Seconds per fake file download")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Spread of the fake latencies, as a fraction")
+    parser.add_argument("--pdf", default=DEFAULT_PDF, help="File served for every file URL")
+    parser.add_argument("--json", dest="json_path", help="Also write the summary as JSON to this path")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail when any group's p95 latency is above this")
+    parser.add_argument("--max-error-rate", type=float, help="Fail when any group's error rate is above this fraction")
+    args = parser.parse_args()
+
+    os.environ.setdefault("ENV_TYPE", "dev")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # A log recorded from a handful of users would otherwise mostly measure the per-user rate limiter
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "1000000")
+    os.environ.setdefault("RATE_LIMIT_BURST", "1000000")
+    # Every run starts with empty LLM, PDF page and embedding caches so runs are comparable
+    cache_dir = tempfile.TemporaryDirectory()
+    os.environ.setdefault("LLM_CACHE_PATH", os.path.join(cache_dir.name, "llm-cache.sqlite3"))
+    os.environ.setdefault("PDF_PAGE_CACHE_PATH", os.path.join(cache_dir.name, "pdf-pages.sqlite3"))
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(cache_dir.name, "embeddings.sqlite3"))
+
+    from app.main import app
+
+    entries = load_log(args.log)
+    if not entries:
+        sys.exit(f"No requests in {args.log}")
+
+    extra_headers = {"Cache-Control": "no-cache"} if args.no_cache else {}
+    with ExitStack() as stack:
+        install_fakes(
+            stack,
+            llm_latency=Latency(args.llm_latency, args.jitter),
+            embedding_latency=Latency(args.embedding_latency, args.jitter),
+            youtube_latency=Latency(args.youtube_latency, args.jitter),
+            download_latency=Latency(args.download_latency, args.jitter),
+            pdf_path=args.pdf
+        )
+        results, elapsed = asyncio.run(replay(app, entries, args.requests, args.concurrency, args.rate, extra_headers))
+
+    summary = summarize(results, elapsed)
+    print_summary(summary, elapsed)
+
+    if args.json_path:
+        with open(args.json_path, "w") as file:
+            json.dump({"elapsed_seconds": elapsed, "groups": summary}, file, indent=2)
+
+    failures = []
+    for row in summary:
+        if args.max_p95_ms is not None and row["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{row['endpoint']} tool {row['tool_id']}: p95 {row['p95_ms']:.1f} ms is above {args.max_p95_ms:.1f} ms")
+        if args.max_error_rate is not None and row["error_rate"] > args.max_error_rate:
+            failures.append(f"{row['endpoint']} tool {row['tool_id']}: error rate {row['error_rate']:.1%} is above {args.max_error_rate:.1%}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()